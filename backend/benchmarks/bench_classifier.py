@@ -0,0 +1,121 @@
+"""
+Violation Classifier Benchmark
+Measures throughput of the compiled violation classifier against the previous
+keyword scans of ErrorCategorizer and the batch categorization loop
+
+Usage: python benchmarks/bench_classifier.py [--sizes 1000 10000 100000] [--json]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.violation_classifier import violation_classifier, strip_severity_tag
+
+MESSAGES = [
+    "Font should be Times New Roman 12pt, currently using Arial",
+    "Margins are narrower than 1 inch on the left side",
+    "Citation format is not IEEE style",
+    "Main heading alignment should be centered",
+    "Page numbering is missing on this page",
+    "Grammar error - \"There is many\" should be \"There are many\"",
+    "Spelling mistake in \"requirment\"",
+    "Inconsistent spacing between paragraphs",
+    "The flow between the introduction and the background is abrupt",
+    "Wrong tense used in the methodology section",
+    "Consider adding more detail to explain the methodology",
+    "Add a short summary at the end of the section",
+]
+TAGS = ["[ERROR] ", "[WARNING] ", "[SUGGESTION] ", ""]
+
+
+# --- Previous categorization code, kept as the baseline ----------------------
+
+def legacy_category(text):
+    text_lower = text.lower()
+    if any(word in text_lower for word in ['structure', 'format', 'alignment', 'citation', 'numbering', 'margin', 'font']):
+        return "structure"
+    elif any(word in text_lower for word in ['grammar', 'spelling', 'language', 'tense', 'punctuation']):
+        return "grammar"
+    return "enhancement"
+
+
+def legacy_severity(violation):
+    violation_lower = violation.lower()
+    if "[ERROR]" in violation or any(word in violation_lower for word in ["error", "violation", "problem", "incorrect", "wrong", "missing", "structure", "citation", "alignment", "page numbering", "font", "margin"]):
+        if "[ERROR]" in violation:
+            text = violation.replace("[ERROR]", "").strip()
+            text = text.replace("Page X:", "").replace("Page X :", "").strip()
+        else:
+            text = violation.strip()
+            text = text.replace("Page X:", "").replace("Page X :", "").strip()
+        return "error", text
+    elif "[WARNING]" in violation or any(word in violation_lower for word in ["warning", "grammar", "flow", "formatting", "inconsistent"]):
+        if "[WARNING]" in violation:
+            return "warning", violation.replace("[WARNING]", "").strip()
+        return "warning", violation.strip()
+    return "error", violation
+
+
+def legacy(violations):
+    return [(legacy_category(text), legacy_severity(text)[0]) for text in violations]
+
+
+def compiled(violations):
+    results = []
+    for text in violations:
+        results.append(violation_classifier.classify(text))
+        strip_severity_tag(text)
+    return results
+
+
+def build_violations(size, seed=11):
+    rng = random.Random(seed)
+    return [rng.choice(TAGS) + rng.choice(MESSAGES) for _ in range(size)]
+
+
+def measure(func, violations, rounds=5):
+    best = None
+    for _ in range(rounds):
+        started = time.perf_counter()
+        func(violations)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return round(len(violations) / best)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    report = []
+    for size in args.sizes:
+        violations = build_violations(size)
+        old, new = legacy(violations), compiled(violations)
+        report.append({
+            "violations": size,
+            "legacy_per_second": measure(legacy, violations),
+            "compiled_per_second": measure(compiled, violations),
+            "category_agreement": round(sum(a[0] == b[0] for a, b in zip(old, new)) / size, 3),
+            "severity_agreement": round(sum(a[1] == b[1] for a, b in zip(old, new)) / size, 3),
+        })
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    for row in report:
+        print(
+            f"{row['violations']:>8} violations  legacy {row['legacy_per_second']:>9}/s  "
+            f"compiled {row['compiled_per_second']:>9}/s  "
+            f"agreement category {row['category_agreement']:.3f} severity {row['severity_agreement']:.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Memory Benchmark
+Measures peak RSS of the API process tree while it analyzes one synthetic
+report, for growing page counts, with the default /analyze pipeline and with
+bounded mode (/analyze?bounded=true). Every measurement uses a fresh API
+process so earlier requests cannot raise the peak. Runs offline against the
+stub Ollama server; results are saved as JSON so runs can be compared.
+
+Usage: python benchmarks/bench_memory.py [--pages 50 200 600] [--modes page bounded]
+                                         [--max-in-flight 16] [--delay 0.01]
+                                         [--output FILE] [--compare FILE]
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import httpx
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCHMARK_DIR)
+
+from bench_service import RSSSampler, git_commit, start_services
+from make_reports import make_report
+
+MODES = {"page": "/analyze", "bounded": "/analyze?bounded=true"}
+# Small report sent first so imports and templates are loaded before the baseline is taken
+WARMUP_PAGES = 3
+
+
+def post_report(base_url, endpoint, path):
+    """Send one report, reading the response as it streams, and return (seconds, pages, ok)"""
+    with open(path, "rb") as f:
+        data = f.read()
+    started = time.perf_counter()
+    response = httpx.post(
+        base_url + endpoint, files={"file": (os.path.basename(path), data, "application/pdf")}, timeout=None
+    )
+    elapsed = time.perf_counter() - started
+    body = response.json()
+    return elapsed, body.get("total_pages_analyzed", 0), response.status_code == 200 and "error" not in body
+
+
+def measure(args, mode, pages, path, warmup_path, workdir):
+    """Start a fresh API, warm it up and record its peak RSS while analyzing one report"""
+    os.environ["BOUNDED_MAX_IN_FLIGHT"] = str(args.max_in_flight)
+    stub, api, base_url = start_services(args, workdir)
+    sampler = RSSSampler(api.pid, interval=0.02)
+    sampler.start()
+    try:
+        post_report(base_url, MODES[mode], warmup_path)
+        sampler.reset()
+        baseline = sampler.peak
+        seconds, analyzed, ok = post_report(base_url, MODES[mode], path)
+        peak = sampler.peak
+    finally:
+        sampler.stop()
+        api.terminate()
+        stub.terminate()
+        api.wait()
+        stub.wait()
+    return {
+        "mode": mode,
+        "pages": pages,
+        "ok": ok and analyzed == pages,
+        "seconds": round(seconds, 2),
+        "baseline_rss_mb": round(baseline / (1024 * 1024), 1),
+        "peak_rss_mb": round(peak / (1024 * 1024), 1),
+        "growth_mb": round((peak - baseline) / (1024 * 1024), 1),
+    }
+
+
+def print_results(results, previous=None):
+    baseline = {(result["mode"], result["pages"]): result for result in (previous or {}).get("results", [])}
+    for result in results:
+        line = (
+            f"{result['mode']:<8} {result['pages']:>5} pages  {result['seconds']:>7.2f} s  "
+            f"baseline {result['baseline_rss_mb']:>7.1f} MB  peak {result['peak_rss_mb']:>7.1f} MB  "
+            f"growth {result['growth_mb']:>7.1f} MB"
+        )
+        if not result["ok"]:
+            line += "  (failed)"
+        old = baseline.get((result["mode"], result["pages"]))
+        if old is not None:
+            line += f"  [growth was {old['growth_mb']:.1f} MB]"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, nargs="+", default=[50, 200, 600])
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES))
+    parser.add_argument("--max-in-flight", type=int, default=16, help="BOUNDED_MAX_IN_FLIGHT for the API")
+    parser.add_argument("--delay", type=float, default=0.01, help="stub latency per generation in seconds")
+    parser.add_argument("--tokens-per-second", type=float, default=0, help="stub generation rate; 0 answers at once")
+    parser.add_argument("--responses", help="JSON list of canned free-text responses for the stub")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", default=os.path.join(BENCHMARK_DIR, "results", f"memory_{time.strftime('%Y%m%d_%H%M%S')}.json"))
+    parser.add_argument("--compare", help="earlier results JSON to compare against")
+    args = parser.parse_args()
+    # Caches would keep whole documents in memory and hide the pipeline's own usage
+    args.warm_caches = False
+
+    workdir = tempfile.mkdtemp(prefix="bench_memory_")
+    report_dir = os.path.join(workdir, "reports")
+    warmup_path = make_report(WARMUP_PAGES, report_dir, args.seed + 1)
+    reports = {pages: make_report(pages, report_dir, args.seed) for pages in args.pages}
+
+    results = []
+    for mode in args.modes:
+        for pages, path in reports.items():
+            results.append(measure(args, mode, pages, path, warmup_path, workdir))
+
+    report = {
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git_commit": git_commit(),
+        "environment": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        "results": results,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    previous = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            previous = json.load(f)
+    print_results(results, previous)
+    print(f"Saved results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
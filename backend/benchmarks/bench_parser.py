@@ -0,0 +1,412 @@
+"""
+Response Parser Benchmark
+Compares parse time and extraction accuracy of the single-pass response parser
+against the previous multi-pass parsing code, over responses built from the
+saved batch prompt corpus in the formats the model produces
+
+Usage: python benchmarks/bench_parser.py [--repeat N] [--json]
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from prompt.response_parser import parse_response, format_violation
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "prompt", "20250816_203836_251_batch_48_pages.txt")
+CHUNK_SIZE = 8
+MESSAGES = [
+    ("ERROR", "Font should be Times New Roman 12pt, currently using Arial"),
+    ("ERROR", "Margins are narrower than 1 inch on the left side"),
+    ("ERROR", "Citation format is not IEEE style"),
+    ("ERROR", "Main heading is not centered and bold"),
+    ("WARNING", "Grammar error - \"There is many\" should be \"There are many\""),
+    ("WARNING", "Spelling mistake in \"requirment\""),
+    ("WARNING", "Inconsistent spacing between paragraphs"),
+    ("WARNING", "Sentence in the second paragraph is too long and hard to follow"),
+    ("SUGGESTION", "Consider adding more detail to explain the methodology"),
+    ("SUGGESTION", "Add a short summary at the end of the section"),
+]
+
+
+# --- Previous parsing code, kept as the baseline -----------------------------
+
+def extract_page_violations(result):
+    """Clean a page's model response down to its individual violation messages"""
+    ai_response = result["analysis"]
+    
+    # Check if violations were found and extract them
+    if "No TU format violations detected" in ai_response:
+        return []
+    
+    # Clean up the response to extract only error messages
+    violations = ai_response.strip()
+    
+    # Remove common introductory phrases
+    phrases_to_remove = [
+        f"After analyzing page {result['page']}",
+        f"After analyzing the content of page {result['page']}",
+        f"After analyzing the provided content for Page {result['page']}",
+        "I have identified the following violations of TU format standards:",
+        "I found the following violations of TU format standards:",
+        "the following TU format standard violations were found:",
+        "Violations found:",
+        "No other violations were detected on this page.",
+        "No other violations of TU format standards were detected on this page.",
+        "No TU format violations detected on this page."
+    ]
+    
+    for phrase in phrases_to_remove:
+        violations = violations.replace(phrase, "")
+    
+    # Split by numbered points and clean up
+    lines = violations.split('\n')
+    cleaned_lines = []
+    for line in lines:
+        line = line.strip()
+        if line and not line.startswith('*') and not line.startswith('No other') and not line.startswith('No TU'):
+            # Remove numbering (1., 2., etc.)
+            if line[0].isdigit() and '. ' in line:
+                line = line.split('. ', 1)[1]
+            cleaned_lines.append(line)
+    
+    # Only keep substantial error messages
+    return [line for line in cleaned_lines if line and len(line) > 10]
+
+
+def parse_batch_response(ai_response, chunk_pages):
+    """Parse one batch response into per-page results
+    
+    Unattributed text falls back to the first page of the chunk.
+    """
+    page_results = []
+    
+    # Debug: Log the AI response
+    logging.debug(f"AI Response: {ai_response}")
+    
+    lines = ai_response.split('\n')
+    current_page = None
+    current_violations = []
+    
+    for line in lines:
+        line = line.strip()
+        if line.startswith('Page ') and ':' in line:
+            # Save previous page results
+            if current_page:
+                page_results.append({
+                    "page": current_page,
+                    "analysis": f"Page {current_page}: " + ('; '.join(current_violations) if current_violations else "No TU format violations detected."),
+                    "success": True,
+                    "violations": current_violations
+                })
+            
+            # Start new page
+            page_part = line.split(':', 1)[0]
+            current_page = page_part.replace('Page ', '').strip()
+            current_violations = []
+            
+            # Check if this page has violations
+            if ':' in line and 'No TU format violations detected' not in line:
+                violation_text = line.split(':', 1)[1].strip()
+                if violation_text:
+                    # Extract specific error message
+                    if '[ERROR]' in violation_text:
+                        error_msg = violation_text.split('[ERROR]')[1].strip()
+                        current_violations.append(f"[ERROR] {error_msg}")
+                    elif '[WARNING]' in violation_text:
+                        warning_msg = violation_text.split('[WARNING]')[1].strip()
+                        current_violations.append(f"[WARNING] {warning_msg}")
+
+                    else:
+                        current_violations.append(violation_text)
+        elif line and current_page and 'No TU format violations detected' not in line:
+            # Check if line contains categorized content
+            if '[ERROR]' in line:
+                error_msg = line.split('[ERROR]')[1].strip()
+                current_violations.append(f"[ERROR] {error_msg}")
+            elif '[WARNING]' in line:
+                warning_msg = line.split('[WARNING]')[1].strip()
+                current_violations.append(f"[WARNING] {warning_msg}")
+
+            else:
+                current_violations.append(line)
+    
+    # Add the last page
+    if current_page:
+        page_results.append({
+            "page": current_page,
+            "analysis": f"Page {current_page}: " + ('; '.join(current_violations) if current_violations else "No TU format violations detected."),
+            "success": True,
+            "violations": current_violations
+        })
+    
+    # If no pages were parsed, try alternative parsing using page markers
+    if not page_results:
+        logging.warning("No pages parsed from AI response, trying alternative parsing...")
+        
+        # Split by page markers (--- PAGE X ---)
+        page_sections = re.split(r'---\s*PAGE\s+(\d+)\s*---', ai_response, flags=re.IGNORECASE)
+        
+        # Process each page section
+        for i in range(1, len(page_sections), 2):  # Skip the first empty section, process pairs (page_num, content)
+            if i + 1 < len(page_sections):
+                page_num = int(page_sections[i])
+                page_content = page_sections[i + 1].strip()
+                
+                # Skip empty content
+                if not page_content:
+                    continue
+                
+                # Extract violations from this page's content
+                violations = []
+                lines = page_content.split('\n')
+                
+                for line in lines:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    
+                    # Skip introductory text
+                    if line.lower().startswith(('here is', 'after analyzing', 'analysis of')):
+                        continue
+                        
+                    # Check if it's a violation line (contains ERROR or WARNING)
+                    if any(keyword in line.upper() for keyword in ['ERROR:', 'WARNING:', 'VIOLATION']):
+                        # Clean up the line and extract the violation
+                        clean_line = line
+                        # Remove prefixes like "ERROR:", "WARNING:", etc.
+                        for prefix in ['ERROR:', 'WARNING:', 'VIOLATION:']:
+                            clean_line = clean_line.replace(prefix, '').strip()
+                        
+                        if clean_line and len(clean_line) > 5:  # Only add substantial violations
+                            violations.append(clean_line)
+                    
+                    # Also check for lines that describe issues without explicit prefixes
+                    elif any(keyword in line.lower() for keyword in ['missing', 'incorrect', 'wrong', 'should be', 'problem', 'issue', 'mistake', 'error']):
+                        if len(line) > 10:  # Only add substantial violations
+                            violations.append(line)
+                
+                # Create page result
+                if violations:
+                    analysis_text = "\n".join([f"• {v}" for v in violations])
+                else:
+                    analysis_text = "No TU format violations detected on this page."
+                
+                page_results.append({
+                    "page": page_num,
+                    "analysis": analysis_text,
+                    "success": True,
+                    "violations": violations
+                })
+        
+        # If still no pages parsed, fall back to simple text parsing
+        if not page_results:
+            logging.warning("No page markers found, trying simple text parsing...")
+            # Try to parse any violations from the response
+            all_text = ai_response.lower()
+            
+            # Look for common violation indicators
+            violation_indicators = [
+                "error", "violation", "problem", "issue", "incorrect", "wrong", "missing",
+                "warning", "suggestion", "improvement", "idea", "recommendation"
+            ]
+            
+            has_violations = any(indicator in all_text for indicator in violation_indicators)
+            
+            if has_violations:
+                # Create a single page result with cleaned up response
+                clean_text = ai_response.strip()
+                # Remove common introductory phrases
+                intro_phrases = [
+                    "Here is the analysis of each page for TU format violations:",
+                    "After analyzing",
+                    "The analysis shows"
+                ]
+                for phrase in intro_phrases:
+                    clean_text = clean_text.replace(phrase, "").strip()
+                
+                page_results.append({
+                    "page": chunk_pages[0] if chunk_pages else 1,
+                    "analysis": clean_text,
+                    "success": True,
+                    "violations": [clean_text]
+                })
+    
+    return page_results
+
+
+# --- Corpus ------------------------------------------------------------------
+
+def load_page_numbers():
+    with open(CORPUS_PATH, "r", encoding="utf-8") as f:
+        return [int(page) for page in re.findall(r"^--- PAGE (\d+) ---$", f.read(), re.MULTILINE)]
+
+
+def render_batch(style, issues):
+    """Render (page, category, message) issues the way the model writes them"""
+    if style == "json":
+        return json.dumps({"violations": [
+            {"page": page, "category": category, "message": message} for page, category, message in issues
+        ]})
+    lines = []
+    if style == "intro":
+        lines.append("Here is the analysis of each page for TU format violations:")
+        lines.append("")
+    current = None
+    for page, category, message in issues:
+        if style == "markers":
+            if page != current:
+                lines.append(f"--- PAGE {page} ---")
+            lines.append(f"{category}: {message}")
+        elif style == "markdown":
+            if page != current:
+                lines.append(f"**Page {page}:**")
+            lines.append(f"* [{category}] {message}")
+        else:
+            lines.append(f"Page {page}: [{category}] {message}")
+        current = page
+    if style == "intro":
+        lines.append("No other violations were detected.")
+    return "\n".join(lines)
+
+
+def truncate_json(issues, keep=0.8):
+    """A JSON response cut off by the token limit, and the issues that were completed"""
+    text = '{"violations": ['
+    ends = []
+    for index, (page, category, message) in enumerate(issues):
+        text += (", " if index else "") + json.dumps({"page": page, "category": category, "message": message})
+        ends.append(len(text))
+    text += "]}"
+    cut = int(len(text) * keep)
+    return text[:cut], [issue for issue, end in zip(issues, ends) if end <= cut]
+
+
+def build_corpus(seed=7):
+    """Return batch and single-page cases as (response, pages, expected) tuples"""
+    rng = random.Random(seed)
+    page_numbers = load_page_numbers()
+    styles = ["plain", "intro", "markdown", "markers", "json", "json_truncated"]
+    batch_cases = []
+    for start in range(0, len(page_numbers), CHUNK_SIZE):
+        chunk = page_numbers[start:start + CHUNK_SIZE]
+        for style in styles:
+            issues = [
+                (page, *rng.choice(MESSAGES))
+                for page in chunk for _ in range(rng.randint(0, 3))
+            ]
+            if style == "json_truncated":
+                text, issues = truncate_json(issues)
+            else:
+                text = render_batch(style, issues)
+            batch_cases.append((style, text, chunk, issues))
+    single_cases = []
+    for page in page_numbers:
+        issues = [(page, *rng.choice(MESSAGES)) for _ in range(rng.randint(1, 4))]
+        lines = [f"After analyzing page {page}, I found the following violations of TU format standards:"]
+        lines += [f"{index}. [{category}] {message}" for index, (_, category, message) in enumerate(issues, 1)]
+        lines.append("No other violations were detected on this page.")
+        single_cases.append(("single", "\n".join(lines), [page], issues))
+    return batch_cases, single_cases
+
+
+# --- Scoring -----------------------------------------------------------------
+
+TAG = re.compile(r"^(?:[•*\-]\s*)?(?:\[?(?:ERROR|WARNING|SUGGESTION)\]?:?\s*)?", re.IGNORECASE)
+
+
+def normalize(page, text):
+    return (int(page), TAG.sub("", text.strip()).strip().lower())
+
+
+def score(expected, found):
+    """Return (true positives, expected count, found count) over (page, message) pairs"""
+    expected = [normalize(page, message) for page, _, message in expected]
+    found = [normalize(page, text) for page, text in found]
+    remaining = list(expected)
+    hits = 0
+    for item in found:
+        if item in remaining:
+            remaining.remove(item)
+            hits += 1
+    return hits, len(expected), len(found)
+
+
+def legacy_batch(text, pages):
+    results = parse_batch_response(text, pages)
+    found = []
+    for result in results:
+        page = result["page"]
+        if not str(page).isdigit():
+            continue
+        found.extend((page, violation) for violation in result["violations"])
+    return found
+
+
+def legacy_single(text, pages):
+    return [(pages[0], line) for line in extract_page_violations({"analysis": text, "page": pages[0]})]
+
+
+def new_parser(text, pages):
+    violations, _ = parse_response(text, pages)
+    return [(violation["page"], format_violation(violation)) for violation in violations]
+
+
+def run(parser, cases, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for _, text, pages, _ in cases:
+            parser(text, pages)
+    elapsed = time.perf_counter() - started
+    by_style = {}
+    for style, text, pages, expected in cases:
+        hits, expected_count, found_count = score(expected, parser(text, pages))
+        totals = by_style.setdefault(style, [0, 0, 0])
+        totals[0] += hits
+        totals[1] += expected_count
+        totals[2] += found_count
+    return {
+        "us_per_response": round(elapsed / (repeat * len(cases)) * 1e6, 2),
+        "accuracy": {
+            style: {
+                "recall": round(hits / expected_count, 3) if expected_count else 1.0,
+                "precision": round(hits / found_count, 3) if found_count else 1.0,
+            }
+            for style, (hits, expected_count, found_count) in by_style.items()
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+    # The baseline code logs a warning for every response it cannot parse directly
+    logging.disable(logging.WARNING)
+
+    batch_cases, single_cases = build_corpus()
+    report = {
+        "batch": {"legacy": run(legacy_batch, batch_cases, args.repeat), "parser": run(new_parser, batch_cases, args.repeat)},
+        "single_page": {"legacy": run(legacy_single, single_cases, args.repeat), "parser": run(new_parser, single_cases, args.repeat)},
+    }
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    for mode, results in report.items():
+        print(f"{mode} ({len(batch_cases if mode == 'batch' else single_cases)} responses)")
+        for name, result in results.items():
+            print(f"  {name:<7} {result['us_per_response']:>9.2f} us/response")
+            for style, accuracy in result["accuracy"].items():
+                print(f"          {style:<15} recall {accuracy['recall']:.3f}  precision {accuracy['precision']:.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Prompt Prefix Benchmark
+Sends the pages of the saved corpus to Ollama with each prompt layout and
+compares prompt evaluation from Ollama's prompt_eval_count/prompt_eval_duration:
+
+  content_first  page content ahead of the rules (the previous layout)
+  rules_first    static rules as the prompt prefix
+  system         static rules as the system prompt (the default)
+
+Requests bypass the response cache and generate a single token, so the
+timings are dominated by prompt evaluation.
+
+Usage: python benchmarks/bench_prompt_prefix.py [--pages N] [--json]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from prompt.prompt_manager import PromptManager
+from utils.ollama_client import build_payload, generate, close_client, GenerationStats, OLLAMA_URL
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "prompt", "20250816_203836_251_batch_48_pages.txt")
+
+
+def load_pages():
+    with open(CORPUS_PATH, "r", encoding="utf-8") as f:
+        sections = re.split(r"^--- PAGE (\d+) ---$", f.read().split("\n\nINSTRUCTIONS:")[0], flags=re.MULTILINE)
+    return [(int(sections[i]), sections[i + 1].strip()) for i in range(1, len(sections) - 1, 2)]
+
+
+def content_first_prompt(manager, page, text):
+    """The layout used before the rules moved to the prefix"""
+    instruction = manager.get_single_page_analysis_prompt(page, text)
+    return f"{instruction}\n\n{manager.static_rules}", None
+
+
+def rules_first_prompt(manager, page, text):
+    return f"{manager.static_rules}\n\n{manager.get_single_page_analysis_prompt(page, text)}", None
+
+
+def system_prompt(manager, page, text):
+    return manager.get_single_page_analysis_prompt(page, text), manager.system_prompt
+
+
+async def run_layout(build, pages):
+    # Prompts are built without inline rules so every layout adds them explicitly
+    manager = PromptManager(system_prompt_rules=True)
+    stats = GenerationStats()
+    for page, text in pages:
+        prompt, system = build(manager, page, text)
+        payload = build_payload(prompt, max_tokens=1, temperature=0.0, system=system)
+        await generate(payload, timeout_seconds=300, stats=stats)
+    return stats.summary()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    pages = load_pages()[:args.pages]
+    report = {}
+    try:
+        for name, build in (("content_first", content_first_prompt), ("rules_first", rules_first_prompt), ("system", system_prompt)):
+            report[name] = await run_layout(build, pages)
+    finally:
+        await close_client()
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{len(pages)} pages against {OLLAMA_URL}")
+    for name, summary in report.items():
+        print(
+            f"  {name:<14} avg prompt eval {summary['avg_prompt_eval_ms']:>8.1f} ms "
+            f"over {summary['avg_prompt_eval_tokens']:>7.1f} tokens  "
+            f"(share of total {summary['prompt_eval_share']:.0%})"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,270 @@
+"""
+Service Benchmark
+Starts the API and a stub Ollama server as local subprocesses, sends them
+synthetic reports and records latency percentiles, pages per second and peak
+RSS of the API process tree. Runs offline; results are saved as JSON so runs
+can be compared:
+
+  analyze        sequential /analyze requests for each report size
+  analyze_batch  sequential /analyze-batch requests for each report size
+  concurrent     --users clients posting /analyze at the same time
+
+Response, extraction and analysis caches are disabled unless --warm-caches
+is given, so every request does the full work.
+
+Usage: python benchmarks/bench_service.py [--pages 5 50 500] [--runs 3] [--users 8]
+                                          [--scenarios analyze analyze_batch concurrent]
+                                          [--delay 0.05] [--tokens-per-second 200]
+                                          [--output FILE] [--compare FILE]
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import httpx
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCHMARK_DIR)
+sys.path.insert(0, BENCHMARK_DIR)
+
+from make_reports import make_report
+
+SCENARIOS = ("analyze", "analyze_batch", "concurrent")
+ENDPOINTS = {"analyze": "/analyze", "analyze_batch": "/analyze-batch", "concurrent": "/analyze"}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(values, percent):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(percent / 100 * len(ordered)) - 1)]
+
+
+def process_tree(pid):
+    """pid and all of its descendants, read from /proc"""
+    pids = [pid]
+    for current in pids:
+        try:
+            for task in os.listdir(f"/proc/{current}/task"):
+                with open(f"/proc/{current}/task/{task}/children") as f:
+                    pids.extend(int(child) for child in f.read().split())
+        except OSError:
+            continue
+    return pids
+
+
+def rss_bytes(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+class RSSSampler(threading.Thread):
+    """Samples the resident memory of a process tree and keeps the peak since the last reset"""
+
+    def __init__(self, pid, interval=0.05):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.peak = 0
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.peak = max(self.peak, sum(rss_bytes(pid) for pid in process_tree(self.pid)))
+
+    def reset(self):
+        self.peak = sum(rss_bytes(pid) for pid in process_tree(self.pid))
+
+    def stop(self):
+        self.stopped.set()
+
+
+def start_services(args, workdir):
+    """Start the stub server and the API, returning (stub, api, base_url)"""
+    stub_port, api_port = free_port(), free_port()
+    stub_command = [
+        sys.executable, os.path.join(BENCHMARK_DIR, "stub_ollama.py"), "--port", str(stub_port),
+        "--delay", str(args.delay), "--tokens-per-second", str(args.tokens_per_second),
+    ]
+    if args.responses:
+        stub_command += ["--responses", args.responses]
+    stub = subprocess.Popen(stub_command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    env = {
+        **os.environ,
+        "OLLAMA_BACKENDS": f"http://127.0.0.1:{stub_port}",
+        "TEMP_DIR": os.path.join(workdir, "temp"),
+        "JOB_QUEUE_PATH": os.path.join(workdir, "jobs.db"),
+        "LLM_CACHE_PATH": "",
+        "PDF_CACHE_PATH": "",
+        "ANALYSIS_STORE_PATH": "",
+    }
+    if not args.warm_caches:
+        env.update({"LLM_CACHE_SIZE": "0", "PDF_CACHE_SIZE": "0"})
+    log = open(os.path.join(workdir, "api.log"), "wb")
+    api = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(api_port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+    base_url = f"http://127.0.0.1:{api_port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if api.poll() is not None:
+            raise RuntimeError(f"API exited during startup, see {log.name}")
+        try:
+            if httpx.get(base_url + "/", timeout=1).status_code == 200:
+                return stub, api, base_url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("API did not start within 60 seconds")
+
+
+async def post_report(client, url, path):
+    """Send one report and return (seconds, ok)"""
+    with open(path, "rb") as f:
+        data = f.read()
+    started = time.perf_counter()
+    response = await client.post(url, files={"file": (os.path.basename(path), data, "application/pdf")})
+    elapsed = time.perf_counter() - started
+    ok = response.status_code == 200 and "error" not in response.json()
+    return elapsed, ok
+
+
+async def run_scenario(name, base_url, path, pages, runs, users, sampler):
+    """Run one scenario against one report and summarize it"""
+    url = base_url + ENDPOINTS[name]
+    async with httpx.AsyncClient(timeout=None) as client:
+        # One unmeasured request loads PyPDF2 and the prompt templates
+        await post_report(client, url, path)
+        sampler.reset()
+        started = time.perf_counter()
+        if name == "concurrent":
+            outcomes = await asyncio.gather(*[post_report(client, url, path) for _ in range(users * runs)])
+        else:
+            outcomes = [await post_report(client, url, path) for _ in range(runs)]
+        wall = time.perf_counter() - started
+
+    latencies = [seconds * 1000 for seconds, _ in outcomes]
+    return {
+        "scenario": name,
+        "pages": pages,
+        "users": users if name == "concurrent" else 1,
+        "requests": len(outcomes),
+        "errors": sum(1 for _, ok in outcomes if not ok),
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50), 1),
+            "p95": round(percentile(latencies, 95), 1),
+            "p99": round(percentile(latencies, 99), 1),
+            "mean": round(sum(latencies) / len(latencies), 1),
+            "max": round(max(latencies), 1),
+        },
+        "wall_seconds": round(wall, 3),
+        "pages_per_second": round(pages * len(outcomes) / wall, 2),
+        "peak_rss_mb": round(sampler.peak / (1024 * 1024), 1),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def result_key(result):
+    return (result["scenario"], result["pages"], result["users"])
+
+
+def print_results(results, previous=None):
+    baseline = {result_key(result): result for result in (previous or {}).get("results", [])}
+    for result in results:
+        latency = result["latency_ms"]
+        line = (
+            f"{result['scenario']:<14} {result['pages']:>4} pages x{result['requests']:<3} "
+            f"p50 {latency['p50']:>9.1f} ms  p95 {latency['p95']:>9.1f} ms  p99 {latency['p99']:>9.1f} ms  "
+            f"{result['pages_per_second']:>8.2f} pages/s  peak RSS {result['peak_rss_mb']:>7.1f} MB"
+        )
+        if result["errors"]:
+            line += f"  ({result['errors']} errors)"
+        old = baseline.get(result_key(result))
+        if old is not None:
+            change = (result["pages_per_second"] / old["pages_per_second"] - 1) * 100 if old["pages_per_second"] else 0.0
+            line += f"  [{change:+.1f}% pages/s, p95 was {old['latency_ms']['p95']:.1f} ms]"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, nargs="+", default=[5, 50, 500])
+    parser.add_argument("--runs", type=int, default=3, help="measured requests per report (per user when concurrent)")
+    parser.add_argument("--users", type=int, default=8, help="simultaneous clients in the concurrent scenario")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--delay", type=float, default=0.05, help="stub latency per generation in seconds")
+    parser.add_argument("--tokens-per-second", type=float, default=200, help="stub generation rate")
+    parser.add_argument("--responses", help="JSON list of canned free-text responses for the stub")
+    parser.add_argument("--warm-caches", action="store_true", help="leave the response and extraction caches on")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", default=os.path.join(BENCHMARK_DIR, "results", f"service_{time.strftime('%Y%m%d_%H%M%S')}.json"))
+    parser.add_argument("--compare", help="earlier results JSON to compare against")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_service_")
+    reports = {pages: make_report(pages, os.path.join(workdir, "reports"), args.seed) for pages in args.pages}
+    stub, api, base_url = start_services(args, workdir)
+    sampler = RSSSampler(api.pid)
+    sampler.start()
+    results = []
+    try:
+        for name in args.scenarios:
+            for pages, path in reports.items():
+                results.append(asyncio.run(run_scenario(name, base_url, path, pages, args.runs, args.users, sampler)))
+    finally:
+        sampler.stop()
+        api.terminate()
+        stub.terminate()
+        api.wait()
+        stub.wait()
+
+    report = {
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git_commit": git_commit(),
+        "environment": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        "results": results,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    previous = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            previous = json.load(f)
+    print_results(results, previous)
+    print(f"Saved results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
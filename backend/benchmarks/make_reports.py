@@ -0,0 +1,150 @@
+"""
+Synthetic Report Generator
+Writes deterministic TU-style report PDFs (title page, table of contents,
+numbered chapters and sections, citations and page numbers) without any
+PDF library, so benchmarks run offline with only the service's dependencies
+
+Usage: python benchmarks/make_reports.py [--pages 5 50 500] [--output benchmarks/reports] [--seed 7]
+"""
+
+import argparse
+import os
+import random
+
+LINES_PER_PAGE = 38
+CHARS_PER_LINE = 88
+PAGES_PER_CHAPTER = 12
+
+WORDS = (
+    "system data model analysis method result performance network design user security process "
+    "evaluation approach proposed study research information implementation framework algorithm "
+    "accuracy dataset training feature application service architecture experiment testing "
+    "requirement interface module database protocol efficiency comparison sample measurement"
+).split()
+CHAPTER_TITLES = [
+    "INTRODUCTION", "LITERATURE REVIEW", "METHODOLOGY", "SYSTEM DESIGN", "IMPLEMENTATION",
+    "RESULTS AND ANALYSIS", "DISCUSSION", "CONCLUSION AND FUTURE WORK",
+]
+
+
+def sentence(rng, citations):
+    words = [rng.choice(WORDS) for _ in range(rng.randint(8, 18))]
+    text = " ".join(words).capitalize()
+    if rng.random() < 0.3:
+        text += f" [{rng.randint(1, citations)}]"
+    return text + "."
+
+
+def wrap(text, width=CHARS_PER_LINE):
+    lines, line = [], ""
+    for word in text.split():
+        if line and len(line) + len(word) + 1 > width:
+            lines.append(line)
+            line = word
+        else:
+            line = f"{line} {word}" if line else word
+    if line:
+        lines.append(line)
+    return lines
+
+
+def report_pages(page_count, seed=7):
+    """Text lines of each page of a synthetic report with page_count pages"""
+    rng = random.Random(seed)
+    citations = 30
+    body_pages = max(1, page_count - 2)
+    chapters = max(1, min(len(CHAPTER_TITLES), -(-body_pages // PAGES_PER_CHAPTER)))
+    chapter_starts = [round(index * body_pages / chapters) for index in range(chapters)]
+
+    pages = [[
+        "A STUDY OF DISTRIBUTED REPORT ANALYSIS SYSTEMS", "",
+        "A PROJECT REPORT SUBMITTED TO THE INSTITUTE OF ENGINEERING", "",
+        "IN PARTIAL FULFILLMENT OF THE REQUIREMENTS FOR THE DEGREE", "",
+        "BACHELOR OF ENGINEERING",
+    ]]
+    toc = ["2", "TABLE OF CONTENTS", ""]
+    for index, start in enumerate(chapter_starts):
+        toc.append(f"CHAPTER {index + 1}: {CHAPTER_TITLES[index]} {'.' * 20} {start + 3}")
+    pages.append(toc)
+
+    chapter = 0
+    section = 0
+    for body_index in range(body_pages):
+        page_number = body_index + 3
+        lines = [str(page_number)]
+        if chapter < chapters and body_index == chapter_starts[chapter]:
+            chapter += 1
+            section = 0
+            lines += [f"CHAPTER {chapter}", CHAPTER_TITLES[chapter - 1], ""]
+        while len(lines) < LINES_PER_PAGE:
+            # Headings only where they fit, so truncating the page never drops one
+            if rng.random() < 0.12 and len(lines) < LINES_PER_PAGE - 3:
+                section += 1
+                lines += ["", f"{chapter}.{section} {rng.choice(WORDS).capitalize()} {rng.choice(WORDS).capitalize()}"]
+            paragraph = " ".join(sentence(rng, citations) for _ in range(rng.randint(3, 6)))
+            lines += wrap(paragraph)
+        pages.append(lines[:LINES_PER_PAGE])
+
+    if page_count >= 3:
+        references = [str(page_count), "REFERENCES"]
+        references += [f"[{index}] A. Author, \"{sentence(rng, citations)[:-1]}\", Journal, {2000 + index}." for index in range(1, citations + 1)]
+        pages[-1] = references[:LINES_PER_PAGE]
+    return pages[:page_count]
+
+
+def escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(pages, path):
+    """Write pages of text lines as a minimal PDF with one Times-Roman font"""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        ("<< /Type /Pages /Kids [" + " ".join(f"{4 + 2 * index} 0 R" for index in range(len(pages)))
+         + f"] /Count {len(pages)} >>").encode(),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Times-Roman >>",
+    ]
+    for index, lines in enumerate(pages):
+        operations = ["BT /F1 12 Tf 72 750 Td 18 TL"] + [f"({escape(line)}) Tj T*" for line in lines] + ["ET"]
+        stream = "\n".join(operations).encode("latin-1", "replace")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * index} 0 R >>".encode()
+        )
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+    xref = len(output)
+    output += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for offset in offsets:
+        output += f"{offset:010d} 00000 n \n".encode()
+    output += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    with open(path, "wb") as f:
+        f.write(output)
+
+
+def make_report(page_count, output_dir, seed=7):
+    """Write a synthetic report and return its path; existing files are reused"""
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, f"report_{page_count}p_s{seed}.pdf")
+    if not os.path.exists(path):
+        write_pdf(report_pages(page_count, seed), path)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, nargs="+", default=[5, 50, 500])
+    parser.add_argument("--output", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "reports"))
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    for page_count in args.pages:
+        print(make_report(page_count, args.output, args.seed))
+
+
+if __name__ == "__main__":
+    main()
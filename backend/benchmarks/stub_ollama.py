@@ -0,0 +1,156 @@
+"""
+Stub Ollama Server
+Answers /api/generate and /api/tags like Ollama, with configurable latency,
+token rate and canned responses, so routing, load and failure handling can be
+exercised without a model. Structured requests get one violation per page in
+the prompt.
+
+Usage: python benchmarks/stub_ollama.py [--port 11434] [--delay 0.05] [--tokens-per-second 0]
+                                        [--fail-rate 0.0] [--responses FILE]
+"""
+
+import argparse
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+FREE_TEXT = "[ERROR] Font should be Times New Roman 12pt\n[WARNING] Grammar error - there is many"
+PAGE_REFERENCE = re.compile(r"(?:--- PAGE|Analyze Page) (\d+)")
+# Rough characters per token, for the counts reported back
+CHARS_PER_TOKEN = 4
+
+
+def stub_response(body, canned=None):
+    """Model output for a generate request"""
+    if not body.get("format"):
+        return canned.next() if canned is not None else FREE_TEXT
+    pages = [int(page) for page in PAGE_REFERENCE.findall(body.get("prompt", ""))] or [1]
+    violations = [{"page": page, "category": "ERROR", "message": "Font should be Times New Roman 12pt"} for page in pages]
+    violations.append({"page": pages[-1], "category": "WARNING", "message": "Grammar error - there is many"})
+    return json.dumps({"violations": violations})
+
+
+def generation_stats(prompt_chars, output_chars, elapsed, eval_seconds):
+    """Ollama's timing fields for a stub generation, durations in nanoseconds"""
+    return {
+        "prompt_eval_count": max(1, prompt_chars // CHARS_PER_TOKEN),
+        "prompt_eval_duration": int(max(elapsed - eval_seconds, 0) * 1e9) or 1000000,
+        "eval_count": max(1, output_chars // CHARS_PER_TOKEN),
+        "eval_duration": int(eval_seconds * 1e9) or 2000000,
+        "load_duration": 0,
+        "total_duration": int(elapsed * 1e9) or 3000000,
+    }
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    delay = 0.05
+    tokens_per_second = 0.0
+    fail_rate = 0.0
+    canned = None
+
+    def log_message(self, *args):
+        pass
+
+    def send_json(self, status, data):
+        encoded = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(encoded)))
+        self.end_headers()
+        self.wfile.write(encoded)
+
+    def send_chunk(self, data):
+        encoded = (json.dumps(data) + "\n").encode("utf-8")
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(encoded), encoded))
+
+    def token_seconds(self, text):
+        if not self.tokens_per_second:
+            return 0.0
+        return max(1, len(text) // CHARS_PER_TOKEN) / self.tokens_per_second
+
+    def do_GET(self):
+        if self.path.startswith("/api/tags"):
+            self.send_json(200, {"models": []})
+        else:
+            self.send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        started = time.perf_counter()
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if not self.path.startswith("/api/generate"):
+            self.send_json(404, {"error": "not found"})
+            return
+        time.sleep(self.delay)
+        if random.random() < self.fail_rate:
+            self.send_json(500, {"error": "stub failure"})
+            return
+
+        text = stub_response(body, self.canned)
+        prompt_chars = len(body.get("prompt", "")) + len(body.get("system") or "")
+        eval_seconds = self.token_seconds(text)
+        if not body.get("stream"):
+            time.sleep(eval_seconds)
+            stats = generation_stats(prompt_chars, len(text), time.perf_counter() - started, eval_seconds)
+            self.send_json(200, {"response": text, "done": True, **stats})
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        words = text.split(" ")
+        for word in words:
+            time.sleep(eval_seconds / len(words))
+            self.send_chunk({"response": word + " ", "done": False})
+        stats = generation_stats(prompt_chars, len(text), time.perf_counter() - started, eval_seconds)
+        self.send_chunk({"response": "", "done": True, **stats})
+        self.wfile.write(b"0\r\n\r\n")
+
+
+class CannedResponses:
+    """Cycles through free-text responses loaded from a JSON list of strings"""
+
+    def __init__(self, path):
+        with open(path, "r", encoding="utf-8") as f:
+            self.cycle = itertools.cycle(json.load(f))
+        self.lock = threading.Lock()
+
+    def next(self):
+        with self.lock:
+            return next(self.cycle)
+
+
+def make_server(port, delay=0.05, tokens_per_second=0.0, fail_rate=0.0, responses=None, host="127.0.0.1"):
+    handler = type("Handler", (StubHandler,), {
+        "delay": delay,
+        "tokens_per_second": tokens_per_second,
+        "fail_rate": fail_rate,
+        "canned": CannedResponses(responses) if responses else None,
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def serve(port, delay=0.05, tokens_per_second=0.0, fail_rate=0.0, responses=None, host="127.0.0.1"):
+    make_server(port, delay, tokens_per_second, fail_rate, responses, host).serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--delay", type=float, default=0.05, help="fixed seconds per generate request, like prompt evaluation")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="simulated generation rate; 0 answers at once")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="fraction of requests answered with HTTP 500")
+    parser.add_argument("--responses", help="JSON list of free-text responses to cycle through")
+    args = parser.parse_args()
+    print(f"Stub Ollama listening on 127.0.0.1:{args.port}")
+    serve(args.port, args.delay, args.tokens_per_second, args.fail_rate, args.responses)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,35 @@
-from fastapi import FastAPI, File, UploadFile
+from typing import List
+from fastapi import FastAPI, File, Form, Request, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 import os
 import logging
 import asyncio
-import re
-from concurrent.futures import ThreadPoolExecutor
+import json
+import math
+import time
+from collections import deque
+from contextlib import AsyncExitStack, ExitStack
 from dotenv import load_dotenv
-from utils.pdf_reader import extract_text_with_pages
-from utils.ollama_client import ask_ollama_fast
+from utils.pdf_reader import PageStream, extract_text_cached, extraction_cache, shutdown_process_pool
+from utils.timing import PipelineTimer
+from utils.text_normalizer import PageNormalizer, normalize_pages
+from utils.upload import receive_upload, UploadTooLarge, UploadLimitMiddleware, UPLOAD_MAX_BYTES, UPLOAD_MEMORY_THRESHOLD
+from utils.ollama_client import ask_ollama_fast, close_client, OllamaError, OllamaTimeout, LatencyTracker, response_cache, generation_stats, GenerationStats, MODEL_NAME, OLLAMA_MAX_CONNECTIONS, OLLAMA_NUM_CTX
+from utils.llm_scheduler import llm_scheduler, SchedulerOverloaded
+from utils.backend_pool import backend_pool
+from utils.rule_engine import run_rule_checks, is_trivial_page, RULE_ENGINE_ENABLED
+from utils.violation_classifier import violation_classifier, strip_severity_tag
+from utils.job_queue import job_queue, JOB_MODES
+from utils.metrics import metrics, StageTimings, timed, request_seconds, cancelled_analyses, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from utils.result_spool import JsonlSpool, iter_json_chunks
+from utils.result_payload import FastJSONResponse, dumps, compact_summary, paginate_results, RESULTS_PAGE_LIMIT, RESULTS_MAX_LIMIT
+from utils.bulk_upload import BulkSubmission, BulkSubmissionError, CohortSummary, BULK_CONCURRENCY, BULK_MAX_BYTES
+from utils.compression import CompressionMiddleware
+from utils.analysis_store import analysis_store, page_fingerprint, new_analysis_id, is_analysis_id, save_analysis, load_analysis, save_results, load_results, PageAligner
+from utils.cancellation import running_analyses, AnalysisCancelled
 from prompt import prompt_manager, result_formatter
+from prompt.response_parser import parse_response, format_violation, group_by_page, STRUCTURED_OUTPUT, VIOLATION_SCHEMA, NO_VIOLATIONS
 
 # Load environment variables
 load_dotenv()
@@ -16,14 +37,57 @@ load_dotenv()
 # Configuration from environment variables
 ANALYSIS_TIMEOUT_SECONDS = int(os.getenv("ANALYSIS_TIMEOUT_SECONDS", 60))
 TEMPERATURE = float(os.getenv("TEMPERATURE", 0.1))
-# No worker limits - process everything simultaneously
+# Tokens reserved for the model's answer in each /analyze-batch chunk
+BATCH_RESPONSE_TOKENS = int(os.getenv("BATCH_RESPONSE_TOKENS", 1024))
+# JSON schema sent with every analysis request in structured mode
+RESPONSE_FORMAT = VIOLATION_SCHEMA if STRUCTURED_OUTPUT else None
+# Streamed token fragments between progress events on /analyze/stream
+PROGRESS_TOKEN_INTERVAL = int(os.getenv("PROGRESS_TOKEN_INTERVAL", 25))
+# Pages extracted but not yet written out at any time in bounded mode (/analyze?bounded=true)
+BOUNDED_MAX_IN_FLIGHT = int(os.getenv("BOUNDED_MAX_IN_FLIGHT", 16))
 CORS_ORIGINS = os.getenv("CORS_ORIGINS", "http://localhost:3000").split(",")
-TEMP_DIR = os.getenv("TEMP_DIR", "temp")
 
-app = FastAPI()
+# Once this share of a document's pages has finished, the remaining pages are given up on
+# as timed out when none of them finishes within the straggler grace period
+STRAGGLER_QUORUM = float(os.getenv("STRAGGLER_QUORUM", 0.9))
+# 0 sets the grace period to twice the observed p95 page latency
+STRAGGLER_GRACE_SECONDS = float(os.getenv("STRAGGLER_GRACE_SECONDS", 0))
+
+# Observed generation latencies, which set adaptive timeouts and hedging per endpoint
+page_latency = LatencyTracker()
+batch_latency = LatencyTracker()
+
+# Responses are encoded with orjson when it is installed
+app = FastAPI(default_response_class=FastJSONResponse)
 
 logging.basicConfig(level=logging.INFO, format="[%(asctime)s] %(levelname)s in %(module)s: %(message)s")
 
+# Point-in-time values read on each /metrics scrape
+metrics.gauge("tu_llm_in_flight", "Generation calls holding a scheduler slot", lambda: llm_scheduler.active)
+metrics.gauge("tu_llm_queue_depth", "Generation calls waiting for a scheduler slot", lambda: llm_scheduler.queued)
+metrics.gauge(
+    "tu_backend_in_flight", "Requests in flight on each Ollama backend",
+    lambda: {(backend.base_url,): backend.in_flight for backend in backend_pool.backends}, labels=("backend",)
+)
+metrics.gauge(
+    "tu_backend_healthy", "Whether each Ollama backend is receiving requests",
+    lambda: {(backend.base_url,): int(backend.healthy) for backend in backend_pool.backends}, labels=("backend",)
+)
+metrics.gauge("tu_running_analyses", "Analyses in progress that can be cancelled", lambda: len(running_analyses))
+metrics.gauge(
+    "tu_jobs", "Analysis jobs in the queue by status",
+    lambda: {(status,): count for status, count in job_queue.stats().items() if status != "workers"}, labels=("status",)
+)
+
+# Oversized uploads are refused while they are received, before the form is parsed
+app.add_middleware(UploadLimitMiddleware, limits={
+    "/analyze": UPLOAD_MAX_BYTES,
+    "/analyze/stream": UPLOAD_MAX_BYTES,
+    "/analyze-batch": UPLOAD_MAX_BYTES,
+    "/analyze-bulk": BULK_MAX_BYTES,
+    "/jobs": UPLOAD_MAX_BYTES,
+})
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -33,31 +97,69 @@ app.add_middleware(
     allow_headers=["*"],  # Allow all headers
 )
 
-# Dynamic executor - creates workers based on document size
+# gzip, or brotli when installed, for responses large enough to benefit
+app.add_middleware(CompressionMiddleware)
+
+def sync_prompt_templates():
+    """Reload changed rule templates and drop cached responses built from old ones"""
+    prompt_manager.refresh_templates()
+    response_cache.set_version(prompt_manager.templates_version)
+
+
+@app.on_event("startup")
+async def startup_response_cache():
+    # Purge persisted responses generated with different rule files
+    sync_prompt_templates()
+    backend_pool.start_health_checks()
+
+
+@app.on_event("shutdown")
+async def shutdown_ollama_client():
+    # Release pooled keep-alive connections to Ollama
+    await backend_pool.stop_health_checks()
+    await close_client()
+    shutdown_process_pool()
 
 
+def overloaded_response(error):
+    """Build a 429 response telling the client when to retry"""
+    return JSONResponse(
+        status_code=429,
+        content={"error": str(error), "retry_after": error.retry_after},
+        headers={"Retry-After": str(error.retry_after)},
+    )
+
+
+def claim_analysis_id(requested):
+    """The ID for a new analysis: the client's choice if given, else a fresh one
+
+    Returns (analysis_id, None), or (None, error response) when the requested
+    ID is malformed or already in use.
+    """
+    if requested is None:
+        return new_analysis_id(), None
+    if not is_analysis_id(requested):
+        return None, JSONResponse(status_code=400, content={"error": "analysis_id must be 32 lowercase hexadecimal characters"})
+    if requested in running_analyses or load_results(requested) is not None:
+        return None, JSONResponse(status_code=409, content={"error": f"Analysis {requested} already exists"})
+    return requested, None
+
+def cancelled_response(error):
+    """Response for an analysis cancelled before it finished"""
+    logging.info(str(error))
+    return JSONResponse(status_code=409, content={"error": "Analysis cancelled", "analysis_id": error.analysis_id, "reason": error.reason})
+
 class ErrorCategorizer:
     """Simple error categorizer for TU format violations"""
     
     @staticmethod
     def categorize_all_errors(errors_with_pages):
         """Categorize errors into structure, grammar, and enhancement phases"""
-        categorized = {
-            "structure": [],
-            "grammar": [],
-            "enhancement": []
-        }
+        categorized = {name: [] for name in violation_classifier.category_names}
         
         for error in errors_with_pages:
-            text_lower = error['text'].lower()
-            
-            # Categorize based on keywords
-            if any(word in text_lower for word in ['structure', 'format', 'alignment', 'citation', 'numbering', 'margin', 'font']):
-                categorized["structure"].append(error)
-            elif any(word in text_lower for word in ['grammar', 'spelling', 'language', 'tense', 'punctuation']):
-                categorized["grammar"].append(error)
-            else:
-                categorized["enhancement"].append(error)
+            category, _ = violation_classifier.classify(error['text'])
+            categorized[category].append(error)
         
         return categorized
     
@@ -65,15 +167,48 @@ class ErrorCategorizer:
     def get_phase_summary(categorized_errors):
         """Get summary of errors by phase"""
         return {
-            "phase_1_structure": len(categorized_errors["structure"]),
-            "phase_2_grammar": len(categorized_errors["grammar"]),
-            "phase_3_enhancement": len(categorized_errors["enhancement"])
+            f"phase_{number}_{name}": len(categorized_errors[name])
+            for number, name in enumerate(violation_classifier.category_names, 1)
+        }
+
+class RunningSummary:
+    """Summary counts of a bounded-mode analysis, updated as each page result is written out"""
+    
+    def __init__(self):
+        self.pages = 0
+        self.issues = 0
+        self.phase_counts = {name: 0 for name in violation_classifier.category_names}
+        self.failed_pages = []
+    
+    def add_result(self, result):
+        self.pages += 1
+        if not result["success"]:
+            self.failed_pages.append(result["page"])
+        for text in result["violations"]:
+            self.add_violation(text)
+    
+    def add_violation(self, text):
+        category, _ = violation_classifier.classify(text)
+        self.phase_counts[category] += 1
+        self.issues += 1
+    
+    def phase_summary(self):
+        """Same shape as ErrorCategorizer.get_phase_summary"""
+        return {
+            f"phase_{number}_{name}": self.phase_counts[name]
+            for number, name in enumerate(violation_classifier.category_names, 1)
         }
 
 @app.get("/")
 async def root():
     return {"message": "TU Report Analyzer Backend is running"}
 
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus metrics for this API process"""
+    # Rendered in a thread because the job gauge queries the SQLite queue
+    return PlainTextResponse(await asyncio.to_thread(metrics.render), media_type=METRICS_CONTENT_TYPE)
+
 @app.get("/health")
 async def health_check():
     return {
@@ -82,402 +217,969 @@ async def health_check():
             "timeout_seconds": ANALYSIS_TIMEOUT_SECONDS,
             "temperature": TEMPERATURE,
             "model": os.getenv("OLLAMA_MODEL", "llama3.2:3b"),
-            "max_workers": "unlimited (dynamic)"
-        }
+            "max_connections": OLLAMA_MAX_CONNECTIONS
+        },
+        "scheduler": llm_scheduler.stats(),
+        "backends": backend_pool.stats(),
+        "llm_cache": response_cache.stats(),
+        "extraction_cache": extraction_cache.stats(),
+        "generation": generation_stats.summary(),
+        "analysis_store": analysis_store.stats(),
+        "jobs": await asyncio.to_thread(job_queue.stats),
+        "latency": {"page": page_latency.stats(), "batch": batch_latency.stats()}
     }
 
-def analyze_single_page(page_data):
+async def analyze_single_page(page_data, tenant, on_token=None, stats=None, timings=None):
     """Analyze a single page - optimized for parallel processing"""
     page = page_data['page']
     text = page_data['text']
     
+    # Blank and near-empty pages have nothing for the model to judge
+    if RULE_ENGINE_ENABLED and is_trivial_page(text):
+        return {"page": page, "analysis": NO_VIOLATIONS, "success": True, "skipped": True}
+    
     # Get prompt from template
-    prompt = prompt_manager.get_single_page_analysis_prompt(page, text)
+    with timed("prompt_build", timings):
+        prompt = prompt_manager.get_single_page_analysis_prompt(page, text)
     try:
-        ai_response = ask_ollama_fast(
+        ai_response = await llm_scheduler.run(
+            tenant,
+            ask_ollama_fast,
             prompt,
             temperature=TEMPERATURE, 
-            timeout_seconds=ANALYSIS_TIMEOUT_SECONDS
+            timeout_seconds=ANALYSIS_TIMEOUT_SECONDS,
+            on_token=on_token,
+            response_format=RESPONSE_FORMAT,
+            system=prompt_manager.system_prompt,
+            stats=stats,
+            latency=page_latency
         )
         return {"page": page, "analysis": ai_response, "success": True}
     except Exception as e:
+        # Failed pages are flagged rather than failing the whole document
         logging.error(f"Error analyzing page {page}: {str(e)}")
-        return {"page": page, "analysis": f"Error: {str(e)}", "success": False}
+        return failed_page_result(page, e)
+
+def failed_page_result(page, error):
+    """Result for a page whose analysis failed, flagged with the error and its type"""
+    return {
+        "page": page,
+        "analysis": f"Error: {str(error)}",
+        "success": False,
+        "error": str(error),
+        "error_type": type(error).__name__
+    }
+
+async def reuse_page_result(page_data, stored):
+    """Return an earlier analysis of an unchanged page under its new page number"""
+    return {**stored["result"], "page": page_data["page"], "reused_from": stored["page"]}
+
+def analysis_version():
+    """Stored results are only reused while the rules and model are unchanged"""
+    return f"{prompt_manager.templates_version}:{MODEL_NAME}"
+
+def extract_page_violations(result, timings=None):
+    """Parse a page's model response into its individual violation messages"""
+    with timed("response_parse", timings):
+        violations, _ = parse_response(result["analysis"], [result["page"]])
+    return [format_violation(violation) for violation in violations]
+
+def check_document_rules(pages):
+    """Run the local rule engine over normalized pages, returning (violations, rule_checks info)"""
+    if not RULE_ENGINE_ENABLED:
+        return [], {"enabled": False}
+    started = time.perf_counter()
+    violations = run_rule_checks(pages)
+    return violations, {
+        "enabled": True,
+        "violations": len(violations),
+        # Pages the font, margin and line-spacing checks could measure
+        "layout_pages": sum(1 for page_data in pages if page_data.get("layout")),
+        "skipped_pages": [page_data["page"] for page_data in pages if is_trivial_page(page_data["text"])],
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)
+    }
+
+def build_analysis_summary(results, rule_violations=(), timings=None):
+    """Turn per-page analysis results and rule engine violations into the categorized summary response"""
+    all_error_messages = []
+    successful_results = []
+    errors_with_pages = []
+    
+    # Deterministic checks come first; they use the same {"text", "page"} shape
+    for violation in rule_violations:
+        all_error_messages.append(violation["text"])
+        errors_with_pages.append(violation)
+    
+    for result in results:
+        if isinstance(result, Exception):
+            logging.error(f"Task failed with exception: {result}")
+            continue
+            
+        successful_results.append(result)
+        
+        if result.get("success", False):
+            # Add cleaned violations to the list with page numbers
+            for line in extract_page_violations(result, timings):
+                all_error_messages.append(line)
+                errors_with_pages.append({
+                    'text': line,
+                    'page': result["page"]
+                })
+    
+    # Categorize errors into 3 phases
+    categorized_errors = ErrorCategorizer.categorize_all_errors(errors_with_pages)
+    phase_summary = ErrorCategorizer.get_phase_summary(categorized_errors)
+    
+    # Create formatted analysis summary
+    return result_formatter.create_analysis_summary(
+        successful_results, 
+        all_error_messages, 
+        categorized_errors, 
+        phase_summary
+    )
+
+def failed_pages(results):
+    """Page numbers whose analysis failed"""
+    return sorted(
+        result["page"] for result in results
+        if isinstance(result, dict) and not result.get("success", False)
+    )
+
+def timing_breakdown(timings, generation):
+    """Per-stage durations for the opt-in "timings" response field"""
+    breakdown = timings.summary()
+    if generation.calls:
+        summary = generation.summary()
+        breakdown["ollama_call"] = {"count": generation.calls, "total_ms": summary["call_ms"], "max_ms": summary["max_call_ms"]}
+    return breakdown
+
+def straggler_grace():
+    """Seconds to wait for the next page to finish once the straggler quorum is reached"""
+    if STRAGGLER_GRACE_SECONDS > 0:
+        return STRAGGLER_GRACE_SECONDS
+    observed = page_latency.percentile(95)
+    return ANALYSIS_TIMEOUT_SECONDS if observed is None else min(ANALYSIS_TIMEOUT_SECONDS, 2 * observed)
+
+async def wait_for_pages(tasks, pages):
+    """Collect page task results in order without waiting indefinitely on stragglers
+
+    Like gather(return_exceptions=True), until STRAGGLER_QUORUM of the pages
+    have finished; after that, if no page finishes for straggler_grace()
+    seconds, the remaining tasks are cancelled and flagged as timed out.
+    """
+    pending = set(tasks)
+    quorum = math.ceil(len(tasks) * STRAGGLER_QUORUM)
+    while pending:
+        timeout = straggler_grace() if len(tasks) - len(pending) >= quorum else None
+        done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        if not done:
+            logging.warning(f"Giving up on {len(pending)} straggling pages after {timeout:.1f}s without progress")
+            break
+    results = []
+    for task, page_data in zip(tasks, pages):
+        if task in pending:
+            task.cancel()
+            results.append(failed_page_result(page_data["page"], OllamaTimeout(
+                "Error during analysis: page did not finish before the rest of the document"
+            )))
+        else:
+            results.append(task.exception() or task.result())
+    return results
+
+def progress_counter(on_progress, total):
+    """Done-callback for page tasks that reports (completed, total) to on_progress
+
+    Cancelled tasks are not counted; a page whose analysis raised still finished.
+    """
+    state = {"completed": 0}
+    def on_done(task):
+        if task.cancelled():
+            return
+        state["completed"] += 1
+        on_progress(state["completed"], total)
+    return on_done
+
+async def analyze_bounded_page(page_data, tenant, stats=None, timings=None):
+    """Analyze a page for bounded mode, keeping its parsed violations and dropping the raw model output"""
+    result = await analyze_single_page(page_data, tenant, stats=stats, timings=timings)
+    compact = {
+        "page": result["page"],
+        "success": result["success"],
+        "violations": extract_page_violations(result, timings) if result["success"] else []
+    }
+    for key in ("skipped", "error", "error_type"):
+        if key in result:
+            compact[key] = result[key]
+    return compact
+
+def categorized_violations(category, rule_violations, results):
+    """Yield one category's violations, rule engine first, reading page results back from their spool"""
+    for violation in rule_violations:
+        if violation_classifier.classify(violation["text"])[0] == category:
+            yield violation
+    for result in results:
+        for text in result["violations"]:
+            if violation_classifier.classify(text)[0] == category:
+                yield {"text": text, "page": result["page"]}
+
+async def run_bounded_analysis(source, sha256, stack, timings=None):
+    """Analyze a PDF page by page with at most BOUNDED_MAX_IN_FLIGHT pages held in memory
+
+    Normalized pages and compact per-page results are spilled to JsonlSpools
+    registered on stack, and the summary is built from running counters. The
+    returned summary's "results" and "categorized_results" are lazy and read
+    the spools back, so it must be encoded with iter_json_chunks before stack
+    is closed. Stored analyses are not written or reused in this mode.
+    """
+    timer = PipelineTimer()
+    sync_prompt_templates()
+    pages = stack.enter_context(JsonlSpool("pages_"))
+    results = stack.enter_context(JsonlSpool("results_"))
+    running = RunningSummary()
+    
+    timer.mark("extraction_started")
+    stream = await PageStream(source, sha256, retain=False).open()
+    logging.info(f"Analyzing {stream.page_count} pages in bounded mode, at most {BOUNDED_MAX_IN_FLIGHT} in flight")
+    
+    normalizer = PageNormalizer()
+    generation = GenerationStats()
+    window = deque()
+    
+    def write_out(result):
+        results.append(result)
+        running.add_result(result)
+    
+    # Only the window's calls are ever queued, so that is all the scheduler admits
+    async with llm_scheduler.session(min(stream.page_count, BOUNDED_MAX_IN_FLIGHT)) as tenant:
+        try:
+            async for page_data in normalizer.stream(stream):
+                timer.mark("first_page_extracted")
+                timer.mark("analysis_started")
+                pages.append({"page": page_data["page"], "text": page_data["text"], "layout": page_data.get("layout")})
+                window.append(asyncio.create_task(analyze_bounded_page(page_data, tenant, stats=generation, timings=timings)))
+                # Results are written out in page order; extraction waits while the window is full
+                while window and (len(window) >= BOUNDED_MAX_IN_FLIGHT or window[0].done()):
+                    write_out(await window.popleft())
+            timer.mark("extraction_finished")
+            while window:
+                write_out(await window.popleft())
+            timer.mark("analysis_finished")
+        finally:
+            for task in window:
+                task.cancel()
+    
+    pipeline_timings = timer.summary()
+    logging.info(f"Pipeline timings: {pipeline_timings}")
+    if timings is not None:
+        timings.record("extraction", stream.extraction_seconds)
+    
+    rule_violations, rule_checks = check_document_rules(pages)
+    for violation in rule_violations:
+        running.add_violation(violation["text"])
+    
+    summary = {
+        "overall_summary": result_formatter.format_overall_summary(running.pages, running.issues, running.phase_counts),
+        "total_pages_analyzed": running.pages,
+        "total_errors_found": running.issues,
+        "phase_summary": running.phase_summary(),
+        "mode": "bounded",
+        "max_in_flight": BOUNDED_MAX_IN_FLIGHT,
+        "rule_checks": rule_checks,
+        "failed_pages": running.failed_pages,
+        "partial": bool(running.failed_pages),
+        "prompt_eval": generation.summary(),
+        "extraction_cache_hit": stream.cache_hit,
+        "pipeline_timings": pipeline_timings,
+        "token_counts": normalizer.report()
+    }
+    if timings is not None:
+        summary["timings"] = timing_breakdown(timings, generation)
+    # Large arrays go last and are streamed from the spools
+    summary["categorized_results"] = {
+        name: categorized_violations(name, rule_violations, results)
+        for name in violation_classifier.category_names
+    }
+    summary["results"] = results
+    return summary
+
+def stream_spooled_json(summary, stack):
+    """Encode a bounded-mode summary in chunks, removing its spools once sent"""
+    try:
+        yield from iter_json_chunks(summary)
+    finally:
+        stack.close()
+
+async def run_page_analysis(source, sha256, previous_analysis_id=None, on_progress=None, timings=None, analysis_id=None):
+    """Extract and analyze a PDF page by page, returning the summary response
+
+    source is a file path or the PDF bytes. on_progress is called with
+    (completed, total) pages as each page finishes. Passing a StageTimings
+    adds its per-stage breakdown to the response as "timings". Results are
+    stored under analysis_id, or a new ID when none is given.
+    """
+    timer = PipelineTimer()
+    sync_prompt_templates()
+    
+    # A revised upload reuses the stored results of its unchanged pages
+    aligner = None
+    if previous_analysis_id:
+        previous_pages = load_analysis(previous_analysis_id, analysis_version())
+        if previous_pages is None:
+            logging.info(f"Previous analysis {previous_analysis_id} not found or outdated, analyzing every page")
+        else:
+            aligner = PageAligner(previous_pages)
+    
+    timer.mark("extraction_started")
+    stream = await PageStream(source, sha256).open()
+    extraction_cache_hit = stream.cache_hit
+    
+    # Pages share the process-wide scheduler slots fairly with other uploads
+    logging.info(f"Queueing analysis of {stream.page_count} pages as they are extracted (cache hit: {extraction_cache_hit})")
+    
+    async with llm_scheduler.session(stream.page_count) as tenant:
+        tasks = []
+        pages = []
+        fingerprints = []
+        normalizer = PageNormalizer()
+        generation = GenerationStats()
+        on_done = progress_counter(on_progress, stream.page_count) if on_progress else None
+        try:
+            # Each page is normalized and sent to the model as soon as its text is ready
+            async for page_data in normalizer.stream(stream):
+                timer.mark("first_page_extracted")
+                timer.mark("analysis_started")
+                pages.append(page_data)
+                fingerprint = page_fingerprint(page_data["text"])
+                fingerprints.append(fingerprint)
+                stored = None
+                if aligner is not None and not is_trivial_page(page_data["text"]):
+                    stored = aligner.match(fingerprint)
+                if stored is not None:
+                    task = asyncio.create_task(reuse_page_result(page_data, stored))
+                else:
+                    task = asyncio.create_task(analyze_single_page(page_data, tenant, stats=generation, timings=timings))
+                if on_done is not None:
+                    task.add_done_callback(on_done)
+                tasks.append(task)
+            timer.mark("extraction_finished")
+            results = await wait_for_pages(tasks, pages)
+            timer.mark("analysis_finished")
+        finally:
+            for task in tasks:
+                task.cancel()
+    
+    pipeline_timings = timer.summary()
+    logging.info(f"Pipeline timings: {pipeline_timings}")
+    if timings is not None:
+        timings.record("extraction", stream.extraction_seconds)
+    
+    analysis_id = analysis_id or new_analysis_id()
+    save_analysis(analysis_id, analysis_version(), [
+        {"page": result["page"], "fingerprint": fingerprint, "result": result}
+        for result, fingerprint in zip(results, fingerprints)
+        # Model failures are not worth keeping; those pages are retried next time
+        if not isinstance(result, Exception) and result.get("success")
+    ])
+    reused_pages = [result["page"] for result in results if isinstance(result, dict) and "reused_from" in result]
+    logging.info(f"Stored analysis {analysis_id}, reused {len(reused_pages)} of {len(results)} pages")
+    
+    # Create formatted analysis summary
+    rule_violations, rule_checks = check_document_rules(pages)
+    summary = build_analysis_summary(results, rule_violations, timings)
+    if "error" not in summary:
+        summary["analysis_id"] = analysis_id
+        summary["previous_analysis_id"] = previous_analysis_id if aligner is not None else None
+        summary["recomputed_pages"] = [page_data["page"] for page_data in pages if page_data["page"] not in reused_pages]
+        summary["reused_pages"] = reused_pages
+        summary["rule_checks"] = rule_checks
+        summary["failed_pages"] = failed_pages(results)
+        summary["partial"] = bool(summary["failed_pages"])
+        summary["prompt_eval"] = generation.summary()
+        summary["extraction_cache_hit"] = extraction_cache_hit
+        summary["pipeline_timings"] = pipeline_timings
+        summary["token_counts"] = normalizer.report()
+        if timings is not None:
+            summary["timings"] = timing_breakdown(timings, generation)
+        save_results(analysis_id, compact_summary(summary))
+    return summary
+
+def summary_response(summary, compact=False):
+    """Encode an analysis summary, in the compact schema if asked for"""
+    if compact and "error" not in summary:
+        summary = compact_summary(summary)
+    return FastJSONResponse(summary)
 
 @app.post("/analyze")
-async def analyze_pdf(file: UploadFile = File(...)):
+async def analyze_pdf(request: Request, file: UploadFile = File(...), previous_analysis_id: str = Form(None), analysis_id: str = Form(None),
+                      timings: bool = False, bounded: bool = False, compact: bool = False):
+    """Page-by-page analysis endpoint
+
+    bounded=true keeps memory flat for very large PDFs: pages and results are
+    spilled to disk and the JSON response is streamed from there. compact=true
+    returns the compact schema, which lists each violation text once; it does
+    not apply to bounded responses. A client that may cancel the analysis with
+    DELETE /analyses/{id} before it finishes can choose its analysis_id.
+    """
+    started = time.perf_counter()
+    spools = ExitStack()
     try:
         if not file.filename:
             return {"error": "No file provided"}
+        analysis_id, error = claim_analysis_id(analysis_id)
+        if error is not None:
+            return error
         
-        file_path = f"{TEMP_DIR}/{file.filename}"
-        os.makedirs(TEMP_DIR, exist_ok=True)
-        
-        with open(file_path, "wb") as f:
-            f.write(await file.read())
-        logging.info(f"Received file '{file.filename}' saved to {file_path}")
+        stage_timings = StageTimings() if timings else None
+        # Analysis stops if the client disconnects or the analysis is deleted
+        with running_analyses.track(analysis_id, "analyze") as scope:
+            # Stream the upload; any temporary file is removed when analysis ends.
+            # Bounded mode always spills it so the PDF is read from disk as pages are needed
+            async with receive_upload(file, memory_threshold=0 if bounded else UPLOAD_MEMORY_THRESHOLD) as upload:
+                logging.info(f"Received file '{file.filename}' ({upload.size} bytes, in memory: {upload.in_memory})")
+                if stage_timings is not None:
+                    stage_timings.record("upload", upload.seconds)
+                if bounded:
+                    analysis = run_bounded_analysis(upload.source, upload.sha256, spools, timings=stage_timings)
+                else:
+                    analysis = run_page_analysis(upload.source, upload.sha256, previous_analysis_id, timings=stage_timings, analysis_id=analysis_id)
+                summary = await scope.run(analysis, request.receive)
+        request_seconds.observe(time.perf_counter() - started, endpoint="analyze")
+        if bounded:
+            # The spools now belong to the response and are removed once it is sent
+            return StreamingResponse(stream_spooled_json(summary, spools.pop_all()), media_type="application/json")
+        return summary_response(summary, compact)
+    except UploadTooLarge as e:
+        return JSONResponse(status_code=413, content={"error": str(e)})
+    except AnalysisCancelled as e:
+        return cancelled_response(e)
+    except SchedulerOverloaded as e:
+        logging.warning(f"Rejected analysis: {str(e)}")
+        return overloaded_response(e)
+    except Exception as e:
+        logging.exception("Analysis failed")
+        return {"error": f"Analysis failed: {str(e)}"}
+    finally:
+        spools.close()
 
-        pages = extract_text_with_pages(file_path)
-        logging.info(f"Extracted {len(pages)} pages from PDF")
-        
-        # Parallel processing of pages - ALL PAGES SIMULTANEOUSLY
-        logging.info(f"Starting simultaneous analysis of ALL {len(pages)} pages")
+def sse_event(event, data):
+    """Format one Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def stream_analysis_events(stack, stream, tenant, scope, progress):
+    """Yield SSE messages for each page as it finishes, then the overall summary
+
+    Cancelling scope ends the stream with a "cancelled" event; a client
+    disconnect stops the analysis as well.
+    """
+    timer = PipelineTimer()
+    events = asyncio.Queue()
+    tasks = []
+    watchers = []
+    completed = False
+    pages = []
+    normalizer = PageNormalizer()
+    generation = GenerationStats()
+    
+    def token_reporter(page):
+        # Report every PROGRESS_TOKEN_INTERVAL fragments to keep the stream light
+        state = {"tokens": 0}
+        def on_token(fragment):
+            state["tokens"] += 1
+            if state["tokens"] % PROGRESS_TOKEN_INTERVAL == 0:
+                events.put_nowait(("progress", {"page": page, "tokens": state["tokens"]}))
+        return on_token
+    
+    async def analyze_and_report(page_data):
+        on_token = token_reporter(page_data["page"]) if progress else None
+        result = await analyze_single_page(page_data, tenant, on_token, generation)
+        events.put_nowait(("page", result))
+        return result
+    
+    async def feed_pages():
+        timer.mark("extraction_started")
+        async for page_data in normalizer.stream(stream):
+            timer.mark("analysis_started")
+            pages.append(page_data)
+            tasks.append(asyncio.create_task(analyze_and_report(page_data)))
+        timer.mark("extraction_finished")
+    
+    try:
+        yield sse_event("start", {
+            "analysis_id": scope.analysis_id,
+            "total_pages": stream.page_count,
+            "extraction_cache_hit": stream.cache_hit
+        })
         
-        # Create dynamic executor with enough workers for all pages
-        with ThreadPoolExecutor(max_workers=len(pages)) as dynamic_executor:
-            loop = asyncio.get_event_loop()
-            tasks = []
-            
-            for page_data in pages:
-                task = loop.run_in_executor(
-                    dynamic_executor, 
-                    analyze_single_page, 
-                    page_data
-                )
-                tasks.append(task)
+        feeder = asyncio.create_task(feed_pages())
+        cancelled = asyncio.create_task(scope.cancelled.wait())
+        watchers.extend([feeder, cancelled])
+        results = []
+        while len(results) < stream.page_count:
+            getter = asyncio.create_task(events.get())
+            # Once extraction has finished only page events and cancellation are awaited
+            waiting = {getter, cancelled} if feeder.done() else {getter, cancelled, feeder}
+            done, _ = await asyncio.wait(waiting, return_when=asyncio.FIRST_COMPLETED)
+            if cancelled in done:
+                getter.cancel()
+                completed = True
+                yield sse_event("cancelled", {"analysis_id": scope.analysis_id, "reason": scope.reason})
+                return
+            if getter not in done:
+                getter.cancel()
+                # Extraction ended - surface its error, otherwise keep waiting on pages
+                feeder.result()
+                continue
             
-            # Wait for all tasks to complete
-            results = await asyncio.gather(*tasks, return_exceptions=True)
-        
-        # Process results
-        all_error_messages = []
-        successful_results = []
-        errors_with_pages = []
-        
-        for result in results:
-            if isinstance(result, Exception):
-                logging.error(f"Task failed with exception: {result}")
+            event, data = getter.result()
+            if event == "progress":
+                yield sse_event("progress", data)
                 continue
-                
-            successful_results.append(result)
             
-            if result.get("success", False):
-                ai_response = result["analysis"]
-                page_number = result["page"]
-                
-                # Check if violations were found and extract them
-                if "No TU format violations detected" not in ai_response:
-                    # Clean up the response to extract only error messages
-                    violations = ai_response.strip()
-                    
-                    # Remove common introductory phrases
-                    phrases_to_remove = [
-                        f"After analyzing page {result['page']}",
-                        f"After analyzing the content of page {result['page']}",
-                        f"After analyzing the provided content for Page {result['page']}",
-                        "I have identified the following violations of TU format standards:",
-                        "I found the following violations of TU format standards:",
-                        "the following TU format standard violations were found:",
-                        "Violations found:",
-                        "No other violations were detected on this page.",
-                        "No other violations of TU format standards were detected on this page.",
-                        "No TU format violations detected on this page."
-                    ]
-                    
-                    for phrase in phrases_to_remove:
-                        violations = violations.replace(phrase, "")
-                    
-                    # Split by numbered points and clean up
-                    lines = violations.split('\n')
-                    cleaned_lines = []
-                    for line in lines:
-                        line = line.strip()
-                        if line and not line.startswith('*') and not line.startswith('No other') and not line.startswith('No TU'):
-                            # Remove numbering (1., 2., etc.)
-                            if line[0].isdigit() and '. ' in line:
-                                line = line.split('. ', 1)[1]
-                            cleaned_lines.append(line)
-                    
-                    # Add cleaned violations to the list with page numbers
-                    for line in cleaned_lines:
-                        if line and len(line) > 10:  # Only add substantial error messages
-                            all_error_messages.append(line)
-                            errors_with_pages.append({
-                                'text': line,
-                                'page': page_number
-                            })
+            results.append(data)
+            page_event = {
+                "page": data["page"],
+                "success": data["success"],
+                "violations": extract_page_violations(data) if data["success"] else [],
+                "completed": len(results),
+                "total_pages": stream.page_count
+            }
+            if not data["success"]:
+                page_event["error"] = data.get("error")
+            yield sse_event("page", page_event)
+        timer.mark("analysis_finished")
         
-        # Categorize errors into 3 phases
-        categorized_errors = ErrorCategorizer.categorize_all_errors(errors_with_pages)
-        phase_summary = ErrorCategorizer.get_phase_summary(categorized_errors)
+        # Document-wide checks need every page, so they are reported once extraction is done
+        rule_violations, rule_checks = check_document_rules(pages)
+        yield sse_event("rules", {**rule_checks, "violations": rule_violations})
         
-        # Create formatted analysis summary
-        return result_formatter.create_analysis_summary(
-            successful_results, 
-            all_error_messages, 
-            categorized_errors, 
-            phase_summary
-        )
+        summary = build_analysis_summary(sorted(results, key=lambda result: result["page"]), rule_violations)
+        summary["rule_checks"] = rule_checks
+        summary["failed_pages"] = failed_pages(results)
+        summary["partial"] = bool(summary["failed_pages"])
+        summary["prompt_eval"] = generation.summary()
+        summary["extraction_cache_hit"] = stream.cache_hit
+        summary["pipeline_timings"] = timer.summary()
+        summary["token_counts"] = normalizer.report()
+        completed = True
+        yield sse_event("summary", summary)
     except Exception as e:
-        logging.exception("Analysis failed")
-        return {"error": f"Analysis failed: {str(e)}"}
+        logging.exception("Streaming analysis failed")
+        completed = True
+        yield sse_event("error", {"error": f"Analysis failed: {str(e)}"})
+    finally:
+        if not completed:
+            # The response was abandoned before the analysis finished
+            scope.cancel("disconnect")
+        for task in tasks + watchers:
+            task.cancel()
+        await stack.aclose()
 
-@app.post("/analyze-batch")
-async def analyze_pdf_batch(file: UploadFile = File(...)):
-    """Batch analysis endpoint - processes all pages in a single request for maximum speed"""
+@app.post("/analyze/stream")
+async def analyze_pdf_stream(file: UploadFile = File(...), analysis_id: str = Form(None), progress: bool = False):
+    """Streaming analysis endpoint - sends each page's violations as an SSE event when it finishes"""
+    if not file.filename:
+        return {"error": "No file provided"}
+    analysis_id, error = claim_analysis_id(analysis_id)
+    if error is not None:
+        return error
+    
+    # The upload, scheduler session and cancel scope stay open until the event stream ends
+    stack = AsyncExitStack()
     try:
-        if not file.filename:
-            return {"error": "No file provided"}
-        
-        file_path = f"{TEMP_DIR}/{file.filename}"
-        os.makedirs(TEMP_DIR, exist_ok=True)
-        
-        with open(file_path, "wb") as f:
-            f.write(await file.read())
-        logging.info(f"Received file '{file.filename}' for batch analysis")
-
-        pages = extract_text_with_pages(file_path)
-        logging.info(f"Extracted {len(pages)} pages from PDF")
+        scope = stack.enter_context(running_analyses.track(analysis_id, "analyze_stream"))
+        sync_prompt_templates()
+        upload = await stack.enter_async_context(receive_upload(file))
+        logging.info(f"Received file '{file.filename}' for streaming analysis ({upload.size} bytes)")
+        stream = await PageStream(upload.source, upload.sha256).open()
+        tenant = await stack.enter_async_context(llm_scheduler.session(stream.page_count))
+    except UploadTooLarge as e:
+        await stack.aclose()
+        return JSONResponse(status_code=413, content={"error": str(e)})
+    except SchedulerOverloaded as e:
+        await stack.aclose()
+        logging.warning(f"Rejected streaming analysis: {str(e)}")
+        return overloaded_response(e)
+    except Exception as e:
+        await stack.aclose()
+        logging.exception("Streaming analysis failed")
+        return {"error": f"Analysis failed: {str(e)}"}
+    
+    return StreamingResponse(
+        stream_analysis_events(stack, stream, tenant, scope, progress),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
-        
-        # Get batch prompt from template
-        batch_prompt = prompt_manager.get_batch_analysis_prompt(pages)
-        
-        logging.info(f"Sending batch analysis request for {len(pages)} pages")
-        
-        # Use the fast Ollama function for batch processing
-        ai_response = ask_ollama_fast(
-            batch_prompt,
-            temperature=TEMPERATURE,
-            timeout_seconds=ANALYSIS_TIMEOUT_SECONDS * 2  # Longer timeout for batch
-        )
-        
-        # Parse the batch response with categorization
-        categorized_results = {
-            "errors": [],
-            "warnings": []
+def parse_batch_response(ai_response, chunk_pages):
+    """Parse one batch response into a result for every page of the chunk
+    
+    Unattributed text falls back to the first page of the chunk.
+    """
+    if isinstance(ai_response, Exception):
+        return [{**failed_page_result(page, ai_response), "violations": []} for page in chunk_pages]
+    
+    violations, structured = parse_response(ai_response, chunk_pages)
+    logging.debug(f"Parsed {len(violations)} violations from batch response (structured: {structured})")
+    return [
+        {
+            "page": page,
+            "analysis": f"Page {page}: " + ('; '.join(page_violations) if page_violations else NO_VIOLATIONS),
+            "success": True,
+            "violations": page_violations
         }
-        
-        page_results = []
-        
-        # Debug: Log the AI response
-        logging.info(f"AI Response: {ai_response}")
-        
-        lines = ai_response.split('\n')
-        current_page = None
-        current_violations = []
-        
-        for line in lines:
-            line = line.strip()
-            if line.startswith('Page ') and ':' in line:
-                # Save previous page results
-                if current_page:
-                    page_results.append({
-                        "page": current_page,
-                        "analysis": f"Page {current_page}: " + ('; '.join(current_violations) if current_violations else "No TU format violations detected."),
-                        "success": True,
-                        "violations": current_violations
-                    })
-                
-                # Start new page
-                page_part = line.split(':', 1)[0]
-                current_page = page_part.replace('Page ', '').strip()
-                current_violations = []
-                
-                # Check if this page has violations
-                if ':' in line and 'No TU format violations detected' not in line:
-                    violation_text = line.split(':', 1)[1].strip()
-                    if violation_text:
-                        # Extract specific error message
-                        if '[ERROR]' in violation_text:
-                            error_msg = violation_text.split('[ERROR]')[1].strip()
-                            current_violations.append(f"[ERROR] {error_msg}")
-                        elif '[WARNING]' in violation_text:
-                            warning_msg = violation_text.split('[WARNING]')[1].strip()
-                            current_violations.append(f"[WARNING] {warning_msg}")
-
-                        else:
-                            current_violations.append(violation_text)
-            elif line and current_page and 'No TU format violations detected' not in line:
-                # Check if line contains categorized content
-                if '[ERROR]' in line:
-                    error_msg = line.split('[ERROR]')[1].strip()
-                    current_violations.append(f"[ERROR] {error_msg}")
-                elif '[WARNING]' in line:
-                    warning_msg = line.split('[WARNING]')[1].strip()
-                    current_violations.append(f"[WARNING] {warning_msg}")
+        for page, page_violations in group_by_page(violations, chunk_pages).items()
+    ]
 
-                else:
-                    current_violations.append(line)
-        
-        # Add the last page
-        if current_page:
-            page_results.append({
-                "page": current_page,
-                "analysis": f"Page {current_page}: " + ('; '.join(current_violations) if current_violations else "No TU format violations detected."),
-                "success": True,
-                "violations": current_violations
-            })
-        
-        # If no pages were parsed, try alternative parsing using page markers
-        if not page_results:
-            logging.warning("No pages parsed from AI response, trying alternative parsing...")
-            
-            # Split by page markers (--- PAGE X ---)
-            page_sections = re.split(r'---\s*PAGE\s+(\d+)\s*---', ai_response, flags=re.IGNORECASE)
-            
-            # Process each page section
-            for i in range(1, len(page_sections), 2):  # Skip the first empty section, process pairs (page_num, content)
-                if i + 1 < len(page_sections):
-                    page_num = int(page_sections[i])
-                    page_content = page_sections[i + 1].strip()
-                    
-                    # Skip empty content
-                    if not page_content:
-                        continue
-                    
-                    # Extract violations from this page's content
-                    violations = []
-                    lines = page_content.split('\n')
-                    
-                    for line in lines:
-                        line = line.strip()
-                        if not line:
-                            continue
-                        
-                        # Skip introductory text
-                        if line.lower().startswith(('here is', 'after analyzing', 'analysis of')):
-                            continue
-                            
-                        # Check if it's a violation line (contains ERROR or WARNING)
-                        if any(keyword in line.upper() for keyword in ['ERROR:', 'WARNING:', 'VIOLATION']):
-                            # Clean up the line and extract the violation
-                            clean_line = line
-                            # Remove prefixes like "ERROR:", "WARNING:", etc.
-                            for prefix in ['ERROR:', 'WARNING:', 'VIOLATION:']:
-                                clean_line = clean_line.replace(prefix, '').strip()
-                            
-                            if clean_line and len(clean_line) > 5:  # Only add substantial violations
-                                violations.append(clean_line)
-                        
-                        # Also check for lines that describe issues without explicit prefixes
-                        elif any(keyword in line.lower() for keyword in ['missing', 'incorrect', 'wrong', 'should be', 'problem', 'issue', 'mistake', 'error']):
-                            if len(line) > 10:  # Only add substantial violations
-                                violations.append(line)
-                    
-                    # Create page result
-                    if violations:
-                        analysis_text = "\n".join([f"• {v}" for v in violations])
-                    else:
-                        analysis_text = "No TU format violations detected on this page."
-                    
-                    page_results.append({
-                        "page": page_num,
-                        "analysis": analysis_text,
-                        "success": True,
-                        "violations": violations
-                    })
-            
-            # If still no pages parsed, fall back to simple text parsing
-            if not page_results:
-                logging.warning("No page markers found, trying simple text parsing...")
-                # Try to parse any violations from the response
-                all_text = ai_response.lower()
-                
-                # Look for common violation indicators
-                violation_indicators = [
-                    "error", "violation", "problem", "issue", "incorrect", "wrong", "missing",
-                    "warning", "suggestion", "improvement", "idea", "recommendation"
-                ]
-                
-                has_violations = any(indicator in all_text for indicator in violation_indicators)
-                
-                if has_violations:
-                    # Create a single page result with cleaned up response
-                    clean_text = ai_response.strip()
-                    # Remove common introductory phrases
-                    intro_phrases = [
-                        "Here is the analysis of each page for TU format violations:",
-                        "After analyzing",
-                        "The analysis shows"
-                    ]
-                    for phrase in intro_phrases:
-                        clean_text = clean_text.replace(phrase, "").strip()
-                    
-                    page_results.append({
-                        "page": 1,
-                        "analysis": clean_text,
-                        "success": True,
-                        "violations": [clean_text]
-                    })
-        
-        # Categorize violations from all pages
-        for page_result in page_results:
-            if page_result.get("violations"):
-                for violation in page_result["violations"]:
-                    categorized_violation = {
-                        "page": page_result["page"],
-                        "text": violation,
-                        "type": "unknown"
-                    }
-                    
-                    # More flexible categorization
-                    violation_lower = violation.lower()
-                    
-                    if "[ERROR]" in violation or any(word in violation_lower for word in ["error", "violation", "problem", "incorrect", "wrong", "missing", "structure", "citation", "alignment", "page numbering", "font", "margin"]):
-                        if "[ERROR]" in violation:
-                            # Extract just the error message after [ERROR]
-                            error_text = violation.replace("[ERROR]", "").strip()
-                            # Clean up common prefixes
-                            error_text = error_text.replace("Page X:", "").replace("Page X :", "").strip()
-                            categorized_violation["text"] = error_text
-                        else:
-                            # For violations without [ERROR] prefix, try to extract the specific issue
-                            error_text = violation.strip()
-                            # Remove common prefixes and clean up
-                            error_text = error_text.replace("Page X:", "").replace("Page X :", "").strip()
-                            categorized_violation["text"] = error_text
-                        categorized_violation["type"] = "error"
-                        categorized_results["errors"].append(categorized_violation)
-                    elif "[WARNING]" in violation or any(word in violation_lower for word in ["warning", "grammar", "flow", "formatting", "inconsistent"]):
-                        if "[WARNING]" in violation:
-                            categorized_violation["text"] = violation.replace("[WARNING]", "").strip()
-                        else:
-                            categorized_violation["text"] = violation.strip()
-                        categorized_violation["type"] = "warning"
-                        categorized_results["warnings"].append(categorized_violation)
-
-                    else:
-                        # Default to error if no category specified but it's clearly a violation
-                        if "no tu format violations detected" not in violation_lower:
-                            categorized_violation["type"] = "error"
-                            categorized_results["errors"].append(categorized_violation)
-        
-        # Count total issues
-        total_errors = len(categorized_results["errors"])
-        total_warnings = len(categorized_results["warnings"])
-        total_issues = total_errors + total_warnings
-        
-        # Create overall summary
-        if total_issues > 0:
-            overall_summary = f"""TU FORMAT ANALYSIS COMPLETE
+async def run_batch_analysis(source, sha256, on_progress=None, timings=None, analysis_id=None):
+    """Extract a PDF and analyze it in context-sized chunks, returning the summary response
+
+    on_progress is called with (completed, total) pages as each chunk finishes.
+    Passing a StageTimings adds its per-stage breakdown as "timings". Results
+    are stored under analysis_id, or a new ID when none is given.
+    """
+    started = time.perf_counter()
+    document, extraction_cache_hit = await extract_text_cached(source, sha256)
+    if timings is not None:
+        timings.record("extraction", time.perf_counter() - started)
+    # Normalize PyPDF2 whitespace before packing pages into prompts
+    normalizer = PageNormalizer()
+    pages = normalize_pages(document["pages"], normalizer)
+    logging.info(f"Extracted {len(pages)} pages from PDF (cache hit: {extraction_cache_hit})")
+    sync_prompt_templates()
+    
+    rule_violations, rule_checks = check_document_rules(pages)
+    
+    # Pack pages into chunks sized to the model's context window, leaving out trivial pages
+    llm_pages = [
+        page_data for page_data in pages
+        if not (RULE_ENGINE_ENABLED and is_trivial_page(page_data["text"]))
+    ]
+    with timed("prompt_build", timings):
+        chunks = prompt_manager.get_batch_chunk_prompts(llm_pages, OLLAMA_NUM_CTX, BATCH_RESPONSE_TOKENS)
+    if llm_pages and not chunks:
+        return {"error": "Failed to build batch prompts"}
+    truncated_pages = [page for chunk in chunks for page in chunk["truncated"]]
+    
+    logging.info(f"Sending {len(chunks)} batch analysis requests for {len(pages)} pages")
+    
+    # Chunks run concurrently through the shared scheduler
+    generation = GenerationStats()
+    progress = {"completed": 0}
+    
+    async def analyze_chunk(tenant, chunk):
+        try:
+            response = await llm_scheduler.run(
+                tenant,
+                ask_ollama_fast,
+                chunk["prompt"],
+                max_tokens=BATCH_RESPONSE_TOKENS,
+                temperature=TEMPERATURE,
+                timeout_seconds=ANALYSIS_TIMEOUT_SECONDS * 2,  # Longer timeout for batch
+                response_format=RESPONSE_FORMAT,
+                system=prompt_manager.system_prompt,
+                stats=generation,
+                latency=batch_latency
+            )
+        except OllamaError as e:
+            # The chunk's pages are flagged as failed; the other chunks still count
+            logging.error(f"Batch chunk for pages {chunk['pages'][0]}-{chunk['pages'][-1]} failed: {str(e)}")
+            response = e
+        # A cancelled chunk never gets here, so only finished pages are counted
+        if on_progress is not None:
+            progress["completed"] += len(chunk["pages"])
+            on_progress(progress["completed"], len(llm_pages))
+        return response
+    
+    async with llm_scheduler.session(len(chunks)) as tenant:
+        ai_responses = await asyncio.gather(*[analyze_chunk(tenant, chunk) for chunk in chunks])
+    
+    # Parse each chunk's response and merge the per-page results
+    page_results = []
+    for chunk, ai_response in zip(chunks, ai_responses):
+        with timed("response_parse", timings):
+            page_results.extend(parse_batch_response(ai_response, chunk["pages"]))
+    page_results.sort(key=lambda result: result["page"])
+    
+    # Sort every violation, model and rule engine alike, by severity
+    categorized_results = {f"{severity}s": [] for severity in violation_classifier.severity_names}
+    rule_results = [{"page": violation["page"], "violations": [violation["text"]], "source": "rules"} for violation in rule_violations]
+    for page_result in page_results + rule_results:
+        for violation in page_result.get("violations", []):
+            _, severity = violation_classifier.classify(violation)
+            categorized_violation = {
+                "page": page_result["page"],
+                "text": strip_severity_tag(violation),
+                "type": severity
+            }
+            if "source" in page_result:
+                categorized_violation["source"] = page_result["source"]
+            categorized_results[f"{severity}s"].append(categorized_violation)
+    
+    # Count total issues
+    total_errors = len(categorized_results.get("errors", []))
+    total_warnings = len(categorized_results.get("warnings", []))
+    total_suggestions = len(categorized_results.get("suggestions", []))
+    total_issues = total_errors + total_warnings + total_suggestions
+    
+    # Create overall summary
+    if total_issues > 0:
+        overall_summary = f"""TU FORMAT ANALYSIS COMPLETE
 
 📊 SUMMARY:
 • Pages Analyzed: {len(page_results)}
-• Errors: {total_errors} | Warnings: {total_warnings}
+• Errors: {total_errors} | Warnings: {total_warnings} | Suggestions: {total_suggestions}
 
 Focus on fixing ERRORS first, then address WARNINGS."""
-        else:
-            overall_summary = f"""TU FORMAT ANALYSIS COMPLETE
+    else:
+        overall_summary = f"""TU FORMAT ANALYSIS COMPLETE
 
 📊 SUMMARY:
 • Pages Analyzed: {len(page_results)}
 • Status: ✅ No violations detected
 
 Your document follows TU format standards correctly."""
+    
+    response = {
+        "overall_summary": overall_summary,
+        "total_pages_analyzed": len(page_results),
+        "total_errors_found": total_issues,
+        "results": page_results,
+        "categorized_results": categorized_results,
+        "mode": "batch",
+        "rule_checks": rule_checks,
+        "failed_pages": failed_pages(page_results),
+        "partial": any(not result["success"] for result in page_results),
+        "prompt_eval": generation.summary(),
+        "chunks": len(chunks),
+        "truncated_pages": truncated_pages,
+        "token_counts": normalizer.report(),
+        "extraction_cache_hit": extraction_cache_hit,
+        "analysis_id": analysis_id or new_analysis_id()
+    }
+    if timings is not None:
+        response["timings"] = timing_breakdown(timings, generation)
+    save_results(response["analysis_id"], compact_summary(response))
+    return response
+
+@app.post("/analyze-batch")
+async def analyze_pdf_batch(request: Request, file: UploadFile = File(...), analysis_id: str = Form(None), timings: bool = False, compact: bool = False):
+    """Batch analysis endpoint - processes all pages in a single request for maximum speed"""
+    started = time.perf_counter()
+    try:
+        if not file.filename:
+            return {"error": "No file provided"}
+        analysis_id, error = claim_analysis_id(analysis_id)
+        if error is not None:
+            return error
         
-        return {
-            "overall_summary": overall_summary,
-            "total_pages_analyzed": len(page_results),
-            "total_errors_found": total_issues,
-            "results": page_results,
-            "categorized_results": categorized_results,
-            "mode": "batch"
-        }
+        stage_timings = StageTimings() if timings else None
+        # Analysis stops if the client disconnects or the analysis is deleted
+        with running_analyses.track(analysis_id, "analyze_batch") as scope:
+            # Stream the upload; any temporary file is removed once text is extracted
+            async with receive_upload(file) as upload:
+                logging.info(f"Received file '{file.filename}' for batch analysis ({upload.size} bytes)")
+                if stage_timings is not None:
+                    stage_timings.record("upload", upload.seconds)
+                response = await scope.run(
+                    run_batch_analysis(upload.source, upload.sha256, timings=stage_timings, analysis_id=analysis_id), request.receive
+                )
+        request_seconds.observe(time.perf_counter() - started, endpoint="analyze_batch")
+        return summary_response(response, compact)
+    except UploadTooLarge as e:
+        return JSONResponse(status_code=413, content={"error": str(e)})
+    except AnalysisCancelled as e:
+        return cancelled_response(e)
+    except SchedulerOverloaded as e:
+        logging.warning(f"Rejected batch analysis: {str(e)}")
+        return overloaded_response(e)
     except Exception as e:
         logging.exception("Batch analysis failed")
         return {"error": f"Batch analysis failed: {str(e)}"}
 
+async def analyze_bulk_document(document, mode):
+    """Analyze one document of a bulk submission, waiting whenever the scheduler's queue is full"""
+    run = run_batch_analysis if mode == "batch" else run_page_analysis
+    while True:
+        try:
+            return await run(document.path, document.sha256)
+        except SchedulerOverloaded as e:
+            # The client already holds a streaming response, so the document waits its turn instead
+            logging.info(f"Scheduler full, retrying '{document.filenames[0]}' in {e.retry_after} seconds")
+            await asyncio.sleep(e.retry_after)
+        except Exception as e:
+            logging.exception(f"Bulk analysis of '{document.filenames[0]}' failed")
+            return {"error": f"Analysis failed: {str(e)}"}
+
+async def stream_bulk_analysis(submission, mode, compact):
+    """Yield one JSON line per document as its analysis finishes, then the cohort summary
+
+    Up to BULK_CONCURRENCY documents are extracted and analyzed at once. Each
+    holds its own scheduler session, so the model's slots are shared fairly
+    between documents as well as with other requests.
+    """
+    started = time.perf_counter()
+    cohort = CohortSummary(submission)
+    semaphore = asyncio.Semaphore(BULK_CONCURRENCY)
+
+    async def analyze(document):
+        async with semaphore:
+            return document, await analyze_bulk_document(document, mode)
+
+    tasks = [asyncio.create_task(analyze(document)) for document in submission.documents.values()]
+    completed = False
+    try:
+        for rejected in submission.rejected:
+            yield dumps({"type": "rejected", **rejected}) + b"\n"
+        for finished in asyncio.as_completed(tasks):
+            document, summary = await finished
+            cohort.add(document, summary)
+            line = {
+                "type": "document",
+                "index": document.index,
+                "filenames": document.filenames,
+                "sha256": document.sha256,
+                "size": document.size,
+                "status": "failed" if "error" in summary else "done"
+            }
+            if "error" in summary:
+                line["error"] = summary["error"]
+            else:
+                line["result"] = compact_summary(summary) if compact else summary
+            yield dumps(line) + b"\n"
+        elapsed = time.perf_counter() - started
+        request_seconds.observe(elapsed, endpoint="analyze_bulk")
+        completed = True
+        yield dumps({"type": "cohort_summary", "mode": mode, **cohort.summary(elapsed)}) + b"\n"
+    finally:
+        if not completed:
+            # The client disconnected; documents still queued or running are dropped
+            cancelled_analyses.inc(endpoint="analyze_bulk", reason="disconnect")
+        for task in tasks:
+            task.cancel()
+        submission.close()
+
+@app.post("/analyze-bulk")
+async def analyze_bulk(files: List[UploadFile] = File(...), mode: str = Form("batch"), compact: bool = False):
+    """Bulk endpoint for whole-cohort submissions
+
+    Accepts zip archives and/or PDFs. Identical files are analyzed once. The
+    response is JSON Lines: a line per rejected file, a line per document as
+    it finishes, and a final "cohort_summary" line.
+    """
+    if mode not in JOB_MODES:
+        return JSONResponse(status_code=400, content={"error": f"Unknown mode '{mode}', expected one of: {', '.join(JOB_MODES)}"})
+    submission = BulkSubmission()
+    try:
+        for file in files:
+            await submission.add_upload(file)
+        if not submission.documents:
+            submission.close()
+            return JSONResponse(status_code=400, content={"error": "No PDF files found", "rejected": submission.rejected})
+    except UploadTooLarge as e:
+        submission.close()
+        return JSONResponse(status_code=413, content={"error": str(e)})
+    except BulkSubmissionError as e:
+        submission.close()
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    except Exception as e:
+        submission.close()
+        logging.exception("Failed to receive bulk submission")
+        return JSONResponse(status_code=500, content={"error": f"Failed to receive bulk submission: {str(e)}"})
+    logging.info(f"Received bulk submission of {submission.file_count} files, {len(submission.documents)} unique, {len(submission.rejected)} rejected")
+    # The submission's files belong to the response and are removed once it is sent
+    return StreamingResponse(stream_bulk_analysis(submission, mode, compact), media_type="application/x-ndjson")
+
+def write_file(path, data):
+    with open(path, "wb") as f:
+        f.write(data)
+
+def describe_job(job):
+    """Public view of a queued job"""
+    response = {
+        "job_id": job["id"],
+        "status": job["status"],
+        "mode": job["mode"],
+        "filename": job["filename"],
+        "progress": {"completed": job["completed"], "total": job["total"]},
+        "attempts": job["attempts"],
+        "created_at": job["created"],
+        "started_at": job["started"],
+        "finished_at": job["finished"]
+    }
+    if job["status"] == "done":
+        response["result"] = job["result"]
+    elif job["status"] == "failed":
+        response["error"] = job["error"]
+    return response
+
+@app.post("/jobs", status_code=202)
+async def create_job(file: UploadFile = File(...), mode: str = Form("page"), previous_analysis_id: str = Form(None)):
+    """Queue a PDF for analysis by the worker processes and return its job ID immediately"""
+    try:
+        if not file.filename:
+            return JSONResponse(status_code=400, content={"error": "No file provided"})
+        if mode not in JOB_MODES:
+            return JSONResponse(status_code=400, content={"error": f"Unknown mode '{mode}', expected one of: {', '.join(JOB_MODES)}"})
+        
+        job_id = job_queue.new_job_id()
+        # The queue's SQLite calls and file moves block, so they run in a thread
+        path = await asyncio.to_thread(job_queue.upload_path, job_id)
+        async with receive_upload(file) as upload:
+            # The upload must outlive this request, so it moves into the job directory
+            if upload.in_memory:
+                await asyncio.to_thread(write_file, path, upload.data)
+            else:
+                await asyncio.to_thread(os.replace, upload.path, path)
+        await asyncio.to_thread(
+            job_queue.enqueue, job_id, mode, file.filename, path, upload.sha256, {"previous_analysis_id": previous_analysis_id}
+        )
+        logging.info(f"Queued {mode} job {job_id} for '{file.filename}' ({upload.size} bytes)")
+        return {"job_id": job_id, "status": "queued", "status_url": f"/jobs/{job_id}"}
+    except UploadTooLarge as e:
+        return JSONResponse(status_code=413, content={"error": str(e)})
+    except Exception as e:
+        logging.exception("Failed to queue job")
+        return JSONResponse(status_code=500, content={"error": f"Failed to queue job: {str(e)}"})
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, compact: bool = False):
+    """Status, progress and, once finished, the result of a queued job"""
+    job = await asyncio.to_thread(job_queue.get, job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"error": "Job not found"})
+    response = describe_job(job)
+    if compact and "result" in response and "error" not in response["result"]:
+        response["result"] = compact_summary(response["result"])
+    return FastJSONResponse(response)
+
+@app.delete("/analyses/{analysis_id}")
+async def cancel_analysis(analysis_id: str):
+    """Cancel a running analysis, dropping its queued pages and aborting its in-flight generations"""
+    if running_analyses.cancel(analysis_id):
+        logging.info(f"Cancelled analysis {analysis_id} on request")
+        return {"analysis_id": analysis_id, "status": "cancelled"}
+    if analysis_id in running_analyses:
+        return {"analysis_id": analysis_id, "status": "cancelled"}
+    if load_results(analysis_id) is not None:
+        return JSONResponse(status_code=409, content={"error": "Analysis already finished"})
+    return JSONResponse(status_code=404, content={"error": "Analysis not found"})
+
+@app.get("/analyses/{analysis_id}/results")
+async def get_analysis_results(analysis_id: str, page: int = None, category: str = None, limit: int = RESULTS_PAGE_LIMIT, offset: int = 0):
+    """Violations of a finished analysis a slice at a time, optionally for one page or category"""
+    payload = load_results(analysis_id)
+    if payload is None:
+        return JSONResponse(status_code=404, content={"error": "Analysis not found"})
+    categories = list(payload["categorized_results"])
+    if category is not None and category not in categories:
+        return JSONResponse(status_code=400, content={"error": f"Unknown category '{category}'", "categories": categories})
+    limit = max(1, min(limit, RESULTS_MAX_LIMIT))
+    return FastJSONResponse({
+        "analysis_id": analysis_id,
+        "categories": categories,
+        **paginate_results(payload, page, category, limit, max(0, offset))
+    })
+
 if __name__ == "__main__":
     import uvicorn
     
@@ -4,31 +4,113 @@ Handles loading and formatting AI prompt templates
 """
 
 import os
+import hashlib
 import logging
+from dotenv import load_dotenv
+from utils.tokens import estimate_tokens, truncate_to_tokens
+from utils.rule_engine import RULE_ENGINE_ENABLED
+from utils.pdf_reader import PDF_LAYOUT
+from .response_parser import STRUCTURED_OUTPUT
+
+# Load environment variables
+load_dotenv()
+
+# Send the static rules as Ollama's system prompt rather than inside each prompt
+SYSTEM_PROMPT_RULES = os.getenv("SYSTEM_PROMPT_RULES", "true").lower() == "true"
 
 
 class PromptManager:
     """Manages AI prompt templates and formatting"""
     
-    def __init__(self):
+    def __init__(self, narrow_rules=RULE_ENGINE_ENABLED, layout_checks=PDF_LAYOUT, structured_output=STRUCTURED_OUTPUT, system_prompt_rules=SYSTEM_PROMPT_RULES):
         self.prompt_dir = os.path.dirname(os.path.abspath(__file__))
-        # Load base prompts once
-        self.tu_rules = self.load_template("tu_formatting_rules")
-        self.feedback_instructions = self.load_template("feedback_instructions")
+        # With the rule engine on, the model only sees the rules it cannot check
+        self.narrow_rules = narrow_rules
+        # Font, spacing, margin and heading style rules stay with the model when extraction records no layout
+        self.layout_checks = layout_checks
+        # Structured prompts ask for JSON matching the response parser's schema
+        self.structured_output = structured_output
+        # Static rules always form the prompt prefix so Ollama can reuse its evaluation
+        self.system_prompt_rules = system_prompt_rules
+        self.template_mtimes = {}
+        # Load base prompts once, reloading only when the files change
+        self.load_base_templates()
     
     def load_template(self, template_name):
         """Load a prompt template from file"""
         try:
             template_path = os.path.join(self.prompt_dir, f"{template_name}.txt")
+            self.template_mtimes[template_name] = os.path.getmtime(template_path)
             with open(template_path, 'r', encoding='utf-8') as f:
                 return f.read()
         except Exception as e:
             logging.error(f"Failed to load template {template_name}: {str(e)}")
             return None
     
+    def load_base_templates(self):
+        """Load the rule and feedback templates shared by every prompt"""
+        self.tu_rules = self.load_template("tu_formatting_rules")
+        self.tu_content_rules = self.load_template("tu_content_rules")
+        self.tu_layout_rules = self.load_template("tu_layout_rules")
+        self.tu_layout_checked = self.load_template("tu_layout_checked")
+        self.feedback_instructions = self.load_template("feedback_instructions")
+        self.structured_instructions = self.load_template("structured_output")
+        content = "\0".join(str(part) for part in (
+            self.tu_rules, self.tu_content_rules, self.tu_layout_rules, self.tu_layout_checked, self.feedback_instructions,
+            self.structured_instructions, self.narrow_rules, self.layout_checks, self.structured_output, self.system_prompt_rules
+        ))
+        self.templates_version = hashlib.sha256(content.encode("utf-8")).hexdigest()
+    
+    def refresh_templates(self):
+        """Reload the base templates if they changed on disk, returns True when reloaded"""
+        for template_name, mtime in self.template_mtimes.items():
+            template_path = os.path.join(self.prompt_dir, f"{template_name}.txt")
+            try:
+                changed = os.path.getmtime(template_path) != mtime
+            except OSError:
+                changed = False
+            if changed:
+                logging.info(f"Template {template_name} changed on disk, reloading prompts")
+                self.load_base_templates()
+                return True
+        return False
+    
+    @property
+    def model_rules(self):
+        """The rules template sent to the model"""
+        if not self.narrow_rules:
+            return self.tu_rules
+        # Layout rules are either checked locally or left to the model, never both
+        if self.layout_checks:
+            return f"{self.tu_content_rules.rstrip()}\n\n{self.tu_layout_checked}"
+        return f"{self.tu_content_rules.rstrip()}\n\n{self.tu_layout_rules}"
+    
+    @property
+    def response_instructions(self):
+        """Feedback instructions, followed by the JSON format in structured mode"""
+        if self.structured_output and self.structured_instructions:
+            return f"{self.feedback_instructions}\n\n{self.structured_instructions}"
+        return self.feedback_instructions
+    
+    @property
+    def static_rules(self):
+        """Rules and response instructions shared, unchanged, by every prompt"""
+        return f"{self.model_rules}\n\n{self.response_instructions}"
+    
+    @property
+    def system_prompt(self):
+        """The system prompt to send with each request, or None when rules are inline"""
+        return self.static_rules if self.system_prompt_rules else None
+    
+    def with_static_rules(self, instruction):
+        """Put the static rules ahead of the page-specific part, unless they go in the system prompt"""
+        if self.system_prompt_rules:
+            return instruction
+        return f"{self.static_rules}\n\n{instruction}"
+    
     def get_single_page_analysis_prompt(self, page, text):
         """Get formatted single page analysis prompt"""
-        if not self.tu_rules or not self.feedback_instructions:
+        if not self.model_rules or not self.feedback_instructions:
             logging.error("Failed to load base prompt templates")
             return None
         
@@ -43,57 +125,101 @@ INSTRUCTIONS:
 2. Identify any violations or issues
 3. Provide feedback using the specified categories
 4. Be specific and helpful in your feedback
-
 """
         
-        # Combine all parts
-        full_prompt = f"""{analysis_instruction}
-
-{self.tu_rules}
-
-{self.feedback_instructions}"""
-        
-        return full_prompt
+        return self.with_static_rules(analysis_instruction)
     
     def get_batch_analysis_prompt(self, pages):
         """Get formatted batch analysis prompt"""
-        if not self.tu_rules or not self.feedback_instructions:
+        if not self.model_rules or not self.feedback_instructions:
             logging.error("Failed to load base prompt templates")
             return None
         
-        # Create batch analysis instruction
-        analysis_instruction = f"""TASK: Analyze {len(pages)} pages for TU format violations.
-
-PAGES TO ANALYZE:
-"""
-        
         # Add page content
+        page_blocks = []
         for page_data in pages:
-            page_num = page_data['page']
-            text = page_data['text'][:400]  # Shorter text per page for batch processing
-            analysis_instruction += f"""
+            text = page_data['text']
+            page_blocks.append(self.format_batch_page(
+                page_data['page'],
+                f"{text[:400]}{'...' if len(text) > 400 else ''}"  # Shorter text per page for batch processing
+            ))
+        
+        return self.build_batch_prompt(len(pages), page_blocks)
+    
+    def format_batch_page(self, page_num, text):
+        """Format one page section of a batch prompt"""
+        return f"""
 --- PAGE {page_num} ---
-{text}{"..." if len(text) > 400 else ""}
+{text}
 """
-        
+    
+    def build_batch_prompt(self, page_count, page_blocks):
+        """Combine formatted page sections with the batch instructions and rules"""
+        # Create batch analysis instruction
+        analysis_instruction = f"""TASK: Analyze {page_count} pages for TU format violations.
+
+PAGES TO ANALYZE:
+"""
+        analysis_instruction += "".join(page_blocks)
         analysis_instruction += f"""
 
 INSTRUCTIONS:
 1. Review each page against TU formatting rules
 2. Identify violations and issues for each page
 3. Provide feedback using the specified categories
-4. Format response as: "Page X: [CATEGORY] Description"
-
+4. {"Respond in the structured JSON response format" if self.structured_output else 'Format response as: "Page X: [CATEGORY] Description"'}
 """
         
-        # Combine all parts
-        full_prompt = f"""{analysis_instruction}
-
-{self.tu_rules}
-
-{self.feedback_instructions}"""
+        return self.with_static_rules(analysis_instruction)
+    
+    def get_batch_chunk_prompts(self, pages, context_tokens, response_tokens):
+        """Pack pages into batch prompts that each fit the model's context window
+        
+        The static rules (inline or as the system prompt) are counted once per chunk; pages are added in order
+        until the remaining budget is used. A page that cannot fit on its own is
+        cut to the budget and reported in the chunk's "truncated" list.
+        
+        Returns a list of dicts with "pages", "prompt" and "truncated" keys.
+        """
+        if not self.model_rules or not self.feedback_instructions:
+            logging.error("Failed to load base prompt templates")
+            return []
+        
+        static_tokens = estimate_tokens(self.build_batch_prompt(len(pages), []))
+        if self.system_prompt:
+            static_tokens += estimate_tokens(self.system_prompt)
+        page_budget = context_tokens - response_tokens - static_tokens
+        if page_budget <= 0:
+            logging.error(f"Context window of {context_tokens} tokens cannot fit the batch rules")
+            return []
+        
+        chunks = []
+        blocks, page_numbers, truncated, used = [], [], [], 0
+        for page_data in pages:
+            block = self.format_batch_page(page_data['page'], page_data['text'])
+            block_tokens = estimate_tokens(block)
+            if blocks and used + block_tokens > page_budget:
+                chunks.append((page_numbers, blocks, truncated))
+                blocks, page_numbers, truncated, used = [], [], [], 0
+            if block_tokens > page_budget:
+                logging.warning(f"Page {page_data['page']} exceeds the batch context budget, truncating")
+                block = truncate_to_tokens(block, page_budget)
+                block_tokens = page_budget
+                truncated.append(page_data['page'])
+            blocks.append(block)
+            page_numbers.append(page_data['page'])
+            used += block_tokens
+        if blocks:
+            chunks.append((page_numbers, blocks, truncated))
         
-        return full_prompt
+        return [
+            {
+                "pages": page_numbers,
+                "prompt": self.build_batch_prompt(len(page_numbers), blocks),
+                "truncated": truncated
+            }
+            for page_numbers, blocks, truncated in chunks
+        ]
 
 
 # Global instance for easy access
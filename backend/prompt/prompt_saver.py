@@ -0,0 +1,2 @@
+def save_prompt_to_file(*a, **k):
+    pass
@@ -0,0 +1,167 @@
+"""
+Response Parser Module
+Turns model responses into (page, category, message) violations in one pass,
+from structured JSON output or, failing that, with a compiled line tokenizer
+shared by the single-page and batch endpoints
+"""
+
+import json
+import os
+import re
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Ask Ollama for JSON matching VIOLATION_SCHEMA instead of free text
+STRUCTURED_OUTPUT = os.getenv("STRUCTURED_OUTPUT", "true").lower() == "true"
+
+CATEGORIES = ("ERROR", "WARNING", "SUGGESTION")
+NO_VIOLATIONS = "No TU format violations detected on this page."
+# Shorter untagged lines are headings or filler, not feedback
+MIN_MESSAGE_LENGTH = 10
+
+VIOLATION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "violations": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "page": {"type": "integer"},
+                    "category": {"type": "string", "enum": list(CATEGORIES)},
+                    "message": {"type": "string"},
+                },
+                "required": ["page", "category", "message"],
+            },
+        },
+    },
+    "required": ["violations"],
+}
+
+# Complete objects inside a cut-off JSON response
+JSON_OBJECT = re.compile(r"\{[^{}]*\}")
+# One match per line: a "--- PAGE n ---" marker, or an optional bullet, page
+# reference and category tag followed by the message. Filler phrases leave
+# the message empty so the line can still set the current page.
+LINE = re.compile(
+    r"^[ \t]*(?:"
+    r"-{2,}[ \t]*page[ \t]+(?P<marker>\d+)[ \t]*-{2,}"
+    r"|(?:[-*•#>]+[ \t]*|\d{1,2}[.)][ \t]+)?"
+    r"(?:\**page[ \t]+(?P<page>\d+)\**[ \t]*[:.\-–]\**[ \t]*)?"
+    r"(?:\[(?P<tag>ERROR|WARNING|SUGGESTION)S?\]|\**(?P<label>ERROR|WARNING|SUGGESTION)S?\**[ \t]*:)?[* \t]*"
+    r"(?:(?!here (?:is|are)|after analy[sz]|i (?:have )?(?:found|identified)|the following|analysis of"
+    r"|violations found|no other|no tu format|no violations|based on)(?P<message>[^\n]*))?"
+    r")",
+    re.IGNORECASE | re.MULTILINE,
+)
+
+
+def make_violation(page, category, message):
+    return {"page": page, "category": category, "message": message}
+
+
+def resolve_page(value, pages, default_page):
+    """Map a page reference onto the pages that were analyzed"""
+    try:
+        page = int(value)
+    except (TypeError, ValueError):
+        return default_page
+    if pages and page not in pages:
+        return default_page
+    return page
+
+
+def validate_items(items, pages, default_page):
+    """Validate decoded JSON violations, dropping entries without a usable message"""
+    violations = []
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        message = item.get("message")
+        if not isinstance(message, str) or not message.strip():
+            continue
+        category = str(item.get("category", "")).strip("[] ").upper()
+        violations.append(make_violation(
+            resolve_page(item.get("page"), pages, default_page),
+            category if category in CATEGORIES else None,
+            message.strip(),
+        ))
+    return violations
+
+
+def decode_json(text):
+    """Return the list of violation objects in a JSON response, or None if it is not JSON"""
+    stripped = text.strip()
+    if stripped.startswith("```"):
+        stripped = stripped.strip("`").strip()
+        if stripped[:4].lower() == "json":
+            stripped = stripped[4:].lstrip()
+    if not stripped.startswith(("{", "[")):
+        return None
+    try:
+        data = json.loads(stripped)
+    except json.JSONDecodeError:
+        # Cut off by the token limit: keep every object that did complete
+        items = []
+        for match in JSON_OBJECT.finditer(stripped):
+            try:
+                items.append(json.loads(match.group(0)))
+            except json.JSONDecodeError:
+                continue
+        # "[ERROR] ..." free text also starts with a bracket
+        if not items and stripped.startswith("["):
+            return None
+        return items
+    if isinstance(data, dict):
+        data = data.get("violations", [])
+    return data if isinstance(data, list) else []
+
+
+def tokenize_lines(text, pages, default_page):
+    """Single pass of the compiled line pattern over a free-text response"""
+    violations = []
+    current_page = default_page
+    for marker, page, tag, label, message in LINE.findall(text):
+        if marker or page:
+            current_page = resolve_page(marker or page, pages, default_page)
+            if marker:
+                continue
+        message = message.rstrip("*\r \t")
+        category = tag or label
+        if not message or (not category and len(message) <= MIN_MESSAGE_LENGTH):
+            continue
+        violations.append(make_violation(current_page, category.upper() if category else None, message))
+    return violations
+
+
+def parse_response(text, pages=None, default_page=None):
+    """Parse a model response into violation dicts with "page", "category" and "message"
+
+    pages limits page references to the pages that were sent; anything else,
+    and any text before the first page reference, is attributed to default_page
+    (the first page by default). Returns (violations, structured).
+    """
+    if default_page is None:
+        default_page = pages[0] if pages else None
+    pages = set(pages or ())
+    items = decode_json(text)
+    if items is not None:
+        return validate_items(items, pages, default_page), True
+    return tokenize_lines(text, pages, default_page), False
+
+
+def format_violation(violation):
+    """Render a parsed violation the way the summaries display it"""
+    if violation["category"]:
+        return f"[{violation['category']}] {violation['message']}"
+    return violation["message"]
+
+
+def group_by_page(violations, pages):
+    """Formatted violation strings for each page, in page order"""
+    grouped = {page: [] for page in pages}
+    for violation in violations:
+        grouped.setdefault(violation["page"], []).append(format_violation(violation))
+    return grouped
@@ -24,18 +24,34 @@ class ResultFormatter:
             Dict containing formatted summary and analysis data
         """
         try:
-            # Create overall summary with the new format
-            if all_error_messages:
-                # Count errors by phase
-                structure_count = len(categorized_errors["structure"])
-                grammar_count = len(categorized_errors["grammar"])
-                enhancement_count = len(categorized_errors["enhancement"])
-                
-                overall_summary = f"""TU FORMAT ANALYSIS COMPLETE
+            phase_counts = {name: len(errors) for name, errors in categorized_errors.items()}
+            overall_summary = ResultFormatter.format_overall_summary(len(successful_results), len(all_error_messages), phase_counts)
+            
+            return {
+                "overall_summary": overall_summary,
+                "total_pages_analyzed": len(successful_results),
+                "total_errors_found": len(all_error_messages),
+                "categorized_results": categorized_errors,
+                "phase_summary": phase_summary,
+                "results": successful_results
+            }
+        except Exception as e:
+            logging.exception("Analysis summary formatting failed")
+            return {"error": f"Summary formatting failed: {str(e)}"}
+
+    @staticmethod
+    def format_overall_summary(page_count, issue_count, phase_counts):
+        """Headline text for a finished analysis from its page, issue and per-phase counts"""
+        if issue_count:
+            structure_count = phase_counts.get("structure", 0)
+            grammar_count = phase_counts.get("grammar", 0)
+            enhancement_count = phase_counts.get("enhancement", 0)
+            
+            overall_summary = f"""TU FORMAT ANALYSIS COMPLETE
 
 📊 SUMMARY:
-• Total Pages Analyzed: {len(successful_results)}
-• Total Issues Found: {len(all_error_messages)}
+• Total Pages Analyzed: {page_count}
+• Total Issues Found: {issue_count}
 
 🔍 PHASE BREAKDOWN:
 • Phase 1 (Structure): {structure_count} critical issues
@@ -46,30 +62,19 @@ class ResultFormatter:
 • Address Phase 1 issues first (critical structure problems)
 • Fix Phase 2 grammar and spelling errors
 • Consider Phase 3 suggestions for content improvement"""
-            else:
-                overall_summary = f"""TU FORMAT ANALYSIS COMPLETE
+        else:
+            overall_summary = f"""TU FORMAT ANALYSIS COMPLETE
 
 📊 SUMMARY:
-• Total Pages Analyzed: {len(successful_results)}
+• Total Pages Analyzed: {page_count}
 • Total Issues Found: 0
 • Compliance Rate: 100%
 
 ✅ EXCELLENT! No TU format violations detected.
 
 Your document appears to follow TU format standards correctly."""
-            
-            return {
-                "overall_summary": overall_summary,
-                "total_pages_analyzed": len(successful_results),
-                "total_errors_found": len(all_error_messages),
-                "categorized_results": categorized_errors,
-                "phase_summary": phase_summary,
-                "results": successful_results
-            }
-        except Exception as e:
-            logging.exception("Analysis summary formatting failed")
-            return {"error": f"Summary formatting failed: {str(e)}"}
-
+        return overall_summary
+    
     @staticmethod
     def format_error_list(errors, max_display=10):
         """Format a list of errors for display"""
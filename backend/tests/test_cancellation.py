@@ -0,0 +1,59 @@
+import asyncio
+
+import pytest
+
+from utils.cancellation import AnalysisCancelled, RunningAnalyses
+
+
+async def never_disconnects():
+    await asyncio.Event().wait()
+
+
+def test_scope_returns_the_analysis_result():
+    async def run():
+        analyses = RunningAnalyses()
+        with analyses.track("a" * 32, "analyze") as scope:
+            assert "a" * 32 in analyses
+            result = await scope.run(asyncio.sleep(0, result="done"), never_disconnects)
+        assert "a" * 32 not in analyses
+        return result
+
+    assert asyncio.run(run()) == "done"
+
+
+def test_delete_cancels_a_running_analysis():
+    async def run():
+        analyses = RunningAnalyses()
+        with analyses.track("b" * 32, "analyze") as scope:
+            task = asyncio.create_task(scope.run(asyncio.sleep(30)))
+            await asyncio.sleep(0)
+            assert analyses.cancel("b" * 32)
+            # A second cancellation is a no-op
+            assert not analyses.cancel("b" * 32)
+            with pytest.raises(AnalysisCancelled) as error:
+                await task
+        assert not analyses.cancel("b" * 32)
+        return error.value
+
+    error = asyncio.run(run())
+    assert error.reason == "deleted"
+    assert error.analysis_id == "b" * 32
+
+
+def test_client_disconnect_cancels_the_analysis():
+    async def run():
+        messages = asyncio.Queue()
+
+        async def receive():
+            return await messages.get()
+
+        with RunningAnalyses().track("c" * 32, "analyze") as scope:
+            task = asyncio.create_task(scope.run(asyncio.sleep(30), receive))
+            await asyncio.sleep(0)
+            await messages.put({"type": "http.disconnect"})
+            with pytest.raises(AnalysisCancelled) as error:
+                await task
+            assert scope.cancelled.is_set()
+        return error.value.reason
+
+    assert asyncio.run(run()) == "disconnect"
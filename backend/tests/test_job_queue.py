@@ -0,0 +1,79 @@
+import pytest
+
+from utils import job_queue as job_queue_module
+from utils.job_queue import JobQueue
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(db_path=str(tmp_path / "jobs.db"), upload_dir=str(tmp_path / "uploads"))
+
+
+def enqueue(queue, name="report.pdf"):
+    job_id = queue.new_job_id()
+    return queue.enqueue(job_id, "page", name, queue.upload_path(job_id), "0" * 64, {"previous_analysis_id": None})
+
+
+def test_claim_takes_oldest_queued_job_once(queue):
+    first = enqueue(queue, "first.pdf")
+    second = enqueue(queue, "second.pdf")
+    job = queue.claim("worker-a")
+    assert job["id"] == first
+    assert job["status"] == "queued"
+    assert queue.get(first)["status"] == "running"
+    assert queue.get(first)["attempts"] == 1
+    assert queue.claim("worker-b")["id"] == second
+    assert queue.claim("worker-c") is None
+
+
+def test_complete_and_fail_record_the_outcome(queue):
+    done = enqueue(queue)
+    failed = enqueue(queue)
+    queue.claim("worker")
+    queue.claim("worker")
+    queue.complete(done, {"total_errors_found": 0})
+    queue.fail(failed, "Analysis failed: boom")
+    assert queue.get(done)["status"] == "done"
+    assert queue.get(done)["result"] == {"total_errors_found": 0}
+    assert queue.get(failed)["status"] == "failed"
+    assert queue.get(failed)["error"] == "Analysis failed: boom"
+    assert queue.stats()["done"] == 1
+    assert queue.stats()["failed"] == 1
+
+
+def test_progress_only_moves_forward(queue):
+    job_id = enqueue(queue)
+    queue.claim("worker")
+    queue.update_progress(job_id, 5, 10)
+    queue.update_progress(job_id, 3, 10)
+    assert queue.get(job_id)["completed"] == 5
+
+
+def test_stale_running_job_is_requeued_until_attempts_run_out(queue, monkeypatch):
+    job_id = enqueue(queue)
+    queue.claim("dead-worker")
+    # Every running job counts as stale
+    monkeypatch.setattr(job_queue_module, "JOB_STALE_SECONDS", -1)
+    monkeypatch.setattr(job_queue_module, "JOB_MAX_ATTEMPTS", 2)
+    job = queue.claim("worker-b")
+    assert job["id"] == job_id
+    assert queue.get(job_id)["attempts"] == 2
+    assert queue.claim("worker-c") is None
+    job = queue.get(job_id)
+    assert job["status"] == "failed"
+    assert job["error"] == "Worker stopped responding"
+
+
+def test_release_requeues_a_stopping_workers_jobs(queue):
+    mine = enqueue(queue)
+    other = enqueue(queue)
+    queue.claim("stopping")
+    queue.claim("staying")
+    assert queue.release("stopping") == 1
+    job = queue.get(mine)
+    assert job["status"] == "queued"
+    assert job["worker"] is None
+    # The interrupted run is not counted against the job
+    assert job["attempts"] == 0
+    assert queue.get(other)["status"] == "running"
+    assert queue.claim("next")["id"] == mine
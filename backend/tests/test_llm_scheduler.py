@@ -0,0 +1,95 @@
+import asyncio
+
+import pytest
+
+from utils.llm_scheduler import LLMScheduler, SchedulerOverloaded
+
+
+def test_slots_rotate_between_uploads():
+    order = []
+
+    async def call(name):
+        order.append(name)
+        await asyncio.sleep(0)
+
+    async def run():
+        scheduler = LLMScheduler(max_concurrency=1, max_queue_depth=100)
+        async with scheduler.session(4) as first, scheduler.session(2) as second:
+            # The first upload queues all of its pages before the second arrives
+            calls = [scheduler.run(first, call, f"a{index}") for index in range(4)]
+            calls += [scheduler.run(second, call, f"b{index}") for index in range(2)]
+            await asyncio.gather(*calls)
+        return scheduler
+
+    scheduler = asyncio.run(run())
+    assert order == ["a0", "a1", "b0", "a2", "b1", "a3"]
+    assert scheduler.active == 0
+    assert scheduler.queued == 0
+    assert scheduler.completed == 6
+
+
+def test_admission_rejects_when_the_queue_is_full():
+    async def run():
+        scheduler = LLMScheduler(max_concurrency=1, max_queue_depth=3, estimated_call_seconds=2)
+        gate = asyncio.Event()
+        async with scheduler.session(4) as tenant:
+            tasks = [asyncio.create_task(scheduler.run(tenant, gate.wait)) for _ in range(4)]
+            await asyncio.sleep(0)
+            assert (scheduler.active, scheduler.queued) == (1, 3)
+            with pytest.raises(SchedulerOverloaded) as error:
+                scheduler.admit(1)
+            gate.set()
+            await asyncio.gather(*tasks)
+        # An empty queue admits any upload, however large
+        scheduler.admit(1000)
+        return error.value.retry_after
+
+    assert asyncio.run(run()) >= 1
+
+
+def test_ending_a_session_drops_its_queued_calls():
+    async def run():
+        scheduler = LLMScheduler(max_concurrency=1, max_queue_depth=100)
+        gate = asyncio.Event()
+        async with scheduler.session(1) as busy:
+            running = asyncio.create_task(scheduler.run(busy, gate.wait))
+            async with scheduler.session(3) as dropped:
+                queued = [asyncio.create_task(scheduler.run(dropped, gate.wait)) for _ in range(3)]
+                await asyncio.sleep(0)
+                assert scheduler.queued == 3
+            assert scheduler.queued == 0
+            gate.set()
+            await running
+        results = await asyncio.gather(*queued, return_exceptions=True)
+        return scheduler, results
+
+    scheduler, results = asyncio.run(run())
+    assert all(isinstance(result, asyncio.CancelledError) for result in results)
+    assert scheduler.active == 0
+
+
+def test_admitted_sessions_reserve_their_calls_before_queueing():
+    async def run():
+        scheduler = LLMScheduler(max_concurrency=1, max_queue_depth=5)
+        gate = asyncio.Event()
+        async with scheduler.session(4) as first:
+            # Nothing is queued yet, but the first upload's calls are reserved
+            assert (scheduler.queued, scheduler.reserved) == (0, 4)
+            with pytest.raises(SchedulerOverloaded):
+                async with scheduler.session(4):
+                    pass
+            async with scheduler.session(1) as second:
+                assert scheduler.reserved == 5
+                tasks = [asyncio.create_task(scheduler.run(first, gate.wait)) for _ in range(2)]
+                await asyncio.sleep(0)
+                # Issued calls move from reserved to active or queued
+                assert (scheduler.active, scheduler.queued, scheduler.reserved) == (1, 1, 3)
+            # Ending a session returns its unused reservation
+            assert scheduler.reserved == 2
+            gate.set()
+            await asyncio.gather(*tasks)
+        assert scheduler.reserved == 0
+        return scheduler
+
+    scheduler = asyncio.run(run())
+    assert scheduler.rejected == 1
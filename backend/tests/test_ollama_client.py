@@ -0,0 +1,33 @@
+import asyncio
+
+from utils import ollama_client
+from utils.backend_pool import Backend, backend_pool
+
+
+def hedged_calls(monkeypatch, in_flight):
+    backend = Backend("http://ollama.test:11434", max_concurrency=2)
+    backend.in_flight = in_flight
+    monkeypatch.setattr(backend_pool, "backends", [backend])
+    calls = []
+
+    async def generate(payload, timeout_seconds, on_token=None, stats=None):
+        calls.append(timeout_seconds)
+        # The primary is slow, a duplicate answers at once
+        await asyncio.sleep(0.05 if len(calls) == 1 else 0)
+        return f"response {len(calls)}"
+
+    monkeypatch.setattr(ollama_client, "generate", generate)
+    response = asyncio.run(ollama_client.generate_hedged({}, 10, hedge_after=0.01))
+    return response, calls
+
+
+def test_slow_request_is_hedged_when_a_backend_is_free(monkeypatch):
+    response, calls = hedged_calls(monkeypatch, in_flight=1)
+    assert response == "response 2"
+    assert calls == [10, 10 - 0.01]
+
+
+def test_no_hedge_when_every_backend_is_busy(monkeypatch):
+    response, calls = hedged_calls(monkeypatch, in_flight=2)
+    assert response == "response 1"
+    assert calls == [10]
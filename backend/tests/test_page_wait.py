@@ -0,0 +1,51 @@
+import asyncio
+
+import main
+from main import wait_for_pages
+
+
+def run_pages(delays, monkeypatch, quorum=0.5, grace=0.2):
+    monkeypatch.setattr(main, "STRAGGLER_QUORUM", quorum)
+    monkeypatch.setattr(main, "STRAGGLER_GRACE_SECONDS", grace)
+
+    async def page(number, delay):
+        await asyncio.sleep(max(delay, 0))
+        if delay < 0:
+            raise RuntimeError("model error")
+        return {"page": number, "success": True}
+
+    async def run():
+        pages = [{"page": number, "text": ""} for number in range(1, len(delays) + 1)]
+        tasks = [asyncio.create_task(page(data["page"], delay)) for data, delay in zip(pages, delays)]
+        started = asyncio.get_running_loop().time()
+        results = await wait_for_pages(tasks, pages)
+        return results, asyncio.get_running_loop().time() - started, tasks
+
+    return asyncio.run(run())
+
+
+def test_all_pages_finish_in_order(monkeypatch):
+    results, _, _ = run_pages([0.05, 0, 0.02], monkeypatch)
+    assert [result["page"] for result in results] == [1, 2, 3]
+    assert all(result["success"] for result in results)
+
+
+def test_stragglers_are_flagged_after_the_quorum(monkeypatch):
+    results, elapsed, tasks = run_pages([0, 0, 0, 30], monkeypatch)
+    assert elapsed < 5
+    assert [result["success"] for result in results] == [True, True, True, False]
+    assert results[3]["page"] == 4
+    assert results[3]["error_type"] == "OllamaTimeout"
+    assert tasks[3].cancelled()
+
+
+def test_slow_pages_before_the_quorum_are_waited_for(monkeypatch):
+    # Only one of four pages is done within the grace period, below the quorum of three
+    results, _, _ = run_pages([0, 0.4, 0.4, 0.4], monkeypatch, quorum=0.75)
+    assert all(result["success"] for result in results)
+
+
+def test_page_exceptions_are_returned_like_gather(monkeypatch):
+    results, _, _ = run_pages([0, -1], monkeypatch)
+    assert results[0]["success"]
+    assert isinstance(results[1], RuntimeError)
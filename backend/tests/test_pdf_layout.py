@@ -0,0 +1,61 @@
+import io
+
+from PyPDF2 import PdfReader
+
+from utils.pdf_layout import extract_layout
+
+LINES = [f"Line {number} of the body text on this page" for number in range(1, 9)]
+
+
+def make_page(operations):
+    """One US Letter page drawing the given content stream with Times-Roman as /F1"""
+    stream = "\n".join(operations).encode("latin-1")
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [4 0 R] /Count 1 >>",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Times-Roman >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Resources << /Font << /F1 3 0 R >> >> /Contents 5 0 R >>",
+        b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream",
+    ]
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+    xref = len(output)
+    output += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for offset in offsets:
+        output += f"{offset:010d} 00000 n \n".encode()
+    output += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return PdfReader(io.BytesIO(bytes(output))).pages[0]
+
+
+def body(size, render_mode=0):
+    return [f"BT {render_mode} Tr /F1 {size} Tf 72 700 Td {size * 1.5} TL"] + [f"({line}) Tj T*" for line in LINES] + ["ET"]
+
+
+def test_visible_text_is_measured():
+    text, layout = extract_layout(make_page(body(12)))
+    assert "Line 1" in text
+    assert layout["body_font"] == "Times-Roman"
+    assert layout["body_size"] == 12
+    assert layout["body_lines"] == len(LINES)
+    assert layout["line_pitch"] == 18
+
+
+def test_invisible_ocr_layer_is_not_measured():
+    text, layout = extract_layout(make_page(body(7, render_mode=3)))
+    # The text layer still gives the page its text, but no layout
+    assert "Line 1" in text
+    assert layout["fonts"] == []
+    assert layout["body_font"] is None
+    assert layout["text_box"] is None
+    assert layout["body_lines"] == 0
+
+
+def test_render_mode_is_restored_with_the_graphics_state():
+    operations = ["q"] + body(7, render_mode=3) + ["Q"] + [
+        "BT /F1 12 Tf 72 300 Td 18 TL"] + [f"({line}) Tj T*" for line in LINES] + ["ET"]
+    _, layout = extract_layout(make_page(operations))
+    assert layout["fonts"] == [["Times-Roman", 12.0, sum(len(line) for line in LINES)]]
+    assert layout["body_lines"] == len(LINES)
@@ -0,0 +1,55 @@
+import asyncio
+import os
+
+import pytest
+
+from benchmarks.make_reports import make_report
+from utils import pdf_reader
+from utils.pdf_reader import PageStream, fixed_page_ranges, shutdown_process_pool, split_page_ranges
+
+
+def test_split_page_ranges_covers_every_page_evenly():
+    assert split_page_ranges(10, 3) == [(0, 4), (4, 7), (7, 10)]
+    assert split_page_ranges(2, 8) == [(0, 1), (1, 2)]
+    assert split_page_ranges(1, 1) == [(0, 1)]
+
+
+def test_fixed_page_ranges_have_bounded_size():
+    assert fixed_page_ranges(10, 4) == [(0, 4), (4, 8), (8, 10)]
+    assert fixed_page_ranges(8, 4) == [(0, 4), (4, 8)]
+    assert fixed_page_ranges(3, 32) == [(0, 3)]
+    assert fixed_page_ranges(0, 4) == []
+
+
+@pytest.fixture(scope="module")
+def report(tmp_path_factory):
+    return make_report(30, str(tmp_path_factory.mktemp("reports")))
+
+
+async def collect(source, content_hash, retain):
+    stream = await PageStream(source, content_hash, retain=retain).open()
+    return [page_data async for page_data in stream]
+
+
+@pytest.mark.parametrize("retain", [True, False])
+def test_parallel_extraction_of_in_memory_pdf_matches_serial(report, tmp_path, monkeypatch, retain):
+    monkeypatch.setattr(pdf_reader, "TEMP_DIR", str(tmp_path))
+    monkeypatch.setattr(pdf_reader, "PDF_RELEASE_EVERY_PAGES", 4)
+    with open(report, "rb") as f:
+        data = f.read()
+
+    monkeypatch.setattr(pdf_reader, "PDF_PARALLEL_MIN_PAGES", 1000)
+    serial = asyncio.run(collect(report, f"serial-{retain}", retain=False))
+
+    monkeypatch.setattr(pdf_reader, "PDF_PARALLEL_MIN_PAGES", 1)
+    monkeypatch.setattr(pdf_reader, "PDF_EXTRACT_WORKERS", 2)
+    monkeypatch.setattr(pdf_reader, "PDF_EXTRACT_AHEAD", 2)
+    try:
+        parallel = asyncio.run(collect(data, f"parallel-{retain}", retain=retain))
+    finally:
+        shutdown_process_pool()
+
+    assert [page["page"] for page in parallel] == list(range(1, 31))
+    assert [page["text"] for page in parallel] == [page["text"] for page in serial]
+    # The spilled copy handed to the workers is removed afterwards
+    assert os.listdir(tmp_path) == []
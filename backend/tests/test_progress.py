@@ -0,0 +1,31 @@
+import asyncio
+
+from main import progress_counter
+
+
+def test_progress_counts_finished_pages_but_not_cancelled_ones():
+    reported = []
+
+    async def run():
+        on_done = progress_counter(lambda completed, total: reported.append((completed, total)), 4)
+
+        async def page(delay, fail=False):
+            await asyncio.sleep(delay)
+            if fail:
+                raise RuntimeError("model error")
+
+        tasks = [
+            asyncio.create_task(page(0)),
+            asyncio.create_task(page(0, fail=True)),
+            asyncio.create_task(page(10)),
+            asyncio.create_task(page(10)),
+        ]
+        for task in tasks:
+            task.add_done_callback(on_done)
+        await asyncio.sleep(0.05)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    asyncio.run(run())
+    assert reported == [(1, 4), (2, 4)]
@@ -0,0 +1,19 @@
+from prompt.prompt_manager import PromptManager
+
+
+def test_layout_rules_go_to_the_model_without_local_checks():
+    rules = PromptManager(narrow_rules=True, layout_checks=False).model_rules
+    assert "LAYOUT REQUIREMENTS" in rules
+    assert "Font, font size, line spacing and margins" not in rules
+
+
+def test_layout_rules_are_not_reported_with_local_checks():
+    rules = PromptManager(narrow_rules=True, layout_checks=True).model_rules
+    assert "LAYOUT REQUIREMENTS" not in rules
+    assert "LAYOUT CHECKED AUTOMATICALLY - DO NOT REPORT" in rules
+    assert "Font, font size, line spacing and margins" in rules
+
+
+def test_full_rules_without_rule_engine():
+    manager = PromptManager(narrow_rules=False, layout_checks=True)
+    assert manager.model_rules == manager.tu_rules
@@ -0,0 +1,110 @@
+from utils.rule_engine import (
+    detect_page_label, follows, run_rule_checks, check_page_numbers, check_citations, check_layout, is_trivial_page,
+)
+
+
+def pages_of(*texts):
+    return [{"page": number, "text": text} for number, text in enumerate(texts, start=1)]
+
+
+def messages(violations):
+    return [violation["text"] for violation in violations]
+
+
+def test_detect_page_label_at_either_end():
+    assert detect_page_label("3\nIntroduction\nBody text")[0] == "3"
+    assert detect_page_label("Body text\nmore text\niv")[0] == "iv"
+    assert detect_page_label("2 Disclaimer\nBody text") == ("2", ["Disclaimer", "Body text"])
+
+
+def test_words_spelled_with_numeral_letters_are_not_labels():
+    for word in ("mid", "dim", "civil", "did"):
+        label, lines = detect_page_label(f"Body text\n{word}")
+        assert label is None
+        assert lines[-1] == word
+
+
+def test_non_numeral_last_lines_do_not_break_page_number_checks():
+    pages = pages_of("Cover", "Body text\n2", "Body words\nmid", "More text\ndim", "Last page\n5")
+    violations = run_rule_checks(pages)
+    assert messages(violations) == [
+        "[ERROR] Page number is missing; page numbering must start from page 2",
+        "[ERROR] Page number is missing; page numbering must start from page 2",
+    ]
+    assert [violation["page"] for violation in violations] == [3, 4]
+
+
+def test_page_numbers_in_sequence_pass():
+    pages = pages_of("Cover", "Body\n2", "Body\n3", "Body\n4")
+    labels = {2: "2", 3: "3", 4: "4"}
+    assert check_page_numbers(pages, labels) == []
+
+
+def test_page_number_out_of_sequence_and_on_cover():
+    pages = pages_of("Cover\n1", "Body\n2", "Body\n7")
+    labels = {1: "1", 2: "2", 3: "7"}
+    assert messages(check_page_numbers(pages, labels)) == [
+        "[ERROR] Cover page should not display a page number (found \"1\")",
+        "[ERROR] Page numbering is out of sequence: page shows 7 but 3 was expected",
+    ]
+
+
+def test_roman_front_matter_then_arabic_restart():
+    pages = pages_of("Cover", "Abstract\nii", "Contents\niii", "Introduction\n1", "Body\n2")
+    labels = {2: "ii", 3: "iii", 4: "1", 5: "2"}
+    assert check_page_numbers(pages, labels) == []
+
+
+def test_citations_match_reference_list():
+    pages = pages_of(
+        "Cover",
+        "As shown in [1] and [3-4], and by (Smith, 2020).",
+        "References\n[1] First.\n[2] Second.\n[3] Third.",
+    )
+    assert messages(check_citations(pages)) == [
+        "[ERROR] Citation \"(Smith, 2020)\" is not in IEEE style; use numbered citations like [1]",
+        "[ERROR] Citation [4] has no matching entry in the reference list",
+        "[WARNING] Reference [2] is never cited in the text",
+    ]
+
+
+def test_heading_numbering_successors():
+    assert follows([1], [2])
+    assert follows([1], [1, 1])
+    assert follows([1, 2], [2])
+    assert follows([1, 6], [2, 1])
+    assert not follows([1, 1], [1, 3])
+    assert not follows([1], [3])
+
+
+def test_skipped_heading_number_is_reported():
+    pages = pages_of("Cover", "1 INTRODUCTION\nBody text.\n2", "1.1 Background\nBody.\n1.3 Scope\nBody.\n3")
+    assert "[WARNING] Heading numbering is inconsistent: \"1.3 Scope\" follows 1.1 (expected 1.2)" in messages(run_rule_checks(pages))
+
+
+def test_trivial_pages():
+    assert is_trivial_page("3\nFigure 1")
+    assert not is_trivial_page("This page has enough words in it to be worth sending to the model for review")
+
+
+def layout_page(page, heading):
+    """A well set page of 12pt Times body text headed by a centered line in the regular face"""
+    return {"page": page, "text": heading, "layout": {
+        "box": [0, 0, 612, 792],
+        "text_box": [72, 72, 540, 720],
+        "fonts": [["Times-Roman", 12.0, 2000]],
+        "body_font": "Times-Roman",
+        "body_size": 12.0,
+        "body_lines": 30,
+        "line_pitch": 18.0,
+        "lines": [[heading, 250.0, 362.0, 12.0, "Times-Roman", False]],
+    }}
+
+
+def test_heading_style_findings_across_pages_are_reported_once():
+    pages = [layout_page(1, "Cover"), layout_page(2, "1. Introduction"), layout_page(4, "2. Methods")]
+    headings = [(2, (1,), "Introduction", "1. Introduction"), (4, (2,), "Methods", "2. Methods")]
+    violations = check_layout(pages, headings)
+    assert [(violation["page"], violation["text"]) for violation in violations] == [
+        (2, "[WARNING] Main headings are not bold; TU headings are bold (pages 2, 4)"),
+    ]
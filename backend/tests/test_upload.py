@@ -0,0 +1,105 @@
+import asyncio
+import io
+import os
+
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from utils import upload
+from utils.upload import UploadLimitMiddleware, UploadTooLarge, receive_upload
+
+
+class FakeUpload:
+    """The read() side of Starlette's UploadFile over in-memory bytes"""
+
+    def __init__(self, data, filename="report.pdf"):
+        self.filename = filename
+        self._file = io.BytesIO(data)
+
+    async def read(self, size=-1):
+        return self._file.read(size)
+
+
+async def receive(data, **kwargs):
+    async with receive_upload(FakeUpload(data), **kwargs) as received:
+        return received.size, received.in_memory, received.source, received.path
+
+
+def test_small_upload_stays_in_memory():
+    size, in_memory, source, _ = asyncio.run(receive(b"%PDF-" + b"x" * 100, max_bytes=1000, memory_threshold=500))
+    assert size == 105
+    assert in_memory
+    assert source.startswith(b"%PDF-")
+
+
+def test_large_upload_spills_and_is_removed(tmp_path, monkeypatch):
+    monkeypatch.setattr(upload, "TEMP_DIR", str(tmp_path))
+    monkeypatch.setattr(upload, "UPLOAD_CHUNK_SIZE", 64)
+    size, in_memory, _, path = asyncio.run(receive(b"x" * 1000, max_bytes=2000, memory_threshold=100))
+    assert size == 1000
+    assert not in_memory
+    assert not os.path.exists(path)
+
+
+def test_upload_over_the_cap_is_refused(tmp_path, monkeypatch):
+    monkeypatch.setattr(upload, "TEMP_DIR", str(tmp_path))
+    monkeypatch.setattr(upload, "UPLOAD_CHUNK_SIZE", 64)
+    with pytest.raises(UploadTooLarge):
+        asyncio.run(receive(b"x" * 1000, max_bytes=500, memory_threshold=100))
+    assert os.listdir(tmp_path) == []
+
+
+def limited_client(max_bytes, monkeypatch):
+    monkeypatch.setattr(upload, "UPLOAD_FORM_OVERHEAD", 0)
+
+    async def endpoint(request):
+        form = await request.form()
+        return JSONResponse({"size": len(await form["file"].read())})
+
+    app = Starlette(routes=[Route("/analyze", endpoint, methods=["POST"])])
+    return TestClient(UploadLimitMiddleware(app, limits={"/analyze": max_bytes}))
+
+
+def test_middleware_accepts_bodies_within_the_limit(monkeypatch):
+    client = limited_client(10_000, monkeypatch)
+    response = client.post("/analyze", files={"file": ("report.pdf", b"x" * 1000)})
+    assert response.status_code == 200
+    assert response.json() == {"size": 1000}
+
+
+def test_middleware_refuses_declared_length_over_the_limit(monkeypatch):
+    client = limited_client(1000, monkeypatch)
+    response = client.post("/analyze", files={"file": ("report.pdf", b"x" * 5000)})
+    assert response.status_code == 413
+    assert "maximum upload size" in response.json()["error"]
+
+
+def test_middleware_cuts_off_streamed_body_at_the_limit(monkeypatch):
+    client = limited_client(1000, monkeypatch)
+    boundary = "limit"
+    chunks = [f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="report.pdf"\r\n\r\n'.encode()]
+    chunks += [b"x" * 100] * 50 + [f"\r\n--{boundary}--\r\n".encode()]
+    sent = []
+    messages = []
+
+    async def receive():
+        if len(sent) < len(chunks):
+            sent.append(chunks[len(sent)])
+            return {"type": "http.request", "body": sent[-1], "more_body": len(sent) < len(chunks)}
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        messages.append(message)
+
+    # Chunked, so there is no Content-Length to refuse up front
+    scope = {
+        "type": "http", "method": "POST", "path": "/analyze", "root_path": "", "query_string": b"",
+        "headers": [(b"content-type", f"multipart/form-data; boundary={boundary}".encode())],
+    }
+    asyncio.run(client.app(scope, receive, send))
+    assert messages[0]["status"] == 413
+    # Reading stops at the limit instead of taking the whole body
+    assert len(sent) < len(chunks) / 2
@@ -0,0 +1,94 @@
+"""
+Analysis Store Module
+Keeps per-page results of past analyses, keyed by analysis ID, so that a
+revised upload only sends its changed pages to the model
+"""
+
+import hashlib
+import os
+import uuid
+from bisect import bisect_left
+from dotenv import load_dotenv
+from utils.cache import PersistentLRUCache
+from utils.rule_engine import detect_page_label
+
+# Load environment variables
+load_dotenv()
+
+# Stored analyses - an empty ANALYSIS_STORE_PATH keeps them in memory only
+ANALYSIS_STORE_SIZE = int(os.getenv("ANALYSIS_STORE_SIZE", 256))
+ANALYSIS_STORE_PATH = os.getenv("ANALYSIS_STORE_PATH", "")
+
+# Compact result payloads served page by page by GET /analyses/{id}/results
+ANALYSIS_RESULTS_SIZE = int(os.getenv("ANALYSIS_RESULTS_SIZE", 64))
+
+analysis_store = PersistentLRUCache("analyses", ANALYSIS_STORE_SIZE, ANALYSIS_STORE_PATH or None)
+results_store = PersistentLRUCache("analysis_results", ANALYSIS_RESULTS_SIZE, ANALYSIS_STORE_PATH or None)
+
+
+def page_fingerprint(text):
+    """Hash of a page's normalized text, ignoring its printed page number"""
+    # Inserting a page renumbers every later page, which must not count as a change
+    _, lines = detect_page_label(text)
+    return hashlib.sha256(" ".join(" ".join(lines).split()).encode("utf-8")).hexdigest()
+
+
+def new_analysis_id():
+    return uuid.uuid4().hex
+
+
+def is_analysis_id(value):
+    """Whether value has the form of an ID from new_analysis_id()"""
+    return len(value) == 32 and all(c in "0123456789abcdef" for c in value)
+
+
+def save_analysis(analysis_id, version, pages):
+    """Store fingerprinted page results; pages are dicts with "page", "fingerprint" and "result" """
+    analysis_store.set(analysis_id, {"version": version, "pages": pages})
+
+
+def save_results(analysis_id, payload):
+    """Store the compact result payload of an analysis for paginated retrieval"""
+    results_store.set(analysis_id, payload)
+
+
+def load_results(analysis_id):
+    """Return the stored compact result payload of an analysis, or None if unknown"""
+    return results_store.get(analysis_id)
+
+
+def load_analysis(analysis_id, version):
+    """Return the stored pages of an analysis, or None if unknown or made with other rules/model"""
+    stored = analysis_store.get(analysis_id)
+    if stored is None or stored.get("version") != version:
+        return None
+    return stored["pages"]
+
+
+class PageAligner:
+    """Matches pages of a revised document to pages of an earlier version as they arrive
+
+    Matching moves forward through the old document, so inserted or removed
+    pages only affect themselves instead of shifting every later page.
+    """
+
+    def __init__(self, previous_pages):
+        self.previous_pages = previous_pages
+        self.positions = {}
+        for index, entry in enumerate(previous_pages):
+            # Skipped trivial pages are free to redo and would only pull the cursor ahead
+            if entry["result"].get("success") and not entry["result"].get("skipped"):
+                self.positions.setdefault(entry["fingerprint"], []).append(index)
+        self.cursor = 0
+
+    def match(self, fingerprint):
+        """Return the earlier page entry with this fingerprint, or None if the page changed"""
+        positions = self.positions.get(fingerprint)
+        if not positions:
+            return None
+        found = bisect_left(positions, self.cursor)
+        if found == len(positions):
+            return None
+        index = positions[found]
+        self.cursor = index + 1
+        return self.previous_pages[index]
@@ -0,0 +1,225 @@
+"""
+Backend Pool Module
+Routes Ollama requests across several servers by least outstanding requests,
+with per-backend concurrency limits, health probes and automatic ejection
+"""
+
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+import httpx
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Comma-separated "url|weight|max_concurrency" entries; weight and limit are optional
+OLLAMA_BACKENDS = os.getenv("OLLAMA_BACKENDS", "")
+OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434/api/generate")
+OLLAMA_BACKEND_MAX_CONCURRENCY = int(os.getenv("OLLAMA_BACKEND_MAX_CONCURRENCY", 4))
+# Health probing and ejection
+OLLAMA_HEALTH_INTERVAL = float(os.getenv("OLLAMA_HEALTH_INTERVAL", 10))
+OLLAMA_HEALTH_TIMEOUT = float(os.getenv("OLLAMA_HEALTH_TIMEOUT", 2))
+OLLAMA_EJECT_AFTER_FAILURES = int(os.getenv("OLLAMA_EJECT_AFTER_FAILURES", 3))
+OLLAMA_READMIT_AFTER_PROBES = int(os.getenv("OLLAMA_READMIT_AFTER_PROBES", 2))
+
+GENERATE_PATH = "/api/generate"
+
+
+def is_backend_failure(error):
+    """Whether an error says something about the backend rather than the request"""
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code >= 500
+    return isinstance(error, (httpx.TransportError, httpx.TimeoutException))
+
+
+class Backend:
+    """One Ollama server and its routing state"""
+
+    def __init__(self, url, weight=1.0, max_concurrency=OLLAMA_BACKEND_MAX_CONCURRENCY):
+        url = url.rstrip("/")
+        self.base_url = url[:-len(GENERATE_PATH)] if url.endswith(GENERATE_PATH) else url
+        self.generate_url = self.base_url + GENERATE_PATH
+        self.weight = weight
+        self.max_concurrency = max_concurrency
+        self.in_flight = 0
+        self.healthy = True
+        self.consecutive_failures = 0
+        self.good_probes = 0
+        self.requests = 0
+        self.failures = 0
+        self.ejections = 0
+        self.total_seconds = 0.0
+        self.last_probe = None
+
+    @property
+    def has_capacity(self):
+        return self.in_flight < self.max_concurrency
+
+    def load(self):
+        """Outstanding requests relative to weight, counting the one being placed"""
+        return (self.in_flight + 1) / self.weight
+
+    def stats(self):
+        return {
+            "url": self.base_url,
+            "weight": self.weight,
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "healthy": self.healthy,
+            "requests": self.requests,
+            "failures": self.failures,
+            "consecutive_failures": self.consecutive_failures,
+            "ejections": self.ejections,
+            "avg_latency_ms": round(self.total_seconds / self.requests * 1000, 1) if self.requests else 0.0,
+            "last_probe": self.last_probe,
+        }
+
+
+def parse_backends(spec):
+    """Parse OLLAMA_BACKENDS into Backend objects"""
+    backends = []
+    for entry in spec.split(","):
+        parts = [part.strip() for part in entry.split("|")]
+        if not parts[0]:
+            continue
+        weight = float(parts[1]) if len(parts) > 1 and parts[1] else 1.0
+        max_concurrency = int(parts[2]) if len(parts) > 2 and parts[2] else OLLAMA_BACKEND_MAX_CONCURRENCY
+        backends.append(Backend(parts[0], weight, max_concurrency))
+    return backends
+
+
+class BackendPool:
+    """Least-outstanding-requests load balancer over Ollama backends"""
+
+    def __init__(self, backends, eject_after_failures=OLLAMA_EJECT_AFTER_FAILURES,
+                 readmit_after_probes=OLLAMA_READMIT_AFTER_PROBES):
+        self.backends = backends
+        self.eject_after_failures = eject_after_failures
+        self.readmit_after_probes = readmit_after_probes
+        self._available = None
+        self._probe_task = None
+
+    @property
+    def capacity(self):
+        """Concurrent requests the pool can serve when every backend is healthy"""
+        return sum(backend.max_concurrency for backend in self.backends)
+
+    @property
+    def has_spare_capacity(self):
+        """Whether a healthy backend could take another request right now"""
+        return any(backend.healthy and backend.has_capacity for backend in self.backends)
+
+    def _condition(self):
+        # Created lazily so it binds to the running event loop
+        if self._available is None:
+            self._available = asyncio.Condition()
+        return self._available
+
+    def _pick(self):
+        healthy = [backend for backend in self.backends if backend.healthy]
+        # With every backend ejected, keep trying them rather than failing outright
+        candidates = [backend for backend in healthy or self.backends if backend.has_capacity]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda backend: (backend.load(), backend.requests))
+
+    @asynccontextmanager
+    async def acquire(self):
+        """Reserve a slot on the least loaded backend for one request"""
+        available = self._condition()
+        async with available:
+            backend = self._pick()
+            while backend is None:
+                await available.wait()
+                backend = self._pick()
+            backend.in_flight += 1
+
+        started = time.perf_counter()
+        try:
+            yield backend
+        except Exception as e:
+            if is_backend_failure(e):
+                self._record_failure(backend, e)
+            raise
+        else:
+            backend.consecutive_failures = 0
+        finally:
+            backend.requests += 1
+            backend.total_seconds += time.perf_counter() - started
+            async with available:
+                backend.in_flight -= 1
+                available.notify()
+
+    def _record_failure(self, backend, error):
+        backend.failures += 1
+        backend.consecutive_failures += 1
+        if backend.healthy and backend.consecutive_failures >= self.eject_after_failures:
+            self._eject(backend, f"{backend.consecutive_failures} consecutive failures ({type(error).__name__})")
+
+    def _eject(self, backend, reason):
+        backend.healthy = False
+        backend.good_probes = 0
+        backend.ejections += 1
+        logging.warning(f"Ejected Ollama backend {backend.base_url}: {reason}")
+
+    async def probe(self, client, backend):
+        """Check one backend and eject or readmit it"""
+        try:
+            response = await client.get(backend.base_url + "/api/tags", timeout=OLLAMA_HEALTH_TIMEOUT)
+            response.raise_for_status()
+            ok = True
+        except Exception as e:
+            ok = False
+            error = e
+        backend.last_probe = "ok" if ok else "failed"
+
+        if not ok:
+            if backend.healthy:
+                self._eject(backend, f"health probe failed ({type(error).__name__})")
+            backend.good_probes = 0
+            return
+        if not backend.healthy:
+            backend.good_probes += 1
+            if backend.good_probes >= self.readmit_after_probes:
+                backend.healthy = True
+                backend.consecutive_failures = 0
+                logging.info(f"Readmitted Ollama backend {backend.base_url}")
+                async with self._condition():
+                    self._condition().notify_all()
+
+    async def probe_all(self, client):
+        await asyncio.gather(*(self.probe(client, backend) for backend in self.backends))
+
+    async def _probe_loop(self, interval):
+        async with httpx.AsyncClient() as client:
+            while True:
+                await self.probe_all(client)
+                await asyncio.sleep(interval)
+
+    def start_health_checks(self, interval=OLLAMA_HEALTH_INTERVAL):
+        """Start periodic background probes of every backend"""
+        if self._probe_task is None and interval > 0:
+            self._probe_task = asyncio.create_task(self._probe_loop(interval))
+
+    async def stop_health_checks(self):
+        if self._probe_task is not None:
+            self._probe_task.cancel()
+            try:
+                await self._probe_task
+            except asyncio.CancelledError:
+                pass
+            self._probe_task = None
+
+    def stats(self):
+        return {
+            "capacity": self.capacity,
+            "healthy": sum(1 for backend in self.backends if backend.healthy),
+            "backends": [backend.stats() for backend in self.backends],
+        }
+
+
+# Global instance for easy access
+backend_pool = BackendPool(parse_backends(OLLAMA_BACKENDS or OLLAMA_URL))
@@ -0,0 +1,222 @@
+"""
+Bulk Upload Module
+Collects the PDFs of a whole-cohort submission, sent as zip archives and/or
+individual files, into a private directory, groups identical files by content
+hash so each is analyzed once, and aggregates the cohort summary
+"""
+
+import asyncio
+import hashlib
+import os
+import shutil
+import tempfile
+import zipfile
+from collections import Counter
+from dotenv import load_dotenv
+from utils.upload import receive_upload, UploadTooLarge, TEMP_DIR, UPLOAD_CHUNK_SIZE, UPLOAD_MAX_BYTES
+
+# Load environment variables
+load_dotenv()
+
+# Total bytes of every PDF in one submission, after zips are expanded
+BULK_MAX_BYTES = int(os.getenv("BULK_MAX_BYTES", 1024 * 1024 * 1024))
+BULK_MAX_DOCUMENTS = int(os.getenv("BULK_MAX_DOCUMENTS", 500))
+# Documents of one submission extracted and analyzed at the same time
+BULK_CONCURRENCY = int(os.getenv("BULK_CONCURRENCY", 4))
+# Violation texts listed in the cohort summary, most widespread first
+COHORT_TOP_VIOLATIONS = int(os.getenv("COHORT_TOP_VIOLATIONS", 10))
+
+
+class BulkSubmissionError(Exception):
+    """Raised when a bulk submission cannot be accepted as a whole"""
+
+
+class BulkDocument:
+    """One unique PDF of a submission and every filename it was sent under"""
+
+    def __init__(self, index, filename, path, sha256, size):
+        self.index = index
+        self.filenames = [filename]
+        self.path = path
+        self.sha256 = sha256
+        self.size = size
+
+
+class BulkSubmission:
+    """The PDFs of one bulk request, stored in a private directory until close()
+
+    Files with identical content become a single BulkDocument. Entries that are
+    not PDFs, or that exceed the per-file upload limit, are kept in "rejected"
+    with the reason so they can be reported alongside the results.
+    """
+
+    def __init__(self, max_bytes=BULK_MAX_BYTES, max_documents=BULK_MAX_DOCUMENTS):
+        os.makedirs(TEMP_DIR, exist_ok=True)
+        self.directory = tempfile.mkdtemp(prefix="bulk_", dir=TEMP_DIR)
+        self.max_bytes = max_bytes
+        self.max_documents = max_documents
+        self.documents = {}
+        self.rejected = []
+        self.file_count = 0
+        self.total_bytes = 0
+
+    @property
+    def duplicate_count(self):
+        return self.file_count - len(self.documents)
+
+    async def add_upload(self, file):
+        """Store one uploaded PDF, or every PDF inside an uploaded zip archive"""
+        async with receive_upload(file, max_bytes=self.max_bytes, memory_threshold=0) as upload:
+            if zipfile.is_zipfile(upload.path):
+                # Decompressing and hashing the entries would stall the event loop
+                await asyncio.to_thread(self._expand_zip, upload.path, file.filename)
+            elif upload.size > UPLOAD_MAX_BYTES:
+                self._reject(file.filename, str(UploadTooLarge(UPLOAD_MAX_BYTES)))
+            elif not is_pdf(upload.path):
+                self._reject(file.filename, "Not a PDF or zip archive")
+            else:
+                path = self._next_path()
+                os.replace(upload.path, path)
+                self._add(file.filename, path, upload.sha256, upload.size)
+
+    def _expand_zip(self, archive_path, archive_name):
+        try:
+            with zipfile.ZipFile(archive_path) as archive:
+                for member in archive.infolist():
+                    name = member.filename
+                    # Folders and the resource forks macOS adds to its archives hold no documents
+                    if member.is_dir() or name.startswith("__MACOSX/") or os.path.basename(name).startswith("._"):
+                        continue
+                    filename = f"{archive_name}/{name}"
+                    if not name.lower().endswith(".pdf"):
+                        self._reject(filename, "Not a PDF")
+                        continue
+                    if member.file_size > UPLOAD_MAX_BYTES:
+                        self._reject(filename, str(UploadTooLarge(UPLOAD_MAX_BYTES)))
+                        continue
+                    self._extract_member(archive, member, filename)
+        except (zipfile.BadZipFile, NotImplementedError, RuntimeError) as e:
+            # Corrupt, encrypted or unsupported archives
+            raise BulkSubmissionError(f"Could not read zip archive '{archive_name}': {str(e)}")
+
+    def _extract_member(self, archive, member, filename):
+        """Copy one archive entry into the directory, hashing it and enforcing both size limits"""
+        digest = hashlib.sha256()
+        size = 0
+        path = self._next_path()
+        try:
+            with archive.open(member) as source, open(path, "wb") as target:
+                while True:
+                    chunk = source.read(UPLOAD_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    # Sizes in the archive's directory are not trusted
+                    size += len(chunk)
+                    if size > UPLOAD_MAX_BYTES:
+                        raise UploadTooLarge(UPLOAD_MAX_BYTES)
+                    self._check_total(size)
+                    digest.update(chunk)
+                    target.write(chunk)
+        except UploadTooLarge as e:
+            os.remove(path)
+            self._reject(filename, str(e))
+            return
+        except BaseException:
+            os.remove(path)
+            raise
+        if not is_pdf(path):
+            os.remove(path)
+            self._reject(filename, "Not a PDF")
+            return
+        self._add(filename, path, digest.hexdigest(), size)
+
+    def _add(self, filename, path, sha256, size):
+        self.file_count += 1
+        document = self.documents.get(sha256)
+        if document is not None:
+            # Identical content is analyzed once and reported under every name
+            document.filenames.append(filename)
+            os.remove(path)
+            return
+        if len(self.documents) >= self.max_documents:
+            os.remove(path)
+            raise BulkSubmissionError(f"Submission exceeds the maximum of {self.max_documents} documents")
+        self._check_total(size)
+        self.total_bytes += size
+        self.documents[sha256] = BulkDocument(len(self.documents), filename, path, sha256, size)
+
+    def _check_total(self, size):
+        if self.total_bytes + size > self.max_bytes:
+            raise BulkSubmissionError(f"Submission exceeds the maximum size of {self.max_bytes / (1024 * 1024):.1f} MB")
+
+    def _reject(self, filename, reason):
+        self.rejected.append({"filename": filename, "error": reason})
+
+    def _next_path(self):
+        fd, path = tempfile.mkstemp(suffix=".pdf", dir=self.directory)
+        os.close(fd)
+        return path
+
+    def close(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def is_pdf(path):
+    """Whether a file starts with the PDF header"""
+    with open(path, "rb") as f:
+        # Readers accept the header anywhere in the first kilobyte
+        return b"%PDF-" in f.read(1024)
+
+
+class CohortSummary:
+    """Running totals over the documents of a bulk submission"""
+
+    def __init__(self, submission):
+        self.submission = submission
+        self.failed = []
+        self.total_pages = 0
+        self.total_issues = 0
+        self.clean_documents = 0
+        self.partial_documents = 0
+        self.category_totals = Counter()
+        # Documents each distinct violation text appears in
+        self.violation_documents = Counter()
+
+    def add(self, document, summary):
+        if "error" in summary:
+            self.failed.append({"filenames": document.filenames, "error": summary["error"]})
+            return
+        self.total_pages += summary.get("total_pages_analyzed", 0)
+        self.total_issues += summary.get("total_errors_found", 0)
+        if summary.get("partial"):
+            self.partial_documents += 1
+        if not summary.get("total_errors_found"):
+            self.clean_documents += 1
+        texts = set()
+        for category, entries in summary.get("categorized_results", {}).items():
+            self.category_totals[category] += len(entries)
+            texts.update(entry["text"] for entry in entries)
+        self.violation_documents.update(texts)
+
+    def summary(self, elapsed_seconds):
+        submission = self.submission
+        analyzed = len(submission.documents) - len(self.failed)
+        return {
+            "files": submission.file_count + len(submission.rejected),
+            "documents": len(submission.documents),
+            "duplicate_files": submission.duplicate_count,
+            "rejected_files": len(submission.rejected),
+            "analyzed_documents": analyzed,
+            "failed_documents": self.failed,
+            "partial_documents": self.partial_documents,
+            "clean_documents": self.clean_documents,
+            "total_pages_analyzed": self.total_pages,
+            "total_errors_found": self.total_issues,
+            "categorized_totals": dict(self.category_totals),
+            "common_violations": [
+                {"text": text, "documents": count}
+                for text, count in self.violation_documents.most_common(COHORT_TOP_VIOLATIONS)
+            ],
+            "elapsed_seconds": round(elapsed_seconds, 2),
+            "pages_per_second": round(self.total_pages / elapsed_seconds, 2) if elapsed_seconds > 0 else None
+        }
@@ -0,0 +1,142 @@
+"""
+Cache Module
+Bounded in-memory LRU cache with an optional SQLite store that survives restarts
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class PersistentLRUCache:
+    """LRU cache of JSON-serializable values, optionally backed by SQLite"""
+
+    def __init__(self, name, max_entries, db_path=None, max_disk_entries=None):
+        self.name = name
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries or max_entries * 10
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if db_path:
+            self._open_store(db_path)
+
+    def _open_store(self, db_path):
+        try:
+            directory = os.path.dirname(db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.name} "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS cache_meta (name TEXT PRIMARY KEY, version TEXT)"
+            )
+            self._db.commit()
+        except sqlite3.Error as e:
+            logging.error(f"Failed to open {self.name} cache store at {db_path}: {str(e)}")
+            self._db = None
+
+    def get(self, key):
+        """Return the cached value for key, or None on a miss"""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return self._memory[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    f"SELECT value FROM {self.name} WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    value = json.loads(row[0])
+                    self._db.execute(
+                        f"UPDATE {self.name} SET accessed = ? WHERE key = ?", (time.time(), key)
+                    )
+                    self._db.commit()
+                    self._remember(key, value)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return value
+
+            self.misses += 1
+            return None
+
+    def set(self, key, value):
+        """Store value under key in memory and on disk"""
+        with self._lock:
+            self._remember(key, value)
+            if self._db is not None:
+                self._db.execute(
+                    f"INSERT OR REPLACE INTO {self.name} (key, value, accessed) VALUES (?, ?, ?)",
+                    (key, json.dumps(value), time.time()),
+                )
+                self._trim_store()
+                self._db.commit()
+
+    def _remember(self, key, value):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _trim_store(self):
+        count = self._db.execute(f"SELECT COUNT(*) FROM {self.name}").fetchone()[0]
+        if count > self.max_disk_entries:
+            self._db.execute(
+                f"DELETE FROM {self.name} WHERE key IN "
+                f"(SELECT key FROM {self.name} ORDER BY accessed LIMIT ?)",
+                (count - self.max_disk_entries,),
+            )
+
+    def set_version(self, version):
+        """Invalidate every entry if the content version has changed"""
+        with self._lock:
+            stored = self.version
+            if stored is None and self._db is not None:
+                row = self._db.execute(
+                    "SELECT version FROM cache_meta WHERE name = ?", (self.name,)
+                ).fetchone()
+                stored = row[0] if row else None
+            if stored == version:
+                self.version = version
+                return False
+
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute(f"DELETE FROM {self.name}")
+                self._db.execute(
+                    "INSERT OR REPLACE INTO cache_meta (name, version) VALUES (?, ?)",
+                    (self.name, version),
+                )
+                self._db.commit()
+            invalidated = self.version is not None or stored is not None
+            self.version = version
+            if invalidated:
+                logging.info(f"Invalidated {self.name} cache for version {version[:12]}")
+            return invalidated
+
+    def stats(self):
+        """Return hit/miss counters and sizes"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._memory),
+            "max_entries": self.max_entries,
+            "persistent": self._db is not None,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
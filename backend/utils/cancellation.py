@@ -0,0 +1,102 @@
+"""
+Cancellation Module
+Request-scoped cancellation of running analyses, triggered by the client
+disconnecting or by DELETE /analyses/{id}. Cancelling the analysis task drops
+its queued generation calls and closes its in-flight Ollama requests, which
+stops the generations on the server.
+"""
+
+import asyncio
+from contextlib import contextmanager
+from utils.metrics import cancelled_analyses
+
+
+class AnalysisCancelled(Exception):
+    """Raised when an analysis is cancelled before it finishes"""
+
+    def __init__(self, analysis_id, reason):
+        super().__init__(f"Analysis {analysis_id} was cancelled ({reason})")
+        self.analysis_id = analysis_id
+        self.reason = reason
+
+
+class CancelScope:
+    """Cancellation state of one running analysis"""
+
+    def __init__(self, analysis_id, endpoint):
+        self.analysis_id = analysis_id
+        self.endpoint = endpoint
+        self.reason = None
+        # Set on cancellation, for streaming endpoints that wait on it between events
+        self.cancelled = asyncio.Event()
+        self._task = None
+
+    def cancel(self, reason):
+        """Cancel the analysis once; returns False if it was already cancelled"""
+        if self.reason is not None:
+            return False
+        self.reason = reason
+        cancelled_analyses.inc(endpoint=self.endpoint, reason=reason)
+        self.cancelled.set()
+        if self._task is not None:
+            self._task.cancel()
+        return True
+
+    async def run(self, coro, receive=None):
+        """Await coro in a task that cancel() aborts, returning its result
+
+        receive is the request's ASGI receive callable; when given, a client
+        disconnect cancels the task too. Raises AnalysisCancelled.
+        """
+        self._task = asyncio.create_task(coro)
+        watcher = asyncio.create_task(self._watch_disconnect(receive)) if receive is not None else None
+        try:
+            return await self._task
+        except asyncio.CancelledError:
+            # Cancellation of the request itself propagates unchanged
+            if self.reason is None or not self._task.cancelled():
+                raise
+            raise AnalysisCancelled(self.analysis_id, self.reason)
+        finally:
+            if watcher is not None:
+                watcher.cancel()
+
+    async def _watch_disconnect(self, receive):
+        # The request body is already read, so the only message left is the disconnect
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                self.cancel("disconnect")
+                return
+
+
+class RunningAnalyses:
+    """Cancel scopes of the analyses running in this process, by analysis ID"""
+
+    def __init__(self):
+        self._scopes = {}
+
+    def __contains__(self, analysis_id):
+        return analysis_id in self._scopes
+
+    def __len__(self):
+        return len(self._scopes)
+
+    @contextmanager
+    def track(self, analysis_id, endpoint):
+        """Register an analysis for the duration of the block and yield its CancelScope"""
+        scope = self._scopes[analysis_id] = CancelScope(analysis_id, endpoint)
+        try:
+            yield scope
+        finally:
+            if self._scopes.get(analysis_id) is scope:
+                del self._scopes[analysis_id]
+
+    def cancel(self, analysis_id, reason="deleted"):
+        """Cancel a running analysis; returns False if none is running under that ID"""
+        scope = self._scopes.get(analysis_id)
+        return scope is not None and scope.cancel(reason)
+
+
+# Global instance for easy access
+running_analyses = RunningAnalyses()
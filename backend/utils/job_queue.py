@@ -0,0 +1,205 @@
+"""
+Job Queue Module
+Durable SQLite queue of analysis jobs shared by the API process, which
+enqueues uploads, and the worker processes that run them
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# The API and worker processes must share these; the default is outside the source
+# tree, so point them at durable storage where queued jobs must survive a reboot
+JOB_DIR = os.getenv("JOB_DIR", os.path.join(tempfile.gettempdir(), "tu_jobs"))
+JOB_QUEUE_PATH = os.getenv("JOB_QUEUE_PATH", os.path.join(JOB_DIR, "jobs.db"))
+# Uploaded PDFs wait here until a worker has analyzed them
+JOB_UPLOAD_DIR = os.getenv("JOB_UPLOAD_DIR", os.path.join(JOB_DIR, "uploads"))
+# A running job whose worker stops heartbeating for this long is queued again
+JOB_STALE_SECONDS = float(os.getenv("JOB_STALE_SECONDS", 300))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", 3))
+# Finished jobs and their results are kept this long
+JOB_RETENTION_SECONDS = float(os.getenv("JOB_RETENTION_SECONDS", 7 * 24 * 3600))
+
+JOB_MODES = ("page", "batch")
+JOB_STATUSES = ("queued", "running", "done", "failed")
+
+
+class JobQueue:
+    """Jobs table with atomic claiming, progress and worker heartbeats"""
+
+    def __init__(self, db_path=JOB_QUEUE_PATH, upload_dir=JOB_UPLOAD_DIR):
+        self.db_path = db_path
+        self.upload_dir = upload_dir
+        self._db = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        # Opened lazily so each worker process gets its own connection
+        if self._db is None:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False, isolation_level=None)
+            self._db.row_factory = sqlite3.Row
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, mode TEXT NOT NULL, filename TEXT, path TEXT NOT NULL, "
+                "sha256 TEXT NOT NULL, options TEXT NOT NULL, status TEXT NOT NULL, "
+                "completed INTEGER NOT NULL DEFAULT 0, total INTEGER, attempts INTEGER NOT NULL DEFAULT 0, "
+                "worker TEXT, result TEXT, error TEXT, "
+                "created REAL NOT NULL, started REAL, finished REAL, heartbeat REAL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created)")
+            self._db.execute("CREATE TABLE IF NOT EXISTS workers (id TEXT PRIMARY KEY, pid INTEGER, heartbeat REAL NOT NULL)")
+        return self._db
+
+    def upload_path(self, job_id):
+        os.makedirs(self.upload_dir, exist_ok=True)
+        return os.path.join(self.upload_dir, f"{job_id}.pdf")
+
+    def new_job_id(self):
+        return uuid.uuid4().hex
+
+    def enqueue(self, job_id, mode, filename, path, sha256, options=None):
+        """Queue an uploaded PDF already stored at path"""
+        with self._lock:
+            self._connect().execute(
+                "INSERT INTO jobs (id, mode, filename, path, sha256, options, status, created) "
+                "VALUES (?, ?, ?, ?, ?, ?, 'queued', ?)",
+                (job_id, mode, filename, path, sha256, json.dumps(options or {}), time.time()),
+            )
+        return job_id
+
+    def claim(self, worker_id):
+        """Atomically take the oldest queued job for a worker, or return None"""
+        now = time.time()
+        with self._lock:
+            db = self._connect()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                # Jobs of a worker that died mid-analysis go back in the queue
+                db.execute(
+                    "UPDATE jobs SET status = 'queued', worker = NULL "
+                    "WHERE status = 'running' AND heartbeat < ? AND attempts < ?",
+                    (now - JOB_STALE_SECONDS, JOB_MAX_ATTEMPTS),
+                )
+                db.execute(
+                    "UPDATE jobs SET status = 'failed', error = 'Worker stopped responding', finished = ? "
+                    "WHERE status = 'running' AND heartbeat < ?",
+                    (now, now - JOB_STALE_SECONDS),
+                )
+                row = db.execute(
+                    "SELECT * FROM jobs WHERE status = 'queued' ORDER BY created LIMIT 1"
+                ).fetchone()
+                if row is not None:
+                    db.execute(
+                        "UPDATE jobs SET status = 'running', worker = ?, attempts = attempts + 1, "
+                        "completed = 0, started = ?, heartbeat = ? WHERE id = ?",
+                        (worker_id, now, now, row["id"]),
+                    )
+                db.execute("COMMIT")
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+        return self._decode(row) if row is not None else None
+
+    def update_progress(self, job_id, completed, total):
+        """Record a running job's progress; a lower count than the stored one is ignored"""
+        with self._lock:
+            self._connect().execute(
+                "UPDATE jobs SET completed = MAX(completed, ?), total = ?, heartbeat = ? WHERE id = ? AND status = 'running'",
+                (completed, total, time.time(), job_id),
+            )
+
+    def complete(self, job_id, result):
+        self._finish(job_id, "done", result=json.dumps(result))
+
+    def fail(self, job_id, error):
+        self._finish(job_id, "failed", error=error)
+
+    def _finish(self, job_id, status, result=None, error=None):
+        with self._lock:
+            self._connect().execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished = ? WHERE id = ?",
+                (status, result, error, time.time(), job_id),
+            )
+
+    def release(self, worker_id):
+        """Put the jobs a stopping worker was running back in the queue, returning how many
+
+        The interrupted run does not count as one of the job's attempts.
+        """
+        with self._lock:
+            released = self._connect().execute(
+                "UPDATE jobs SET status = 'queued', worker = NULL, completed = 0, attempts = MAX(attempts - 1, 0) "
+                "WHERE worker = ? AND status = 'running'",
+                (worker_id,),
+            ).rowcount
+        if released:
+            logging.info(f"Returned {released} jobs of worker {worker_id} to the queue")
+        return released
+
+    def get(self, job_id):
+        """Return a job as a dict, or None if unknown"""
+        with self._lock:
+            row = self._connect().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._decode(row) if row is not None else None
+
+    def _decode(self, row):
+        job = dict(row)
+        job["options"] = json.loads(job["options"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def heartbeat_worker(self, worker_id):
+        """Mark a worker and the jobs it is running as alive"""
+        now = time.time()
+        with self._lock:
+            db = self._connect()
+            db.execute(
+                "INSERT OR REPLACE INTO workers (id, pid, heartbeat) VALUES (?, ?, ?)",
+                (worker_id, os.getpid(), now),
+            )
+            db.execute("UPDATE jobs SET heartbeat = ? WHERE worker = ? AND status = 'running'", (now, worker_id))
+
+    def remove_worker(self, worker_id):
+        with self._lock:
+            self._connect().execute("DELETE FROM workers WHERE id = ?", (worker_id,))
+
+    def purge(self, older_than=JOB_RETENTION_SECONDS):
+        """Delete finished jobs past the retention period and workers that stopped heartbeating"""
+        now = time.time()
+        with self._lock:
+            db = self._connect()
+            deleted = db.execute(
+                "DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished < ?",
+                (now - older_than,),
+            ).rowcount
+            db.execute("DELETE FROM workers WHERE heartbeat < ?", (now - JOB_STALE_SECONDS,))
+        if deleted:
+            logging.info(f"Purged {deleted} finished jobs")
+        return deleted
+
+    def stats(self):
+        """Job counts by status and the number of live workers"""
+        with self._lock:
+            db = self._connect()
+            counts = dict(db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+            workers = db.execute(
+                "SELECT COUNT(*) FROM workers WHERE heartbeat >= ?", (time.time() - JOB_STALE_SECONDS,)
+            ).fetchone()[0]
+        return {**{status: counts.get(status, 0) for status in JOB_STATUSES}, "workers": workers}
+
+
+# Global instance for easy access
+job_queue = JobQueue()
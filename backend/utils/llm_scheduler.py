@@ -0,0 +1,174 @@
+"""
+LLM Scheduler Module
+Process-wide bounded scheduler for Ollama generation calls with fair
+per-upload queuing and admission control
+"""
+
+import asyncio
+import itertools
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from dotenv import load_dotenv
+from utils.backend_pool import backend_pool
+from utils.metrics import cancelled_generations
+
+# Load environment variables
+load_dotenv()
+
+# Defaults to the combined max concurrency of the Ollama backends
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 0)) or backend_pool.capacity
+LLM_MAX_QUEUE_DEPTH = int(os.getenv("LLM_MAX_QUEUE_DEPTH", 500))
+# Initial guess for one generation, refined from observed durations
+LLM_ESTIMATED_CALL_SECONDS = float(os.getenv("LLM_ESTIMATED_CALL_SECONDS", 5))
+
+
+class SchedulerOverloaded(Exception):
+    """Raised when the generation queue is too deep to admit more work"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"LLM queue is full, retry after {retry_after} seconds")
+        self.retry_after = retry_after
+
+
+class LLMScheduler:
+    """Bounded concurrency scheduler that round-robins slots between uploads"""
+
+    def __init__(self, max_concurrency=LLM_MAX_CONCURRENCY, max_queue_depth=LLM_MAX_QUEUE_DEPTH,
+                 estimated_call_seconds=LLM_ESTIMATED_CALL_SECONDS):
+        self.max_concurrency = max_concurrency
+        self.max_queue_depth = max_queue_depth
+        self.average_call_seconds = estimated_call_seconds
+        self.active = 0
+        self.queued = 0
+        # Calls admitted sessions expect to make but have not queued yet
+        self.reserved = 0
+        self.completed = 0
+        self.rejected = 0
+        # tenant id -> deque of waiter futures, in round-robin order
+        self._queues = OrderedDict()
+        # tenant id -> calls still reserved for that upload
+        self._reservations = {}
+        self._tenant_ids = itertools.count(1)
+
+    def retry_after(self):
+        """Estimate seconds until the current queue drains"""
+        backlog = self.queued + self.reserved + self.active
+        return max(1, math.ceil(backlog / self.max_concurrency * self.average_call_seconds))
+
+    def admit(self, expected_calls):
+        """Check whether a new upload with this many calls may be queued
+
+        Calls already queued and those reserved by admitted uploads that have
+        not issued them yet both count, so a burst of uploads arriving before
+        their pages are extracted cannot all be admitted.
+        """
+        pending = self.queued + self.reserved
+        # An empty queue always admits, so one large report can never be locked out
+        if pending and pending + expected_calls > self.max_queue_depth:
+            self.rejected += 1
+            raise SchedulerOverloaded(self.retry_after())
+
+    @asynccontextmanager
+    async def session(self, expected_calls):
+        """Admit an upload and yield its tenant id for fair queuing"""
+        self.admit(expected_calls)
+        tenant = next(self._tenant_ids)
+        self._reservations[tenant] = expected_calls
+        self.reserved += expected_calls
+        try:
+            yield tenant
+        finally:
+            # Return whatever the upload reserved but never issued
+            self.reserved -= self._reservations.pop(tenant)
+            # Drop anything this upload left waiting in the queue
+            for waiter in self._queues.pop(tenant, ()):
+                self.queued -= 1
+                waiter.cancel()
+
+    async def run(self, tenant, func, *args, **kwargs):
+        """Await func(*args, **kwargs) once a slot is granted to this tenant"""
+        self._claim_reservation(tenant)
+        await self._acquire(tenant)
+        started = time.monotonic()
+        try:
+            return await func(*args, **kwargs)
+        except asyncio.CancelledError:
+            cancelled_generations.inc(state="running")
+            raise
+        finally:
+            self._record(time.monotonic() - started)
+            self.completed += 1
+            self._release()
+
+    async def _acquire(self, tenant):
+        if self.active < self.max_concurrency and not self.queued:
+            self.active += 1
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(tenant, deque()).append(waiter)
+        self.queued += 1
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Slot was granted just before cancellation - hand it on
+                self._release()
+            else:
+                self._discard(tenant, waiter)
+                cancelled_generations.inc(state="queued")
+            raise
+
+    def _claim_reservation(self, tenant):
+        # The call now counts as active or queued instead of reserved
+        if self._reservations.get(tenant):
+            self._reservations[tenant] -= 1
+            self.reserved -= 1
+
+    def _discard(self, tenant, waiter):
+        queue = self._queues.get(tenant)
+        if queue and waiter in queue:
+            queue.remove(waiter)
+            self.queued -= 1
+            if not queue:
+                del self._queues[tenant]
+
+    def _release(self):
+        self.active -= 1
+        # Grant the slot to the next tenant in rotation
+        while self._queues and self.active < self.max_concurrency:
+            tenant, queue = next(iter(self._queues.items()))
+            waiter = queue.popleft()
+            self.queued -= 1
+            if queue:
+                self._queues.move_to_end(tenant)
+            else:
+                del self._queues[tenant]
+            if not waiter.done():
+                self.active += 1
+                waiter.set_result(None)
+
+    def _record(self, seconds):
+        # Exponential moving average of generation time for Retry-After estimates
+        self.average_call_seconds = 0.8 * self.average_call_seconds + 0.2 * seconds
+
+    def stats(self):
+        """Return current scheduler state"""
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue_depth": self.max_queue_depth,
+            "active": self.active,
+            "queued": self.queued,
+            "reserved": self.reserved,
+            "waiting_uploads": len(self._queues),
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "average_call_seconds": round(self.average_call_seconds, 2),
+        }
+
+
+# Global instance for easy access
+llm_scheduler = LLMScheduler()
@@ -0,0 +1,224 @@
+"""
+Metrics Module
+Process-wide counters, gauges and latency histograms rendered in the
+Prometheus text exposition format, plus per-request stage timings
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Seconds, from a cached page to a slow generation
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+TOKEN_RATE_BUCKETS = (1, 2, 5, 10, 20, 35, 50, 75, 100, 150, 250, 500, 1000, 2500)
+
+# Starlette appends the charset
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+
+def format_labels(names, values, extra=""):
+    pairs = [f'{name}="{str(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def key(self, labels):
+        return tuple(labels.get(name, "") for name in self.labels)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(Metric):
+    """Monotonically increasing total"""
+    kind = "counter"
+
+    def __init__(self, name, help_text, labels=()):
+        super().__init__(name, help_text, labels)
+        # Unlabelled counters are reported from zero before their first increment
+        self.values = {} if self.labels else {(): 0}
+
+    def inc(self, amount=1, **labels):
+        key = self.key(labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self):
+        return self.header() + [
+            f"{self.name}{format_labels(self.labels, key)} {format_value(value)}"
+            for key, value in sorted(self.values.items())
+        ]
+
+
+class Gauge(Metric):
+    """Current value read from a callback at scrape time
+
+    The callback returns a number, or a dict of label tuples to numbers for
+    labelled gauges.
+    """
+    kind = "gauge"
+
+    def __init__(self, name, help_text, function, labels=()):
+        super().__init__(name, help_text, labels)
+        self.function = function
+
+    def render(self):
+        value = self.function()
+        values = value if isinstance(value, dict) else {(): value}
+        return self.header() + [
+            f"{self.name}{format_labels(self.labels, key)} {format_value(number)}"
+            for key, number in sorted(values.items())
+        ]
+
+
+class Histogram(Metric):
+    """Cumulative bucket counts with sum and count per label set"""
+    kind = "histogram"
+
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS, labels=()):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+        self.series = {}
+
+    def observe(self, value, **labels):
+        key = self.key(labels)
+        with self._lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0}
+            # Counts are per bucket here and made cumulative when rendered
+            series["counts"][bisect_left(self.buckets, value)] += 1
+            series["sum"] += value
+
+    def render(self):
+        lines = self.header()
+        for key, series in sorted(self.series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series["counts"]):
+                cumulative += count
+                bound_label = 'le="' + format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{format_labels(self.labels, key, bound_label)} {cumulative}")
+            lines.append(f"{self.name}_sum{format_labels(self.labels, key)} {format_value(series['sum'])}")
+            lines.append(f"{self.name}_count{format_labels(self.labels, key)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Named collection of metrics rendered together"""
+
+    def __init__(self):
+        self.metrics = {}
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help_text, labels=()):
+        return self.register(Counter(name, help_text, labels))
+
+    def gauge(self, name, help_text, function, labels=()):
+        return self.register(Gauge(name, help_text, function, labels))
+
+    def histogram(self, name, help_text, buckets=LATENCY_BUCKETS, labels=()):
+        return self.register(Histogram(name, help_text, buckets, labels))
+
+    def render(self):
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+class StageTimings:
+    """Per-request totals of time spent in each pipeline stage"""
+
+    def __init__(self):
+        self.stages = {}
+
+    def record(self, stage, seconds):
+        totals = self.stages.setdefault(stage, {"count": 0, "seconds": 0.0, "max": 0.0})
+        totals["count"] += 1
+        totals["seconds"] += seconds
+        totals["max"] = max(totals["max"], seconds)
+
+    def summary(self):
+        """Count, total and slowest duration of each stage, in milliseconds"""
+        return {
+            stage: {
+                "count": totals["count"],
+                "total_ms": round(totals["seconds"] * 1000, 1),
+                "max_ms": round(totals["max"] * 1000, 1),
+            }
+            for stage, totals in self.stages.items()
+        }
+
+
+# Global instance for easy access
+metrics = MetricsRegistry()
+
+stage_seconds = metrics.histogram(
+    "tu_stage_duration_seconds",
+    "Time spent in each analysis stage: upload, extraction, prompt_build, ollama_call, response_parse",
+    labels=("stage",),
+)
+request_seconds = metrics.histogram(
+    "tu_request_duration_seconds", "End-to-end analysis request latency", labels=("endpoint",)
+)
+ollama_requests = metrics.counter(
+    "tu_ollama_requests_total", "Generation requests sent to Ollama by outcome", labels=("outcome",)
+)
+ollama_retries = metrics.counter("tu_ollama_retries_total", "Generation attempts repeated after a retryable failure")
+ollama_hedges = metrics.counter(
+    "tu_ollama_hedges_total", "Generations running past the hedge threshold, by which copy won, or skipped when no backend had a free slot",
+    labels=("winner",),
+)
+cancelled_analyses = metrics.counter(
+    "tu_cancelled_analyses_total", "Analyses cancelled before finishing, by endpoint and reason (disconnect, deleted)",
+    labels=("endpoint", "reason"),
+)
+cancelled_generations = metrics.counter(
+    "tu_cancelled_generations_total", "Generation calls cancelled while queued for a slot or running on Ollama",
+    labels=("state",),
+)
+prompt_tokens = metrics.counter("tu_prompt_tokens_total", "Prompt tokens evaluated by Ollama")
+eval_tokens = metrics.counter("tu_eval_tokens_total", "Tokens generated by Ollama")
+prompt_token_rate = metrics.histogram(
+    "tu_prompt_eval_tokens_per_second", "Prompt evaluation throughput per generation", TOKEN_RATE_BUCKETS
+)
+eval_token_rate = metrics.histogram(
+    "tu_eval_tokens_per_second", "Generation throughput per request, from eval_count/eval_duration", TOKEN_RATE_BUCKETS
+)
+
+
+def observe_stage(stage, seconds, timings=None):
+    """Record a stage duration globally and, if given, in a request's StageTimings"""
+    stage_seconds.observe(seconds, stage=stage)
+    if timings is not None:
+        timings.record(stage, seconds)
+
+
+@contextmanager
+def timed(stage, timings=None):
+    """Time the enclosed block as one occurrence of a stage"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - started, timings)
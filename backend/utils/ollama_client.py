@@ -1,52 +1,381 @@
-import requests
+import asyncio
+import httpx
+import hashlib
 import json
+import math
 import os
+import random
+import time
+from collections import deque
 from dotenv import load_dotenv
+from utils.cache import PersistentLRUCache
+from utils.metrics import observe_stage, ollama_requests, ollama_retries, ollama_hedges, prompt_tokens, eval_tokens, prompt_token_rate, eval_token_rate
+from utils.backend_pool import backend_pool
 
 # Load environment variables
 load_dotenv()
 
+# Single-server default; set OLLAMA_BACKENDS to spread requests over several (see utils/backend_pool.py)
 OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434/api/generate")
 MODEL_NAME = os.getenv("OLLAMA_MODEL", "llama3.2:3b")  # Much faster than 8b model
+# Context window requested from Ollama; batch prompts are packed to fit it
+OLLAMA_NUM_CTX = int(os.getenv("OLLAMA_NUM_CTX", 4096))
+# How long Ollama keeps the model, and its evaluated prompt prefix, loaded between requests
+OLLAMA_MODEL_KEEP_ALIVE = os.getenv("OLLAMA_MODEL_KEEP_ALIVE", "30m")
 
-def ask_ollama(prompt: str, max_tokens: int = -1, temperature: float = 0.1, timeout_seconds: int = 60, stream: bool = False) -> str:
+# Connection pool settings - one pool is shared by every request in the process
+OLLAMA_MAX_CONNECTIONS = int(os.getenv("OLLAMA_MAX_CONNECTIONS", 32))
+OLLAMA_MAX_KEEPALIVE = int(os.getenv("OLLAMA_MAX_KEEPALIVE", 16))
+OLLAMA_KEEPALIVE_EXPIRY = float(os.getenv("OLLAMA_KEEPALIVE_EXPIRY", 60))
+OLLAMA_CONNECT_TIMEOUT = float(os.getenv("OLLAMA_CONNECT_TIMEOUT", 5))
+
+# Retries of timeouts, connection errors and 5xx responses, with full-jitter exponential backoff
+OLLAMA_MAX_RETRIES = int(os.getenv("OLLAMA_MAX_RETRIES", 2))
+OLLAMA_RETRY_BASE_SECONDS = float(os.getenv("OLLAMA_RETRY_BASE_SECONDS", 0.5))
+OLLAMA_RETRY_MAX_SECONDS = float(os.getenv("OLLAMA_RETRY_MAX_SECONDS", 8))
+
+# Adaptive timeouts: once enough calls are seen, each attempt may take a multiple of the
+# observed percentile instead of the caller's full timeout, which stays the overall budget
+OLLAMA_ADAPTIVE_TIMEOUT = os.getenv("OLLAMA_ADAPTIVE_TIMEOUT", "true").lower() == "true"
+OLLAMA_TIMEOUT_PERCENTILE = float(os.getenv("OLLAMA_TIMEOUT_PERCENTILE", 99))
+OLLAMA_TIMEOUT_MULTIPLIER = float(os.getenv("OLLAMA_TIMEOUT_MULTIPLIER", 3))
+OLLAMA_MIN_TIMEOUT = float(os.getenv("OLLAMA_MIN_TIMEOUT", 10))
+# A duplicate request is sent when a call outlives this percentile; 0 disables hedging
+OLLAMA_HEDGE_PERCENTILE = float(os.getenv("OLLAMA_HEDGE_PERCENTILE", 95))
+LATENCY_WINDOW = int(os.getenv("LATENCY_WINDOW", 200))
+LATENCY_MIN_SAMPLES = int(os.getenv("LATENCY_MIN_SAMPLES", 20))
+
+# Response cache - an empty LLM_CACHE_PATH keeps it in memory only
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", 2048))
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "")
+
+# Payload fields that do not change what the model generates
+UNCACHED_FIELDS = ("stream", "keep_alive")
+# Timing fields Ollama returns with the final response, durations in nanoseconds
+STAT_FIELDS = ("prompt_eval_count", "prompt_eval_duration", "eval_count", "eval_duration", "load_duration", "total_duration")
+
+_client = None
+response_cache = PersistentLRUCache("llm_responses", LLM_CACHE_SIZE, LLM_CACHE_PATH or None)
+
+
+class OllamaError(Exception):
+    """A generation request failed; retryable errors may succeed when repeated"""
+    retryable = True
+
+
+class OllamaTimeout(OllamaError):
+    """The model did not answer within the attempt's timeout"""
+
+
+class OllamaUnavailable(OllamaError):
+    """Ollama could not be reached or answered with a server error"""
+
+
+class OllamaRequestError(OllamaError):
+    """Ollama rejected the request; repeating it will not help"""
+    retryable = False
+
+
+def as_ollama_error(error: Exception, timeout_seconds: float) -> OllamaError:
+    """Translate an HTTP client failure into the matching OllamaError"""
+    if isinstance(error, OllamaError):
+        return error
+    if isinstance(error, httpx.TimeoutException):
+        return OllamaTimeout(f"Analysis timed out after {timeout_seconds:g} seconds. The model is taking longer than expected.")
+    if isinstance(error, httpx.TransportError):
+        return OllamaUnavailable("Connection error: Ollama service is not running or unreachable.")
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        error_class = OllamaUnavailable if status >= 500 else OllamaRequestError
+        return error_class(f"Error during analysis: Ollama returned HTTP {status}")
+    return OllamaError(f"Error during analysis: {str(error)}")
+
+
+class LatencyTracker:
+    """Sliding window of successful generation latencies for adaptive timeouts and hedging"""
+
+    def __init__(self, window=LATENCY_WINDOW, min_samples=LATENCY_MIN_SAMPLES):
+        self.samples = deque(maxlen=window)
+        self.min_samples = min_samples
+
+    def record(self, seconds):
+        self.samples.append(seconds)
+
+    def percentile(self, percent):
+        """Nearest-rank percentile in seconds, or None until enough calls are seen"""
+        if len(self.samples) < self.min_samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[max(0, math.ceil(percent / 100 * len(ordered)) - 1)]
+
+    def attempt_timeout(self, ceiling):
+        """Timeout for one attempt, never above the caller's ceiling"""
+        observed = self.percentile(OLLAMA_TIMEOUT_PERCENTILE) if OLLAMA_ADAPTIVE_TIMEOUT else None
+        if observed is None:
+            return ceiling
+        return min(ceiling, max(OLLAMA_MIN_TIMEOUT, observed * OLLAMA_TIMEOUT_MULTIPLIER))
+
+    def hedge_after(self):
+        """Seconds after which a duplicate request is worth sending, or None"""
+        if OLLAMA_HEDGE_PERCENTILE <= 0:
+            return None
+        return self.percentile(OLLAMA_HEDGE_PERCENTILE)
+
+    def stats(self):
+        def milliseconds(percent):
+            value = self.percentile(percent)
+            return round(value * 1000, 1) if value is not None else None
+        return {
+            "samples": len(self.samples),
+            "p50_ms": milliseconds(50),
+            "p95_ms": milliseconds(95),
+            "p99_ms": milliseconds(99),
+        }
+
+
+class GenerationStats:
+    """Accumulates Ollama's per-generation token counts and durations"""
+
+    def __init__(self):
+        self.calls = 0
+        self.call_seconds = 0.0
+        self.max_call_seconds = 0.0
+        self.totals = dict.fromkeys(STAT_FIELDS, 0)
+
+    def record(self, data, seconds=0.0):
+        """Add one generation's Ollama timings and its wall-clock time as seen by the client"""
+        self.calls += 1
+        self.call_seconds += seconds
+        self.max_call_seconds = max(self.max_call_seconds, seconds)
+        for field in STAT_FIELDS:
+            self.totals[field] += data.get(field) or 0
+
+    def summary(self):
+        """Totals and per-call averages, durations in milliseconds"""
+        calls = self.calls or 1
+        prompt_eval_ms = self.totals["prompt_eval_duration"] / 1e6
+        total_ms = self.totals["total_duration"] / 1e6
+        eval_seconds = self.totals["eval_duration"] / 1e9
+        return {
+            "calls": self.calls,
+            "prompt_eval_tokens": self.totals["prompt_eval_count"],
+            "avg_prompt_eval_tokens": round(self.totals["prompt_eval_count"] / calls, 1),
+            "prompt_eval_ms": round(prompt_eval_ms, 1),
+            "avg_prompt_eval_ms": round(prompt_eval_ms / calls, 1),
+            "eval_tokens": self.totals["eval_count"],
+            "avg_eval_ms": round(self.totals["eval_duration"] / 1e6 / calls, 1),
+            "load_ms": round(self.totals["load_duration"] / 1e6, 1),
+            "prompt_eval_share": round(prompt_eval_ms / total_ms, 3) if total_ms else 0.0,
+            "eval_tokens_per_second": round(self.totals["eval_count"] / eval_seconds, 1) if eval_seconds else 0.0,
+            "call_ms": round(self.call_seconds * 1000, 1),
+            "avg_call_ms": round(self.call_seconds * 1000 / calls, 1),
+            "max_call_ms": round(self.max_call_seconds * 1000, 1),
+        }
+
+
+# Process-wide totals since startup
+generation_stats = GenerationStats()
+
+
+def get_client() -> httpx.AsyncClient:
+    """Return the shared pooled HTTP client, creating it on first use"""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=OLLAMA_MAX_CONNECTIONS,
+                max_keepalive_connections=OLLAMA_MAX_KEEPALIVE,
+                keepalive_expiry=OLLAMA_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(None, connect=OLLAMA_CONNECT_TIMEOUT),
+        )
+    return _client
+
+
+async def close_client():
+    """Close the shared HTTP client and release pooled connections"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def build_payload(prompt: str, max_tokens: int = -1, temperature: float = 0.1, stream: bool = False, response_format=None, system: str = None) -> dict:
+    """Build the Ollama generate request body
+
+    response_format is passed as Ollama's "format": "json" or a JSON schema.
+    A system prompt that is identical across requests lets Ollama reuse its
+    evaluated prefix while keep_alive holds the model loaded.
+    """
     payload = {
         "model": MODEL_NAME,
         "prompt": prompt,
+        "keep_alive": OLLAMA_MODEL_KEEP_ALIVE,
         "options": {
             "num_predict": max_tokens,
             "temperature": temperature,
+            "num_ctx": OLLAMA_NUM_CTX,
         },
         "stream": stream
     }
+    if response_format is not None:
+        payload["format"] = response_format
+    if system is not None:
+        payload["system"] = system
+    return payload
+
+
+def cache_key(payload: dict) -> str:
+    """Content hash of everything that determines a generation's output"""
+    identity = {key: value for key, value in payload.items() if key not in UNCACHED_FIELDS}
+    encoded = json.dumps(identity, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+async def generate(payload: dict, timeout_seconds: int = 60, on_token=None, stats=None) -> str:
+    """Send a generate request to the least loaded backend and return the response text
+
+    Failures raise an OllamaError subclass.
+    For streaming payloads, on_token is called with each text fragment as it arrives.
+    Ollama's timings are recorded in generation_stats and, if given, stats.
+    """
+    timeout = httpx.Timeout(timeout_seconds, connect=OLLAMA_CONNECT_TIMEOUT)
+    client = get_client()
 
     try:
-        if stream:
-            # Streaming response (original method)
-            response = requests.post(OLLAMA_URL, json=payload, stream=True, timeout=timeout_seconds)
-            response.raise_for_status()
+        async with backend_pool.acquire() as backend:
+            started = time.perf_counter()
+            if payload.get("stream"):
+                # Streaming response (original method)
+                output = ""
+                async with client.stream("POST", backend.generate_url, json=payload, timeout=timeout) as response:
+                    response.raise_for_status()
+                    async for line in response.aiter_lines():
+                        if not line:
+                            continue
+                        data = json.loads(line)
+                        fragment = data.get("response", "")
+                        output += fragment
+                        if on_token is not None and fragment:
+                            on_token(fragment)
+                        if data.get("done"):
+                            record_stats(data, stats, time.perf_counter() - started)
+                return output
 
-            output = ""
-            for line in response.iter_lines():
-                if not line:
-                    continue
-                data = json.loads(line.decode("utf-8"))
-                output += data.get("response", "")
-            return output
-        else:
             # Non-streaming response (faster for short responses)
-            response = requests.post(OLLAMA_URL, json=payload, timeout=timeout_seconds)
+            response = await client.post(backend.generate_url, json=payload, timeout=timeout)
             response.raise_for_status()
             data = response.json()
+            record_stats(data, stats, time.perf_counter() - started)
             return data.get("response", "")
-            
-    except requests.exceptions.Timeout:
-        return f"Analysis timed out after {timeout_seconds} seconds. The model is taking longer than expected."
-    except requests.exceptions.ConnectionError:
-        return "Connection error: Ollama service is not running or unreachable."
     except Exception as e:
-        return f"Error during analysis: {str(e)}"
+        error = as_ollama_error(e, timeout_seconds)
+        ollama_requests.inc(outcome="timeout" if isinstance(error, OllamaTimeout) else "error")
+        raise error from e
+
+
+def record_stats(data: dict, stats=None, seconds=0.0):
+    """Record a finished generation in generation_stats, stats and the process metrics"""
+    generation_stats.record(data, seconds)
+    if stats is not None:
+        stats.record(data, seconds)
+    ollama_requests.inc(outcome="success")
+    observe_stage("ollama_call", seconds)
+    prompt_tokens.inc(data.get("prompt_eval_count") or 0)
+    eval_tokens.inc(data.get("eval_count") or 0)
+    if data.get("prompt_eval_count") and data.get("prompt_eval_duration"):
+        prompt_token_rate.observe(data["prompt_eval_count"] / (data["prompt_eval_duration"] / 1e9))
+    if data.get("eval_count") and data.get("eval_duration"):
+        eval_token_rate.observe(data["eval_count"] / (data["eval_duration"] / 1e9))
+
+
+async def generate_hedged(payload: dict, timeout_seconds: float, stats=None, hedge_after=None) -> str:
+    """generate(), sending a duplicate request if the first outlives hedge_after seconds
+
+    Whichever copy answers first wins and the other is cancelled. The
+    duplicate runs outside the scheduler's slots, so it is only sent when a
+    backend has a free slot; otherwise the primary is simply awaited.
+    """
+    primary = asyncio.create_task(generate(payload, timeout_seconds, stats=stats))
+    hedge = None
+    pending = {primary}
+    try:
+        done, pending = await asyncio.wait(pending, timeout=hedge_after)
+        if not done and not backend_pool.has_spare_capacity:
+            # Slow backends are usually busy ones, and a duplicate would only add to their load
+            ollama_hedges.inc(winner="skipped")
+        elif not done:
+            # The duplicate shares the original deadline
+            hedge = asyncio.create_task(generate(payload, timeout_seconds - hedge_after, stats=stats))
+            pending.add(hedge)
+        error = None
+        while True:
+            for task in done:
+                if task.exception() is None:
+                    if hedge is not None:
+                        ollama_hedges.inc(winner="hedge" if task is hedge else "primary")
+                    return task.result()
+                error = task.exception()
+            if not pending:
+                raise error
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def generate_with_retries(payload: dict, timeout_seconds: float, on_token=None, stats=None, latency=None) -> str:
+    """generate() with bounded, jittered retries inside an overall timeout_seconds budget
+
+    With a LatencyTracker, attempts time out adaptively and slow non-streaming
+    attempts are hedged. Raises the last OllamaError once retries or budget run out.
+    """
+    deadline = time.monotonic() + timeout_seconds
+    attempt = 0
+    while True:
+        remaining = deadline - time.monotonic()
+        attempt_timeout = latency.attempt_timeout(remaining) if latency is not None else remaining
+        hedge_after = latency.hedge_after() if latency is not None and on_token is None else None
+        started = time.perf_counter()
+        try:
+            if hedge_after is not None and hedge_after < attempt_timeout:
+                response = await generate_hedged(payload, attempt_timeout, stats, hedge_after)
+            else:
+                response = await generate(payload, attempt_timeout, on_token, stats)
+        except OllamaError as e:
+            backoff = random.uniform(0, min(OLLAMA_RETRY_MAX_SECONDS, OLLAMA_RETRY_BASE_SECONDS * 2 ** attempt))
+            # Out of retries, or no time left for another attempt after backing off
+            if not e.retryable or attempt >= OLLAMA_MAX_RETRIES or deadline - time.monotonic() - backoff < 1:
+                raise
+            attempt += 1
+            ollama_retries.inc()
+            await asyncio.sleep(backoff)
+            continue
+        if latency is not None:
+            latency.record(time.perf_counter() - started)
+        return response
+
+
+async def ask_ollama(prompt: str, max_tokens: int = -1, temperature: float = 0.1, timeout_seconds: int = 60, stream: bool = False, system: str = None) -> str:
+    """Single generation without the cache or retries, raising OllamaError on failure"""
+    payload = build_payload(prompt, max_tokens, temperature, stream, system=system)
+    return await generate(payload, timeout_seconds)
+
+async def ask_ollama_fast(prompt: str, max_tokens: int = -1, temperature: float = 0.1, timeout_seconds: int = 30, on_token=None, response_format=None, system: str = None, stats=None, latency=None) -> str:
+    """Optimized version for faster responses - uses non-streaming, the response cache and retries
+
+    Passing on_token switches to a streaming request so callers can report progress.
+    timeout_seconds bounds all attempts together; latency is an optional
+    LatencyTracker for adaptive timeouts and hedging. Raises OllamaError on failure.
+    """
+    payload = build_payload(prompt, max_tokens, temperature, stream=on_token is not None, response_format=response_format, system=system)
+    key = cache_key(payload)
+    cached = response_cache.get(key)
+    if cached is not None:
+        ollama_requests.inc(outcome="cached")
+        return cached
 
-def ask_ollama_fast(prompt: str, max_tokens: int = -1, temperature: float = 0.1, timeout_seconds: int = 30) -> str:
-    """Optimized version for faster responses - uses non-streaming and shorter timeout"""
-    return ask_ollama(prompt, max_tokens, temperature, timeout_seconds, stream=False)
+    # Failures raise before reaching the cache, so they are never cached
+    response = await generate_with_retries(payload, timeout_seconds, on_token, stats, latency)
+    response_cache.set(key, response)
+    return response
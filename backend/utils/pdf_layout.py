@@ -0,0 +1,378 @@
+"""
+PDF Layout Module
+Text geometry for the local font, margin and line-spacing checks. While
+PyPDF2 extracts a page's text, its operator visitors record the font, size
+and position of every text run; the runs are grouped into lines and the page
+is summarized as its text area, fonts and line pitch. Kept free of app
+configuration so extraction worker processes can import it.
+"""
+
+import re
+import statistics
+from collections import Counter
+
+SHOW_OPERATORS = (b"Tj", b"TJ", b"'", b'"')
+# Operators after which shown text starts at the (new) line position
+POSITION_OPERATORS = (b"BT", b"Td", b"TD", b"Tm", b"T*")
+SUBSET_PREFIX = re.compile(r"^[A-Z]{6}\+")
+PAGE_NUMBER_LINE = re.compile(r"^(?:page\s+)?(\d{1,4}|[ivxlcdm]{1,7})$", re.IGNORECASE)
+# Weight words in font names, and TeX's bold extended faces such as CMBX12
+BOLD_NAME = re.compile(r"bold|black|heavy|demi|^[a-z]{2}bx", re.IGNORECASE)
+# Glyph extent above and below the baseline as fractions of the font size, for the top and bottom text edges
+ASCENT = 0.9
+DESCENT = 0.22
+# Runs this close to a line's baseline, in font sizes, belong to it (superscripts included)
+SAME_LINE = 0.5
+# Baseline gaps wider than this many font sizes separate blocks of text rather than lines
+BLOCK_GAP = 2.5
+# Lines with at most this many words keep their text and extent for the heading checks
+SHORT_LINE_WORDS = 12
+# Text render modes that paint nothing, such as the OCR text layer of a scanned page
+INVISIBLE_RENDER_MODES = (3, 7)
+
+
+def resolve(value):
+    return value.get_object() if hasattr(value, "get_object") else value
+
+
+def multiply(m, n):
+    """Product of two PDF transformation matrices given as six numbers"""
+    return [
+        m[0] * n[0] + m[1] * n[2],
+        m[0] * n[1] + m[1] * n[3],
+        m[2] * n[0] + m[3] * n[2],
+        m[2] * n[1] + m[3] * n[3],
+        m[4] * n[0] + m[5] * n[2] + n[4],
+        m[4] * n[1] + m[5] * n[3] + n[5],
+    ]
+
+
+def string_bytes(value):
+    """The character codes of a string operand as PyPDF2 parsed it"""
+    if isinstance(value, bytes):
+        return value
+    original = getattr(value, "original_bytes", None)
+    if original is not None:
+        return original
+    return str(value).encode("latin-1", "replace")
+
+
+class FontMetrics:
+    """Name, weight and glyph widths of one font resource
+
+    Widths come from the font's /Widths array, or /W for two-byte Identity
+    fonts. Fonts without them, such as unembedded standard fonts, have
+    widths of None, so their runs have no measured extent.
+    """
+
+    def __init__(self, font=None):
+        font = resolve(font) or {}
+        self.name = SUBSET_PREFIX.sub("", str(font.get("/BaseFont", "")).lstrip("/")) or "unknown"
+        self.bold = bool(BOLD_NAME.search(self.name))
+        self.two_byte = font.get("/Subtype") == "/Type0"
+        self.widths = None
+        self.width_ranges = []
+        self.default_width = 0.0
+        try:
+            if self.two_byte:
+                self._read_cid_widths(font)
+            elif "/Widths" in font:
+                first = int(font.get("/FirstChar", 0))
+                self.widths = {first + index: float(resolve(width)) for index, width in enumerate(resolve(font["/Widths"]))}
+                descriptor = resolve(font.get("/FontDescriptor")) or {}
+                self.default_width = float(descriptor.get("/MissingWidth", 0))
+        except (KeyError, IndexError, TypeError, ValueError, AttributeError):
+            self.widths = None
+
+    def _read_cid_widths(self, font):
+        # Only Identity encodings map the shown two-byte codes straight to CIDs
+        if font.get("/Encoding") != "/Identity-H":
+            return
+        descendant = resolve(resolve(font["/DescendantFonts"])[0])
+        self.default_width = float(descendant.get("/DW", 1000))
+        widths = {}
+        entries = [resolve(entry) for entry in resolve(descendant.get("/W", []))]
+        index = 0
+        while index + 1 < len(entries):
+            first = int(entries[index])
+            if isinstance(entries[index + 1], list):
+                # c [w1 w2 ...] gives consecutive widths from code c
+                for offset, width in enumerate(entries[index + 1]):
+                    widths[first + offset] = float(resolve(width))
+                index += 2
+            else:
+                # c_first c_last w gives one width to a range of codes
+                self.width_ranges.append((first, int(entries[index + 1]), float(entries[index + 2])))
+                index += 3
+        self.widths = widths
+
+    def codes(self, data):
+        if self.two_byte:
+            return [data[index] << 8 | data[index + 1] for index in range(0, len(data) - 1, 2)]
+        return list(data)
+
+    def width(self, code):
+        width = self.widths.get(code)
+        if width is not None:
+            return width
+        for first, last, range_width in self.width_ranges:
+            if first <= code <= last:
+                return range_width
+        return self.default_width
+
+    def advance(self, codes, size, char_spacing, word_spacing):
+        """Width of shown codes in unscaled text space units, or None when the widths are unknown"""
+        if self.widths is None:
+            return None
+        total = 0.0
+        for code in codes:
+            total += self.width(code) / 1000 * size + char_spacing
+            if code == 32 and not self.two_byte:
+                total += word_spacing
+        return total
+
+
+class LayoutCollector:
+    """Records the position and extent of each text run while PyPDF2 extracts a page
+
+    PyPDF2 3.0 reports a run's text only once it has moved on to the next
+    line, so positions are taken from the text-showing operators themselves
+    and the text is attached to the run when PyPDF2 flushes it. Text inside
+    form XObjects is left out, as PyPDF2 extracts it without the form's matrix,
+    and so is invisible text, which is not part of the page as printed.
+    """
+
+    def __init__(self, page):
+        resources = page
+        while "/Resources" not in resources and "/Parent" in resources:
+            resources = resolve(resources["/Parent"])
+        self.font_resources = resolve(resolve(resources.get("/Resources", {})).get("/Font", {})) or {}
+        self.fonts = {}
+        self.font = FontMetrics()
+        self.size = 12.0
+        self.char_spacing = 0.0
+        self.word_spacing = 0.0
+        self.leading = 0.0
+        self.horizontal_scale = 1.0
+        self.render_mode = 0
+        self.stack = []
+        # Advance since the last positioning operator in text space, None once unknown
+        self.offset = 0.0
+        self.form_depth = 0
+        self.run = None
+        self.runs = []
+
+    def font_metrics(self, name):
+        if name not in self.fonts:
+            self.fonts[name] = FontMetrics(self.font_resources.get(name))
+        return self.fonts[name]
+
+    def before_operator(self, operator, operands, cm, tm):
+        if operator == b"Do":
+            self.form_depth += 1
+        if self.form_depth:
+            return
+        if operator == b"q":
+            self.stack.append((self.font, self.size, self.char_spacing, self.word_spacing, self.leading, self.horizontal_scale, self.render_mode))
+        elif operator == b"Q":
+            if self.stack:
+                self.font, self.size, self.char_spacing, self.word_spacing, self.leading, self.horizontal_scale, self.render_mode = self.stack.pop()
+        elif operator == b"Tf":
+            self.font = self.font_metrics(operands[0])
+            self.size = float(operands[1])
+        elif operator == b"Tc":
+            self.char_spacing = float(operands[0])
+        elif operator == b"Tw":
+            self.word_spacing = float(operands[0])
+        elif operator == b"TL":
+            self.leading = float(operands[0])
+        elif operator == b"Tz":
+            self.horizontal_scale = float(operands[0]) / 100
+        elif operator == b"Tr":
+            self.render_mode = int(operands[0])
+        elif operator in POSITION_OPERATORS:
+            if operator == b"TD":
+                self.leading = -float(operands[1])
+            self.offset = 0.0
+        elif operator in SHOW_OPERATORS:
+            self.show(operator, operands, cm, tm)
+
+    def after_operator(self, operator, operands, cm, tm):
+        if operator == b"Do":
+            self.form_depth -= 1
+
+    def show(self, operator, operands, cm, tm):
+        tm = list(tm)
+        if operator in (b"'", b'"'):
+            # These move to the next line before showing their string
+            tm[4] -= self.leading * tm[2]
+            tm[5] -= self.leading * tm[3]
+            self.offset = 0.0
+            if operator == b'"':
+                self.word_spacing, self.char_spacing = float(operands[0]), float(operands[1])
+            items = operands[-1:]
+        elif operator == b"TJ":
+            items = operands[0]
+        else:
+            items = operands[:1]
+
+        m = multiply(tm, cm)
+        if abs(m[1]) > 1e-6 or abs(m[2]) > 1e-6 or m[0] <= 0 or m[3] <= 0 or self.render_mode in INVISIBLE_RENDER_MODES:
+            # Rotated, mirrored and invisible text is not part of the page's lines
+            if self.run is not None:
+                self.close_run("")
+            self.offset = None
+            return
+        size = self.size * m[3]
+        start = self.offset
+        advance = 0.0
+        chars = 0
+        for item in items:
+            if isinstance(item, (bytes, str)):
+                codes = self.font.codes(string_bytes(item))
+                chars += len(codes)
+                width = self.font.advance(codes, self.size, self.char_spacing, self.word_spacing)
+                advance = None if width is None or advance is None else advance + width * self.horizontal_scale
+            elif advance is not None:
+                # TJ adjustments are thousandths of the font size, positive values moving left
+                advance -= float(item) / 1000 * self.size * self.horizontal_scale
+        self.offset = None if start is None or advance is None else start + advance
+
+        y = m[5]
+        x0 = m[4] + start * m[0] if start is not None else None
+        x1 = x0 + advance * m[0] if x0 is not None and advance is not None else None
+        run = self.run
+        if run is not None and (abs(y - run["y"]) > SAME_LINE * size or run["font"] is not self.font):
+            # Moved to another line or font without PyPDF2 flushing the text
+            self.close_run("")
+            run = None
+        if run is None:
+            self.run = {"x0": x0, "x1": x1, "y": y, "size": size, "font": self.font, "chars": chars, "measured": x1 is not None}
+            return
+        run["chars"] += chars
+        if x0 is not None:
+            run["x0"] = x0 if run["x0"] is None else min(run["x0"], x0)
+        if x1 is None:
+            run["measured"] = False
+        elif run["measured"]:
+            run["x1"] = max(run["x1"], x1)
+
+    def on_text(self, text, cm, tm, font, size):
+        if self.form_depth or self.run is None:
+            return
+        self.close_run(text)
+
+    def close_run(self, text):
+        run, self.run = self.run, None
+        if run["chars"] and run["x0"] is not None:
+            run["text"] = " ".join(text.split())
+            if not run["measured"]:
+                run["x1"] = None
+            self.runs.append(run)
+
+    def summary(self, page):
+        """The page's text area, fonts and line pitch, rounded to a tenth of a point"""
+        if self.run is not None:
+            self.close_run("")
+        box = [round(float(value), 1) for value in page.cropbox]
+        fonts = Counter()
+        for run in self.runs:
+            fonts[(run["font"].name, round(run["size"], 1))] += run["chars"]
+        lines = group_lines(self.runs)
+        body = body_lines(lines)
+        layout = {
+            "box": box,
+            "text_box": text_box(body),
+            "fonts": [[name, size, chars] for (name, size), chars in fonts.most_common()],
+            "body_font": None,
+            "body_size": None,
+            "body_lines": len(body),
+            "line_pitch": None,
+            "lines": [
+                [line["text"], round(line["x0"], 1), None if line["x1"] is None else round(line["x1"], 1), round(line["size"], 1), line["font"].name, line["font"].bold]
+                for line in body
+                if line["text"] and len(line["text"].split()) <= SHORT_LINE_WORDS
+            ],
+        }
+        if fonts:
+            (layout["body_font"], layout["body_size"]), _ = fonts.most_common(1)[0]
+            layout["line_pitch"] = line_pitch(body, layout["body_size"])
+        return layout
+
+
+def group_lines(runs):
+    """Merge runs sharing a baseline into lines, top to bottom"""
+    lines = []
+    for run in sorted(runs, key=lambda run: (-run["y"], run["x0"])):
+        line = lines[-1] if lines else None
+        if line is None or abs(line["y"] - run["y"]) > SAME_LINE * max(line["size"], run["size"]):
+            lines.append({**run, "runs": [run]})
+            continue
+        line["runs"].append(run)
+        line["chars"] += run["chars"]
+        line["x0"] = min(line["x0"], run["x0"])
+        line["x1"] = None if line["x1"] is None or run["x1"] is None else max(line["x1"], run["x1"])
+    for line in lines:
+        # The run with the most characters gives the line its baseline, font and size
+        main = max(line["runs"], key=lambda run: run["chars"])
+        line.update(y=main["y"], size=main["size"], font=main["font"])
+        line["text"] = " ".join(run["text"] for run in sorted(line["runs"], key=lambda run: run["x0"]) if run["text"])
+    return lines
+
+
+def body_lines(lines):
+    """Lines of the page's text block, without page numbers or headers and footers set apart from it"""
+    body = [line for line in lines if not PAGE_NUMBER_LINE.match(line["text"])]
+    for index in (0, -1):
+        if len(body) < 2:
+            break
+        edge, neighbour = body[index], body[1 if index == 0 else -2]
+        if abs(edge["y"] - neighbour["y"]) > BLOCK_GAP * edge["size"] and len(edge["text"].split()) <= SHORT_LINE_WORDS:
+            body.pop(index)
+    return body
+
+
+def text_box(lines):
+    """[left, bottom, right, top] of the lines' glyphs; right is None when no line was measured"""
+    if not lines:
+        return None
+    rights = [line["x1"] for line in lines if line["x1"] is not None]
+    return [
+        round(min(line["x0"] for line in lines), 1),
+        round(min(line["y"] - DESCENT * line["size"] for line in lines), 1),
+        round(max(rights), 1) if rights else None,
+        round(max(line["y"] + ASCENT * line["size"] for line in lines), 1),
+    ]
+
+
+def line_pitch(lines, body_size):
+    """Median baseline distance between consecutive lines of body text, or None with too few lines"""
+    gaps = []
+    for upper, lower in zip(lines, lines[1:]):
+        if abs(upper["size"] - body_size) > 0.5 or abs(lower["size"] - body_size) > 0.5:
+            continue
+        gap = upper["y"] - lower["y"]
+        # Gaps between paragraphs and blocks would overstate the spacing
+        if 0.8 * body_size < gap < BLOCK_GAP * body_size:
+            gaps.append(gap)
+    if len(gaps) < 3:
+        return None
+    return round(statistics.median(gaps), 1)
+
+
+def extract_layout(page):
+    """Extract a page's text together with its layout summary, returning (text, layout)
+
+    The text is exactly what page.extract_text() returns. If the layout
+    cannot be read, the text is extracted again on its own and layout is None.
+    """
+    try:
+        collector = LayoutCollector(page)
+        text = page.extract_text(
+            visitor_operand_before=collector.before_operator,
+            visitor_operand_after=collector.after_operator,
+            visitor_text=collector.on_text,
+        )
+        return text, collector.summary(page)
+    except Exception:
+        return page.extract_text(), None
@@ -1,16 +1,260 @@
-import PyPDF2
+import asyncio
+import itertools
+import multiprocessing
 import os
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dotenv import load_dotenv
+from utils.cache import PersistentLRUCache
+from utils.metrics import observe_stage
+from utils.pdf_worker import open_reader, extract_page, extract_page_range
+from utils.upload import TEMP_DIR
 
-def extract_text_with_pages(file_path):
+# Load environment variables
+load_dotenv()
+
+# Extraction cache - an empty PDF_CACHE_PATH keeps it in memory only
+PDF_CACHE_SIZE = int(os.getenv("PDF_CACHE_SIZE", 64))
+PDF_CACHE_PATH = os.getenv("PDF_CACHE_PATH", "")
+# Record each page's fonts, text area and line pitch for the rule engine's layout checks
+PDF_LAYOUT = os.getenv("PDF_LAYOUT", "true").lower() == "true"
+# Bump when the extraction output changes so stale cached documents are dropped
+EXTRACTOR_VERSION = "1-layout" if PDF_LAYOUT else "1"
+
+# Parallel extraction - documents smaller than this are extracted serially
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", 24))
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", os.cpu_count() or 1))
+# Page ranges extracted ahead of the consumer, so a slow consumer holds back extraction
+PDF_EXTRACT_AHEAD = PDF_EXTRACT_WORKERS * 2
+# When pages are not retained, PyPDF2's cache of parsed objects is emptied this often
+PDF_RELEASE_EVERY_PAGES = int(os.getenv("PDF_RELEASE_EVERY_PAGES", 32))
+
+extraction_cache = PersistentLRUCache("pdf_extractions", PDF_CACHE_SIZE, PDF_CACHE_PATH or None)
+extraction_cache.set_version(EXTRACTOR_VERSION)
+
+_process_pool = None
+
+
+def get_process_pool():
+    """Return the shared extraction process pool, creating it on first use"""
+    global _process_pool
+    if _process_pool is None:
+        # spawn avoids forking the event loop and its threads into workers
+        _process_pool = ProcessPoolExecutor(
+            max_workers=PDF_EXTRACT_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _process_pool
+
+
+def shutdown_process_pool():
+    """Stop the extraction worker processes"""
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
+
+
+def fixed_page_ranges(page_count, size):
+    """Split range(page_count) into contiguous (start, stop) ranges of at most `size` pages"""
+    return [(start, min(start + size, page_count)) for start in range(0, page_count, max(1, size))]
+
+
+def split_page_ranges(page_count, parts):
+    """Split range(page_count) into at most `parts` contiguous (start, stop) ranges"""
+    parts = max(1, min(parts, page_count))
+    size, remainder = divmod(page_count, parts)
+    ranges = []
+    start = 0
+    for index in range(parts):
+        stop = start + size + (1 if index < remainder else 0)
+        ranges.append((start, stop))
+        start = stop
+    return ranges
+
+
+def document_metadata(reader):
+    """Document-level metadata recorded alongside the extracted pages"""
+    info = reader.metadata or {}
+    return {
+        "page_count": len(reader.pages),
+        "title": str(info.get("/Title", "") or ""),
+        "author": str(info.get("/Author", "") or ""),
+        "producer": str(info.get("/Producer", "") or ""),
+    }
+
+
+def extract_text_with_pages(source):
+    return read_document(source)["pages"]
+
+
+def read_document(source):
+    """Extract per-page text and document metadata serially in a single pass
+
+    source may be a file path or the raw PDF bytes.
+    """
     try:
-        if not os.path.exists(file_path):
-            raise FileNotFoundError(f"PDF file not found: {file_path}")
+        if isinstance(source, str) and not os.path.exists(source):
+            raise FileNotFoundError(f"PDF file not found: {source}")
         
-        reader = PyPDF2.PdfReader(file_path)
-        pages = []
-        for i, page in enumerate(reader.pages):
-            text = page.extract_text()
-            pages.append({"page": i+1, "text": text})
-        return pages
+        reader = open_reader(source)
+        return {"pages": extract_pages(reader), "metadata": document_metadata(reader)}
     except Exception as e:
         raise Exception(f"Error reading PDF: {str(e)}")
+
+
+def spill_to_file(data):
+    """Write in-memory PDF bytes to a private temporary file and return its path"""
+    os.makedirs(TEMP_DIR, exist_ok=True)
+    fd, path = tempfile.mkstemp(prefix="extract_", suffix=".pdf", dir=TEMP_DIR)
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    return path
+
+
+def extract_pages(reader):
+    """Extract the text, and layout when enabled, of every page of an open reader"""
+    return [extract_page(page, i + 1, PDF_LAYOUT) for i, page in enumerate(reader.pages)]
+
+
+class PageStream:
+    """Async stream of extracted pages, in order, as soon as each is ready
+
+    Pages come from the extraction cache when the same bytes were seen before,
+    otherwise from a worker thread (small PDFs) or the process pool (large
+    PDFs). The finished document is stored in the cache once fully consumed.
+    With retain=False pages are not kept or cached after they are handed over,
+    and at most PDF_EXTRACT_AHEAD ranges of PDF_RELEASE_EVERY_PAGES pages are
+    extracted ahead of the consumer, so memory stays flat however long the
+    document is.
+    """
+
+    def __init__(self, source, content_hash, retain=True):
+        self.source = source
+        self.content_hash = content_hash
+        self.retain = retain
+        self.cache_hit = False
+        self.metadata = None
+        self.pages = []
+        # Time spent waiting on PyPDF2, excluding the consumer's work between pages
+        self.extraction_seconds = 0.0
+        self._reader = None
+        self._file = None
+        self._cached = None
+
+    @property
+    def page_count(self):
+        return self.metadata["page_count"]
+
+    async def open(self):
+        """Read the page count and metadata without extracting any text"""
+        self._cached = extraction_cache.get(self.content_hash)
+        if self._cached is not None:
+            self.cache_hit = True
+            self.metadata = self._cached["metadata"]
+            return self
+
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        try:
+            if isinstance(self.source, str) and not os.path.exists(self.source):
+                raise FileNotFoundError(f"PDF file not found: {self.source}")
+            source = self.source
+            if not self.retain and isinstance(source, str):
+                # PyPDF2 reads a whole file into memory when given its path, but seeks in an open file
+                source = self._file = open(source, "rb")
+            self._reader = await loop.run_in_executor(None, open_reader, source)
+            self.metadata = document_metadata(self._reader)
+        except Exception as e:
+            raise Exception(f"Error reading PDF: {str(e)}")
+        self.extraction_seconds += time.perf_counter() - started
+        return self
+
+    async def __aiter__(self):
+        if self.metadata is None:
+            await self.open()
+
+        if self._cached is not None:
+            for page_data in self._cached["pages"]:
+                if self.retain:
+                    self.pages.append(page_data)
+                yield page_data
+            return
+
+        try:
+            if self.page_count < PDF_PARALLEL_MIN_PAGES or PDF_EXTRACT_WORKERS < 2:
+                chunks = self._extract_serial()
+            else:
+                chunks = self._extract_parallel()
+            started = time.perf_counter()
+            async for chunk in chunks:
+                self.extraction_seconds += time.perf_counter() - started
+                for page_data in chunk:
+                    if self.retain:
+                        self.pages.append(page_data)
+                    yield page_data
+                started = time.perf_counter()
+        except Exception as e:
+            raise Exception(f"Error reading PDF: {str(e)}")
+        finally:
+            if self._file is not None:
+                self._file.close()
+
+        observe_stage("extraction", self.extraction_seconds)
+        if self.retain:
+            extraction_cache.set(self.content_hash, {"pages": self.pages, "metadata": self.metadata})
+
+    async def _extract_serial(self):
+        loop = asyncio.get_running_loop()
+        for index in range(self.page_count):
+            page_data = await loop.run_in_executor(None, extract_page, self._reader.pages[index], index + 1, PDF_LAYOUT)
+            if not self.retain and (index + 1) % PDF_RELEASE_EVERY_PAGES == 0:
+                # The reader keeps every object it has parsed; they are re-read if needed again
+                self._reader.resolved_objects.clear()
+            yield [page_data]
+
+    async def _extract_parallel(self):
+        # Each worker opens the PDF itself and extracts a contiguous page range;
+        # ranges are small enough that the first ones finish early
+        loop = asyncio.get_running_loop()
+        pool = get_process_pool()
+        if self.retain:
+            ranges = split_page_ranges(self.page_count, PDF_EXTRACT_WORKERS * 4)
+        else:
+            # Fixed-size ranges bound the pages waiting to be consumed, whatever the page count
+            ranges = fixed_page_ranges(self.page_count, PDF_RELEASE_EVERY_PAGES)
+        ranges = iter(ranges)
+        path = self.source
+        if not isinstance(path, str):
+            # Workers get a path rather than a pickled copy of the PDF for every range
+            path = await loop.run_in_executor(None, spill_to_file, self.source)
+        futures = deque()
+        try:
+            while True:
+                # Only a few ranges run ahead; finished ranges wait here until consumed
+                for start, stop in itertools.islice(ranges, PDF_EXTRACT_AHEAD - len(futures)):
+                    futures.append(loop.run_in_executor(pool, extract_page_range, path, start, stop, PDF_LAYOUT))
+                if not futures:
+                    break
+                yield await futures.popleft()
+        finally:
+            for future in futures:
+                future.cancel()
+            if path is not self.source:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+
+async def extract_text_cached(source, content_hash):
+    """Extract pages and metadata, reusing a previous extraction of identical bytes
+
+    Returns (document, cache_hit) where document has "pages" and "metadata" keys.
+    """
+    stream = await PageStream(source, content_hash).open()
+    async for _ in stream:
+        pass
+    return {"pages": stream.pages, "metadata": stream.metadata}, stream.cache_hit
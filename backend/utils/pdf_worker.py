@@ -0,0 +1,32 @@
+"""
+PDF Worker Module
+Page-range text extraction that runs inside extraction worker processes.
+Kept free of app configuration so spawned workers import only PyPDF2.
+"""
+
+import io
+import PyPDF2
+from utils.pdf_layout import extract_layout
+
+
+def open_reader(source):
+    """Open a PdfReader from a file path or raw PDF bytes"""
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    return PyPDF2.PdfReader(source)
+
+
+def extract_page(page, number, layout=False):
+    """Extract one page's text, with its "layout" summary when layout is set"""
+    if not layout:
+        return {"page": number, "text": page.extract_text()}
+    text, page_layout = extract_layout(page)
+    return {"page": number, "text": text, "layout": page_layout}
+
+
+def extract_page_range(path, start, stop, layout=False):
+    """Extract pages [start, stop) of the PDF at path, with 1-based page numbers"""
+    # Given an open file PyPDF2 seeks to the objects it needs instead of reading the whole PDF
+    with open(path, "rb") as f:
+        reader = open_reader(f)
+        return [extract_page(reader.pages[index], index + 1, layout) for index in range(start, stop)]
@@ -0,0 +1,111 @@
+"""
+Result Payload Module
+Compact analysis responses that list each violation text once, paginated
+access to stored results, and fast JSON encoding with orjson when installed
+"""
+
+import json
+import os
+from dotenv import load_dotenv
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:
+    # Optional speedup; the standard library encoder produces the same JSON
+    orjson = None
+
+# Load environment variables
+load_dotenv()
+
+COMPACT_SCHEMA_VERSION = 1
+# Violations per page of GET /analyses/{id}/results unless ?limit= asks otherwise
+RESULTS_PAGE_LIMIT = int(os.getenv("RESULTS_PAGE_LIMIT", 100))
+RESULTS_MAX_LIMIT = int(os.getenv("RESULTS_MAX_LIMIT", 1000))
+
+# Per-page fields worth keeping once the violation texts are interned
+PAGE_FLAGS = ("skipped", "reused_from", "error", "error_type")
+
+
+def dumps(data):
+    """Encode data as compact UTF-8 JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse encoded with orjson when it is installed"""
+
+    def render(self, content):
+        return dumps(content)
+
+
+def compact_summary(summary):
+    """Rewrite an analysis summary so every violation text appears only once
+
+    "messages" lists the distinct texts. "pages" has one entry per page with
+    its violations as indexes into messages, and "categorized_results" maps
+    each category to [page, message index] pairs. Other fields are kept.
+    """
+    messages = []
+    positions = {}
+    page_violations = {}
+    categorized = {}
+    for category, entries in summary.get("categorized_results", {}).items():
+        pairs = categorized[category] = []
+        for entry in entries:
+            position = positions.get(entry["text"])
+            if position is None:
+                position = positions[entry["text"]] = len(messages)
+                messages.append(entry["text"])
+            pairs.append([entry["page"], position])
+            page_violations.setdefault(entry["page"], []).append(position)
+
+    pages = []
+    for result in summary.get("results", []):
+        page = {
+            "page": result["page"],
+            "success": result.get("success", False),
+            "violations": page_violations.pop(result["page"], [])
+        }
+        for key in PAGE_FLAGS:
+            if key in result:
+                page[key] = result[key]
+        pages.append(page)
+    # Document-wide rule violations can land on pages without a model result
+    for number, violations in page_violations.items():
+        pages.append({"page": number, "violations": violations})
+    pages.sort(key=lambda page: page["page"])
+
+    compact = {key: value for key, value in summary.items() if key not in ("results", "categorized_results")}
+    compact.update({
+        "schema": "compact",
+        "schema_version": COMPACT_SCHEMA_VERSION,
+        "messages": messages,
+        "pages": pages,
+        "categorized_results": categorized
+    })
+    return compact
+
+
+def paginate_results(compact, page=None, category=None, limit=RESULTS_PAGE_LIMIT, offset=0):
+    """One slice of a compact payload's violations, optionally for a single page or category"""
+    categories = [category] if category is not None else list(compact["categorized_results"])
+    selected = [
+        (name, number, position)
+        for name in categories
+        for number, position in compact["categorized_results"][name]
+        if page is None or number == page
+    ]
+    end = offset + limit
+    return {
+        "total": len(selected),
+        "offset": offset,
+        "limit": limit,
+        "next_offset": end if end < len(selected) else None,
+        "items": [
+            {"page": number, "category": name, "text": compact["messages"][position]}
+            for name, number, position in selected[offset:end]
+        ]
+    }
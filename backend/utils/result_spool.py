@@ -0,0 +1,108 @@
+"""
+Result Spool Module
+Append-only JSON Lines files for the per-page data of documents too large to
+hold in memory, and a chunked JSON encoder that streams them into a response
+"""
+
+import json
+import os
+import tempfile
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+SPOOL_DIR = os.getenv("SPOOL_DIR", os.path.join(os.getenv("TEMP_DIR", "temp"), "spool"))
+# Encoded response bytes gathered before each chunk is sent
+SPOOL_CHUNK_BYTES = int(os.getenv("SPOOL_CHUNK_BYTES", 64 * 1024))
+
+
+class RawJson(str):
+    """Text that is already encoded JSON and is written out unchanged"""
+
+
+class JsonlSpool:
+    """Records appended to a temporary JSON Lines file and read back on demand
+
+    Iterating decodes the records in the order they were appended and can be
+    repeated. The file is removed by close().
+    """
+
+    def __init__(self, prefix="spool_"):
+        os.makedirs(SPOOL_DIR, exist_ok=True)
+        fd, self.path = tempfile.mkstemp(prefix=prefix, suffix=".jsonl", dir=SPOOL_DIR)
+        self._file = os.fdopen(fd, "w", encoding="utf-8")
+        self.count = 0
+
+    def append(self, record):
+        self._file.write(json.dumps(record, separators=(",", ":")) + "\n")
+        self.count += 1
+
+    def __len__(self):
+        return self.count
+
+    def lines(self):
+        """Yield each record as RawJson without decoding it"""
+        self._file.flush()
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                yield RawJson(line.rstrip("\n"))
+
+    def __iter__(self):
+        for line in self.lines():
+            yield json.loads(line)
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def encode_json(value):
+    """Yield the JSON text of value piece by piece
+
+    Dicts are encoded key by key and any iterable that is not a list, tuple
+    or string (a generator or a JsonlSpool) becomes an array encoded one item
+    at a time, so large arrays are never built in memory.
+    """
+    if isinstance(value, RawJson):
+        yield value
+    elif isinstance(value, dict):
+        yield "{"
+        for index, (key, item) in enumerate(value.items()):
+            yield ("," if index else "") + json.dumps(str(key)) + ":"
+            yield from encode_json(item)
+        yield "}"
+    elif isinstance(value, (str, int, float, bool, list, tuple, type(None))):
+        yield json.dumps(value)
+    else:
+        yield "["
+        for index, item in enumerate(value):
+            if index:
+                yield ","
+            yield from encode_json(item)
+        yield "]"
+
+
+def iter_json_chunks(value, chunk_bytes=SPOOL_CHUNK_BYTES):
+    """Encode value as JSON in chunks of roughly chunk_bytes, for a StreamingResponse"""
+    buffer = []
+    size = 0
+    for piece in encode_json(value):
+        buffer.append(piece)
+        size += len(piece)
+        if size >= chunk_bytes:
+            yield "".join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield "".join(buffer)
@@ -0,0 +1,481 @@
+"""
+Rule Engine Module
+Deterministic checks for the mechanically verifiable TU formatting rules:
+page numbering, IEEE citations, heading numbering and the table of contents,
+and, from the layout recorded during extraction, font, size, line spacing,
+margins and heading style. Violations use the same {"text", "page"} shape as the LLM-derived errors.
+"""
+
+import os
+import re
+from collections import Counter
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+RULE_ENGINE_ENABLED = os.getenv("RULE_ENGINE_ENABLED", "true").lower() == "true"
+# Pages with fewer words than this are not sent to the model
+TRIVIAL_PAGE_WORDS = int(os.getenv("TRIVIAL_PAGE_WORDS", 12))
+
+# Layout requirements, checked on pages extracted with PDF_LAYOUT
+LAYOUT_FONT_SIZE = float(os.getenv("LAYOUT_FONT_SIZE", 12))
+LAYOUT_MARGIN_PT = float(os.getenv("LAYOUT_MARGIN_PT", 72))
+# Measured margins and heading positions may be off by this much before they are reported
+LAYOUT_TOLERANCE_PT = float(os.getenv("LAYOUT_TOLERANCE_PT", 6))
+# Baseline distance accepted as 1.5 spacing, in font sizes; Word's 1.5 lines of 12pt Times is 1.725
+LINE_PITCH_MIN = float(os.getenv("LINE_PITCH_MIN", 1.4))
+LINE_PITCH_MAX = float(os.getenv("LINE_PITCH_MAX", 1.95))
+# Share of a page's characters set in another font before that font is reported
+OTHER_FONT_SHARE = 0.1
+
+ROMAN_NUMERAL = re.compile(r"^(?=[ivxlcdm]+$)m{0,3}(cm|cd|d?c{0,3})(xc|xl|l?x{0,3})(ix|iv|v?i{0,3})$", re.IGNORECASE)
+BARE_NUMBER = re.compile(r"^(?:page\s+)?(\d{1,4}|[ivxlcdm]{1,7})$", re.IGNORECASE)
+LEADING_NUMBER = re.compile(r"^(\d{1,4})\s+(?=[A-Z]|\d+\.)")
+WORD = re.compile(r"[A-Za-z]{2,}")
+
+IEEE_CITATION = re.compile(r"\[(\d+(?:\s*[-–,]\s*\d+)*)\]")
+AUTHOR_YEAR_CITATION = re.compile(
+    r"\(([A-Z][A-Za-z'\-]+(?:\s+(?:et al\.?|and|&)\s*[A-Z]?[A-Za-z'\-]*)?),?\s+((?:19|20)\d{2}[a-z]?)\)"
+)
+REFERENCE_ENTRY = re.compile(r"^\s*\[(\d+)\]", re.MULTILINE)
+REFERENCES_HEADING = re.compile(r"^(?:\d+(?:\.\d+)*\.?\s*)?(references|bibliography)\s*$", re.IGNORECASE | re.MULTILINE)
+APPENDIX_HEADING = re.compile(r"^(?:\d+(?:\.\d+)*\.?\s*)?appendi(?:x|ces)\b", re.IGNORECASE | re.MULTILINE)
+
+TOC_HEADING = re.compile(r"^\s*(?:\d{1,4}\s+)?(?:table\s+of\s+)?contents\s*$", re.IGNORECASE | re.MULTILINE)
+TOC_ENTRY = re.compile(
+    r"(?P<number>\d+(?:\.\d+)*)?\.?\s*(?P<title>[A-Za-z][^.…\n\d]{2,80}?)\s*[.…·]{3,}[\s.…·]*(?P<page>\d{1,4}|[ivxlc]{1,6})\b"
+)
+HEADING = re.compile(r"^(?P<number>\d+(?:\.\d+){0,3})\.?\s*(?P<title>[A-Z][^\n]{1,80})$")
+CHAPTER_HEADING = re.compile(r"^chapter\s+(?P<number>\d+)\s*[:.\-–]?\s*(?P<title>[^\n]{1,80})$", re.IGNORECASE)
+DOT_LEADER = re.compile(r"[.…·]{3,}")
+HEADING_MAX_WORDS = 10
+# Times New Roman and the metric-compatible faces LaTeX and LibreOffice substitute for it
+TIMES_FONT = re.compile(r"^(?:times|nimbusrom|texgyretermes|liberationserif|ptm)", re.IGNORECASE)
+# Symbol and math fonts are expected alongside the body font
+SYMBOL_FONT = re.compile(r"symbol|dings|math|^cm(?:sy|mi|ex)|^msbm|^msam", re.IGNORECASE)
+
+
+def page_lines(text):
+    return [line.strip() for line in (text or "").split("\n") if line.strip()]
+
+
+def detect_page_label(text):
+    """Find the page number printed on a page, returning (label, first_line_without_it)"""
+    lines = page_lines(text)
+    if not lines:
+        return None, lines
+    for index in (0, -1):
+        match = BARE_NUMBER.match(lines[index])
+        # Words spelled with numeral letters only, such as "mid" or "civil", are not labels
+        if match and label_value(match.group(1))[0] is not None:
+            remaining = lines[:index] + lines[index + 1:] if index == 0 else lines[:-1]
+            return match.group(1), remaining
+    # PyPDF2 often joins a top page number onto the first heading: "2 Disclaimer"
+    match = LEADING_NUMBER.match(lines[0])
+    if match:
+        return match.group(1), [lines[0][match.end():]] + lines[1:]
+    return None, lines
+
+
+def is_trivial_page(text):
+    """Whether a page has too little text to be worth a model call"""
+    _, lines = detect_page_label(text)
+    return sum(len(WORD.findall(line)) for line in lines) < TRIVIAL_PAGE_WORDS
+
+
+def violation(severity, page, message):
+    return {"text": f"[{severity}] {message}", "page": page, "source": "rules"}
+
+
+def roman_to_int(value):
+    numerals = {"i": 1, "v": 5, "x": 10, "l": 50, "c": 100, "d": 500, "m": 1000}
+    total = 0
+    previous = 0
+    for char in reversed(value.lower()):
+        number = numerals[char]
+        total = total - number if number < previous else total + number
+        previous = max(previous, number)
+    return total
+
+
+def label_value(label):
+    """Return ("arabic"|"roman", int) for a page label"""
+    if label.isdigit():
+        return "arabic", int(label)
+    if ROMAN_NUMERAL.match(label):
+        return "roman", roman_to_int(label)
+    return None, None
+
+
+def check_page_numbers(pages, labels):
+    violations = []
+    previous = None
+    for page_data in pages:
+        page = page_data["page"]
+        label = labels.get(page)
+        has_text = bool(page_lines(page_data.get("text")))
+        if page == 1:
+            if label is not None:
+                violations.append(violation("ERROR", page, f"Cover page should not display a page number (found \"{label}\")"))
+            continue
+        if label is None:
+            if has_text:
+                violations.append(violation("ERROR", page, "Page number is missing; page numbering must start from page 2"))
+            continue
+        kind, value = label_value(label)
+        if previous and kind == previous[0]:
+            # Pages whose number was not found still advance the count
+            expected = previous[1] + page - previous[2]
+            # The main body may restart numbering after the front matter
+            restarted = value <= 2 and value <= previous[1]
+            if value != expected and not restarted:
+                violations.append(violation(
+                    "ERROR", page,
+                    f"Page numbering is out of sequence: page shows {label} but {expected} was expected"
+                ))
+        previous = (kind, value, page)
+    return violations
+
+
+def find_section_pages(pages, heading_pattern):
+    """Return page numbers from the last page matching heading_pattern up to the appendices"""
+    section = []
+    in_section = False
+    for page_data in pages:
+        text = page_data.get("text") or ""
+        if heading_pattern.search(text):
+            section = [page_data["page"]]
+            in_section = True
+        elif in_section and APPENDIX_HEADING.search(text):
+            in_section = False
+        elif in_section:
+            section.append(page_data["page"])
+    return section
+
+
+def expand_citation(numbers):
+    cited = set()
+    for part in re.split(r"\s*,\s*", numbers):
+        bounds = re.split(r"\s*[-–]\s*", part)
+        if len(bounds) == 2 and bounds[0].isdigit() and bounds[1].isdigit():
+            low, high = int(bounds[0]), int(bounds[1])
+            if low <= high and high - low < 50:
+                cited.update(range(low, high + 1))
+        elif part.isdigit():
+            cited.add(int(part))
+    return cited
+
+
+def check_citations(pages):
+    violations = []
+    reference_pages = set(find_section_pages(pages, REFERENCES_HEADING))
+    references = {}
+    citations = {}
+
+    for page_data in pages:
+        page = page_data["page"]
+        text = page_data.get("text") or ""
+        if page in reference_pages:
+            for match in REFERENCE_ENTRY.finditer(text):
+                references.setdefault(int(match.group(1)), page)
+            continue
+        for match in IEEE_CITATION.finditer(text):
+            for number in expand_citation(match.group(1)):
+                citations.setdefault(number, page)
+        for match in AUTHOR_YEAR_CITATION.finditer(text):
+            violations.append(violation(
+                "ERROR", page,
+                f"Citation \"{match.group(0)}\" is not in IEEE style; use numbered citations like [1]"
+            ))
+
+    if citations and not reference_pages:
+        first_page = min(citations.values())
+        violations.append(violation("ERROR", first_page, "In-text citations found but the document has no References section"))
+        return violations
+    if reference_pages and not references:
+        violations.append(violation(
+            "ERROR", min(reference_pages),
+            "Reference list entries are not numbered in IEEE format ([1], [2], ...)"
+        ))
+        return violations
+
+    for number, page in sorted(citations.items()):
+        if number not in references:
+            violations.append(violation("ERROR", page, f"Citation [{number}] has no matching entry in the reference list"))
+    for number, page in sorted(references.items()):
+        if number not in citations:
+            violations.append(violation("WARNING", page, f"Reference [{number}] is never cited in the text"))
+    return violations
+
+
+def find_headings(pages, skip_pages):
+    """Collect numbered headings as (page, numbers, title, line)"""
+    headings = []
+    for page_data in pages:
+        page = page_data["page"]
+        if page in skip_pages:
+            continue
+        _, body_lines = detect_page_label(page_data.get("text"))
+        for line in body_lines:
+            if len(line.split()) > HEADING_MAX_WORDS or line.endswith((".", ",", ";")) or DOT_LEADER.search(line):
+                continue
+            match = CHAPTER_HEADING.match(line)
+            if match:
+                headings.append((page, [int(match.group("number"))], match.group("title").strip(), line))
+                continue
+            match = HEADING.match(line)
+            if not match:
+                continue
+            numbers = [int(part) for part in match.group("number").split(".")]
+            title = match.group("title").strip()
+            # Single-level numbers are only headings when written in capitals, not list items
+            if len(numbers) == 1 and not title.isupper():
+                continue
+            headings.append((page, numbers, title, line))
+    return headings
+
+
+def follows(previous, numbers):
+    """Whether heading numbers are a valid successor of the previous heading's numbers"""
+    # "2.1" may directly follow "1.6" when the chapter line itself was not extracted
+    parent = numbers
+    while len(parent) > 1 and parent[-1] == 1:
+        parent = parent[:-1]
+        if follows(previous, parent):
+            return True
+    if len(numbers) == len(previous) + 1:
+        return numbers[:-1] == previous and numbers[-1] == 1
+    return (
+        len(numbers) <= len(previous)
+        and numbers[:-1] == previous[:len(numbers) - 1]
+        and numbers[-1] == previous[len(numbers) - 1] + 1
+    )
+
+
+def check_heading_numbering(headings):
+    violations = []
+    previous = None
+    for page, numbers, title, line in headings:
+        if previous is not None and not follows(previous, numbers):
+            if len(numbers) <= len(previous):
+                expected = previous[:len(numbers) - 1] + [previous[len(numbers) - 1] + 1]
+            else:
+                expected = previous + [1]
+            violations.append(violation(
+                "WARNING", page,
+                f"Heading numbering is inconsistent: \"{line}\" follows {'.'.join(map(str, previous))} "
+                f"(expected {'.'.join(map(str, expected))})"
+            ))
+        previous = numbers
+    return violations
+
+
+def check_table_of_contents(pages, headings, labels, toc_pages):
+    violations = []
+    if not toc_pages:
+        return violations
+    toc_text = "\n".join(page_data.get("text") or "" for page_data in pages if page_data["page"] in toc_pages)
+    entries = [match for match in TOC_ENTRY.finditer(toc_text) if match.group("number")]
+    if len(entries) < 3:
+        return violations
+
+    toc_page = min(toc_pages)
+    heading_pages = {}
+    for page, numbers, title, line in headings:
+        heading_pages.setdefault(".".join(map(str, numbers)), (page, title))
+    listed = set()
+
+    for entry in entries:
+        number = entry.group("number")
+        listed.add(number)
+        if number not in heading_pages:
+            continue
+        page, title = heading_pages[number]
+        shown = labels.get(page)
+        if shown is not None and entry.group("page") != shown:
+            violations.append(violation(
+                "ERROR", toc_page,
+                f"Table of contents lists \"{number} {entry.group('title').strip()}\" on page {entry.group('page')} but it appears on page {shown}"
+            ))
+
+    # Only chapters the extracted contents cover are checked, as long contents pages are often cut short
+    listed_chapters = {number.split(".")[0] for number in listed}
+    for number, (page, title) in heading_pages.items():
+        if number.count(".") <= 1 and number not in listed and number.split(".")[0] in listed_chapters:
+            violations.append(violation(
+                "ERROR", page, f"Heading \"{number} {title}\" is missing from the table of contents"
+            ))
+    return violations
+
+
+def find_toc_pages(pages):
+    """Pages of the table of contents: its heading page and following pages of entries"""
+    toc_pages = set()
+    in_toc = False
+    for page_data in pages:
+        text = page_data.get("text") or ""
+        if TOC_HEADING.search(text):
+            in_toc = True
+        elif not in_toc or len(TOC_ENTRY.findall(text)) < 3:
+            in_toc = False
+            continue
+        toc_pages.add(page_data["page"])
+    return toc_pages
+
+
+def page_ranges(pages):
+    """Format page numbers compactly, e.g. [3, 4, 5, 9] as 3-5, 9"""
+    ranges = []
+    for page in sorted(set(pages)):
+        if ranges and page == ranges[-1][1] + 1:
+            ranges[-1][1] = page
+        else:
+            ranges.append([page, page])
+    return ", ".join(str(low) if low == high else f"{low}-{high}" for low, high in ranges)
+
+
+def inches(points):
+    return f"{points / 72:.2f}".rstrip("0").rstrip(".")
+
+
+def is_times(font):
+    return bool(TIMES_FONT.match(re.sub(r"[\s_\-]", "", font or "")))
+
+
+def document_font(pages):
+    """The font name and size most of a document's characters after the cover page are set in"""
+    names = Counter()
+    sizes = Counter()
+    for page_data in pages:
+        layout = page_data.get("layout")
+        if page_data["page"] == 1 or not layout:
+            continue
+        for name, size, chars in layout["fonts"]:
+            names[name] += chars
+            sizes[size] += chars
+    if not names:
+        return None, None
+    return names.most_common(1)[0][0], sizes.most_common(1)[0][0]
+
+
+def layout_findings(layout, headings, body_font):
+    """Yield (key, severity, message) for each layout rule a page breaks"""
+    total = sum(chars for _, _, chars in layout["fonts"]) or 1
+    shares = {}
+    for name, _, chars in layout["fonts"]:
+        shares[name] = shares.get(name, 0) + chars
+    for name, chars in shares.items():
+        if name != body_font and chars / total >= OTHER_FONT_SHARE and not is_times(name) and not SYMBOL_FONT.search(name):
+            yield ("font", name), "WARNING", f"Text on this page uses the {name} font; TU requires Times New Roman throughout"
+
+    pitch, body_size = layout["line_pitch"], layout["body_size"]
+    if pitch:
+        ratio = pitch / body_size
+        if not LINE_PITCH_MIN <= ratio <= LINE_PITCH_MAX:
+            kind = "narrow" if ratio < LINE_PITCH_MIN else "wide"
+            yield ("spacing", kind), "ERROR", (
+                f"Line spacing is {ratio:.2f} times the font size ({pitch:g}pt between {body_size:g}pt lines, "
+                f"{'closer' if kind == 'narrow' else 'wider'} than 1.5 spacing); TU requires 1.5 line spacing"
+            )
+
+    box, area = layout["box"], layout["text_box"]
+    if area is None:
+        return
+    margins = {
+        "left": area[0] - box[0],
+        "top": box[3] - area[3],
+        "bottom": area[1] - box[1],
+        "right": None if area[2] is None else box[2] - area[2],
+    }
+    required = f"TU requires {inches(LAYOUT_MARGIN_PT)} in ({LAYOUT_MARGIN_PT / 72 * 2.54:.2f} cm)"
+    for side, margin in margins.items():
+        if margin is not None and margin < LAYOUT_MARGIN_PT - LAYOUT_TOLERANCE_PT:
+            yield ("margin", side, "small"), "ERROR", f"{side.capitalize()} margin is {inches(margin)} in; {required}"
+    # Text only starts further in than the margin when the whole page is indented; short pages may be a list or figure
+    if layout["body_lines"] >= 5 and margins["left"] > LAYOUT_MARGIN_PT + LAYOUT_TOLERANCE_PT:
+        yield ("margin", "left", "large"), "ERROR", f"Left margin is {inches(margins['left'])} in; {required}"
+
+    lines = {re.sub(r"\s+", "", line[0]).lower(): line for line in layout["lines"]}
+    for numbers, heading in headings:
+        line = lines.get(re.sub(r"\s+", "", heading).lower())
+        if line is None:
+            continue
+        _, x0, x1, size, _, bold = line
+        # Keys and messages name the kind of heading, as one finding gathers every page with that problem
+        kind = "Main heading" if len(numbers) == 1 else "Subheading"
+        if not bold:
+            yield ("heading_bold", kind), "WARNING", f"{kind}s are not bold; TU headings are bold"
+        if abs(size - LAYOUT_FONT_SIZE) > 0.25:
+            yield ("heading_size", kind, size), "WARNING", f"{kind}s are {size:g}pt; TU headings are {LAYOUT_FONT_SIZE:g}pt"
+        if kind == "Main heading":
+            # Centered between the margins, which for equal margins is the page center
+            if x1 is not None and abs((x0 + x1) / 2 - (box[0] + box[2]) / 2) > 3 * LAYOUT_TOLERANCE_PT:
+                yield ("heading_centered",), "WARNING", "Main headings are not centered"
+        elif abs(x0 - area[0]) > LAYOUT_TOLERANCE_PT:
+            yield ("heading_aligned",), "WARNING", "Subheadings are not left-aligned with the body text"
+
+
+def check_layout(pages, headings):
+    """Font, size, line spacing, margin and heading style checks on pages extracted with their layout
+
+    A problem found on several pages is reported once, on its first page,
+    with the other pages listed. The cover page is not checked.
+    """
+    violations = []
+    body_font, body_size = document_font(pages)
+    if body_font is None:
+        return violations
+    first_page = None
+    page_headings = {}
+    for page, numbers, title, line in headings:
+        page_headings.setdefault(page, []).append((numbers, line))
+
+    findings = {}
+    for page_data in pages:
+        page = page_data["page"]
+        layout = page_data.get("layout")
+        if page == 1 or not layout or not layout["fonts"]:
+            continue
+        first_page = first_page or page
+        for key, severity, message in layout_findings(layout, page_headings.get(page, []), body_font):
+            finding = findings.setdefault(key, {"severity": severity, "message": message, "pages": []})
+            if finding["pages"][-1:] != [page]:
+                finding["pages"].append(page)
+
+    if not is_times(body_font):
+        violations.append(violation("ERROR", first_page, f"Body text font is {body_font}; TU requires Times New Roman"))
+    if abs(body_size - LAYOUT_FONT_SIZE) > 0.25:
+        violations.append(violation("ERROR", first_page, f"Body text font size is {body_size:g}pt; TU requires {LAYOUT_FONT_SIZE:g}pt"))
+    for finding in findings.values():
+        message = finding["message"]
+        if len(finding["pages"]) > 1:
+            message += f" (pages {page_ranges(finding['pages'])})"
+        violations.append(violation(finding["severity"], finding["pages"][0], message))
+    return violations
+
+
+def run_rule_checks(pages):
+    """Run every local check over a document's pages and return the violations
+
+    Checks only iterate over pages, in order, so any re-iterable of page
+    dicts works, such as a JsonlSpool of a document too large to hold in memory.
+    """
+    labels = {}
+    for page_data in pages:
+        label, _ = detect_page_label(page_data.get("text"))
+        if label is not None:
+            labels[page_data["page"]] = label
+
+    toc_pages = find_toc_pages(pages)
+    reference_pages = set(find_section_pages(pages, REFERENCES_HEADING))
+    headings = find_headings(pages, toc_pages | reference_pages)
+
+    violations = []
+    violations.extend(check_page_numbers(pages, labels))
+    violations.extend(check_citations(pages))
+    violations.extend(check_heading_numbering(headings))
+    violations.extend(check_table_of_contents(pages, headings, labels, toc_pages))
+    violations.extend(check_layout(pages, headings))
+    violations.sort(key=lambda item: item["page"])
+    return violations
@@ -0,0 +1,190 @@
+"""
+Text Normalizer Module
+Cleans PyPDF2 page text before it is put into prompts: re-joins words that
+were split one per line, repairs words broken by stray spaces and strips
+running headers/footers that repeat across pages
+"""
+
+import os
+import re
+from collections import Counter
+from dotenv import load_dotenv
+from utils.tokens import estimate_tokens
+
+# Load environment variables
+load_dotenv()
+
+TEXT_NORMALIZATION = os.getenv("TEXT_NORMALIZATION", "true").lower() == "true"
+# A page counts as fragmented when this share of its lines is blank
+FRAGMENTED_BLANK_RATIO = 0.3
+# A top/bottom line must repeat on this many pages before it is stripped
+HEADER_MIN_REPEATS = 3
+# Running headers/footers are short; longer repeated lines are left alone
+HEADER_MAX_WORDS = 10
+
+SPACE_BEFORE_PUNCTUATION = re.compile(r"[ \t]+([,.;:!?%)\]}])")
+SPACE_AFTER_OPENING = re.compile(r"([(\[{])[ \t]+")
+MULTIPLE_SPACES = re.compile(r"[ \t]{2,}")
+MULTIPLE_BLANK_LINES = re.compile(r"\n{3,}")
+WORD = re.compile(r"[A-Za-z]+")
+WORD_WITH_TRAILER = re.compile(r"^([A-Za-z]+)(\W*)$")
+PAGE_NUMBER_LINE = re.compile(r"^(?:page\s+)?(?:\d+|[ivxlcdm]+)$", re.IGNORECASE)
+DIGITS = re.compile(r"\d+")
+
+
+def rejoin_fragments(text):
+    """Rebuild lines from PyPDF2 output that puts every word on its own line"""
+    lines = text.split("\n")
+    blank = sum(1 for line in lines if not line.strip())
+    if not lines or blank / len(lines) < FRAGMENTED_BLANK_RATIO:
+        return "\n".join(line.strip() for line in lines)
+
+    # One blank line separates words, longer runs separate lines
+    parts = []
+    blank_run = 0
+    for line in lines:
+        content = line.strip()
+        if not content:
+            blank_run += 1
+            continue
+        if parts:
+            if blank_run == 0:
+                parts.append("" if SPACE_BEFORE_PUNCTUATION.match(" " + content) else " ")
+            elif blank_run == 1:
+                parts.append(" ")
+            else:
+                parts.append("\n")
+        parts.append(content)
+        blank_run = 0
+    return "".join(parts)
+
+
+def clean_spacing(text):
+    """Remove spaces before punctuation and collapse repeated whitespace"""
+    text = SPACE_BEFORE_PUNCTUATION.sub(r"\1", text)
+    text = SPACE_AFTER_OPENING.sub(r"\1", text)
+    text = MULTIPLE_SPACES.sub(" ", text)
+    return MULTIPLE_BLANK_LINES.sub("\n\n", text).strip()
+
+
+def header_key(line):
+    """Key used to recognise a running header/footer regardless of page numbers"""
+    return DIGITS.sub("#", line.strip().lower())
+
+
+class PageNormalizer:
+    """Normalizes the pages of one document, learning from pages seen so far
+
+    Pages can be fed one at a time as they are extracted. Split words are
+    repaired using the document's own vocabulary, and top/bottom lines are
+    treated as running headers once they have repeated on enough pages.
+    """
+
+    def __init__(self, enabled=TEXT_NORMALIZATION):
+        self.enabled = enabled
+        self.vocabulary = Counter()
+        self.edge_lines = Counter()
+        self.token_counts = []
+
+    def learn(self, text):
+        """Add a page's words and edge lines to the document statistics"""
+        self.vocabulary.update(word.lower() for word in WORD.findall(text) if len(word) > 2)
+        lines = [line for line in text.split("\n") if line.strip()]
+        for line in {lines[0], lines[-1]} if lines else ():
+            if not PAGE_NUMBER_LINE.match(line.strip()) and len(line.split()) <= HEADER_MAX_WORDS:
+                self.edge_lines[header_key(line)] += 1
+
+    def should_join(self, left, right):
+        """Whether two adjacent words are really one word split by a stray space"""
+        if not left.isalpha() or len(left) < 3:
+            return False
+        match = WORD_WITH_TRAILER.match(right)
+        if not match or len(match.group(1)) < 3:
+            return False
+        joined = self.vocabulary[(left + match.group(1)).lower()]
+        # A real word is usually more common on its own than as part of the joined word
+        return joined > 0 and (
+            self.vocabulary[left.lower()] <= joined or self.vocabulary[match.group(1).lower()] <= joined
+        )
+
+    def repair_split_words(self, text):
+        """Join fragments like "requir ements" when the joined word occurs elsewhere"""
+        lines = []
+        for line in text.split("\n"):
+            words = []
+            for word in line.split(" "):
+                if words and self.should_join(words[-1], word):
+                    words[-1] += word
+                else:
+                    words.append(word)
+            lines.append(" ".join(words))
+        return "\n".join(lines)
+
+    def strip_running_lines(self, text):
+        """Drop top/bottom lines that repeat across pages, keeping page numbers"""
+        lines = text.split("\n")
+        for index in (0, -1):
+            while lines:
+                line = lines[index].strip()
+                if not line:
+                    lines.pop(index)
+                    continue
+                if PAGE_NUMBER_LINE.match(line) or self.edge_lines[header_key(line)] < HEADER_MIN_REPEATS:
+                    break
+                lines.pop(index)
+        return "\n".join(lines)
+
+    def normalize(self, page_data, learn=True):
+        """Return a normalized copy of a page dict with before/after token counts"""
+        raw_text = page_data.get("text") or ""
+        text = raw_text
+        if self.enabled:
+            text = clean_spacing(rejoin_fragments(raw_text))
+            if learn:
+                self.learn(text)
+            text = self.repair_split_words(text)
+            text = self.strip_running_lines(text)
+        normalized = {
+            **page_data,
+            "text": text,
+            "tokens_before": estimate_tokens(raw_text),
+            "tokens_after": estimate_tokens(text) if self.enabled else None,
+        }
+        self.token_counts.append({key: normalized[key] for key in ("page", "tokens_before", "tokens_after")})
+        return normalized
+
+    async def stream(self, pages):
+        """Normalize pages from an async page stream as they arrive"""
+        async for page_data in pages:
+            yield self.normalize(page_data)
+
+    def report(self):
+        """Before/after token counts for every page normalized so far"""
+        return token_report(self.token_counts)
+
+
+def normalize_pages(pages, normalizer=None):
+    """Normalize a complete document, learning from every page before cleaning any"""
+    normalizer = normalizer or PageNormalizer()
+    if normalizer.enabled:
+        for page_data in pages:
+            normalizer.learn(clean_spacing(rejoin_fragments(page_data.get("text") or "")))
+    return [normalizer.normalize(page_data, learn=False) for page_data in pages]
+
+
+def token_report(pages):
+    """Summarize before/after token counts for normalized pages"""
+    before = sum(page_data.get("tokens_before") or 0 for page_data in pages)
+    after = sum(
+        page_data["tokens_before"] if page_data.get("tokens_after") is None else page_data["tokens_after"]
+        for page_data in pages
+    )
+    return {
+        "tokens_before": before,
+        "tokens_after": after,
+        "reduction_percent": round((1 - after / before) * 100, 1) if before else 0.0,
+        "per_page": {
+            str(page_data["page"]): [page_data.get("tokens_before"), page_data.get("tokens_after")]
+            for page_data in pages
+        },
+    }
@@ -0,0 +1,38 @@
+"""
+Timing Module
+Records when each pipeline stage starts and finishes for a single request
+"""
+
+import time
+
+
+class PipelineTimer:
+    """Collects first-occurrence timestamps relative to the start of a request"""
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.marks = {}
+
+    def mark(self, name):
+        """Record the first time an event happens"""
+        if name not in self.marks:
+            self.marks[name] = time.perf_counter() - self.origin
+
+    def mark_last(self, name):
+        """Record the latest time an event happens"""
+        self.marks[name] = time.perf_counter() - self.origin
+
+    def elapsed_ms(self, start, end):
+        if start not in self.marks or end not in self.marks:
+            return None
+        return round((self.marks[end] - self.marks[start]) * 1000, 1)
+
+    def summary(self):
+        """Stage durations in milliseconds, including extraction/analysis overlap"""
+        result = {f"{name}_at_ms": round(offset * 1000, 1) for name, offset in self.marks.items()}
+        result["extraction_ms"] = self.elapsed_ms("extraction_started", "extraction_finished")
+        result["analysis_ms"] = self.elapsed_ms("analysis_started", "analysis_finished")
+        result["total_ms"] = round((time.perf_counter() - self.origin) * 1000, 1)
+        overlap = self.elapsed_ms("analysis_started", "extraction_finished")
+        result["overlap_ms"] = max(overlap, 0.0) if overlap is not None else None
+        return result
@@ -0,0 +1,27 @@
+"""
+Tokens Module
+Cheap, dependency-free token count estimates for prompt budgeting
+"""
+
+import re
+
+# Words are split into 4-character pieces, roughly matching BPE vocabularies;
+# punctuation and line breaks count as a token each
+TOKEN_PATTERN = re.compile(r"\w{1,4}|[^\w\s]|\n")
+
+
+def estimate_tokens(text):
+    """Estimate how many model tokens a piece of text will use"""
+    if not text:
+        return 0
+    return len(TOKEN_PATTERN.findall(text))
+
+
+def truncate_to_tokens(text, max_tokens):
+    """Cut text so that its estimated token count fits within max_tokens"""
+    if max_tokens <= 0:
+        return ""
+    for count, match in enumerate(TOKEN_PATTERN.finditer(text), start=1):
+        if count > max_tokens:
+            return text[:match.start()]
+    return text
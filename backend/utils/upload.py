@@ -0,0 +1,179 @@
+"""
+Upload Module
+Streams uploaded PDF files into memory or unique temporary files with a size cap.
+UploadLimitMiddleware enforces the cap on the request body itself, while it is
+received, so an oversized upload is never read in full.
+"""
+
+import asyncio
+import hashlib
+import os
+import tempfile
+import time
+from contextlib import asynccontextmanager
+from dotenv import load_dotenv
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from utils.metrics import observe_stage
+
+# Load environment variables
+load_dotenv()
+
+TEMP_DIR = os.getenv("TEMP_DIR", "temp")
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", 1024 * 1024))
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", 50 * 1024 * 1024))
+# Uploads up to this size are handed to the PDF reader straight from memory
+UPLOAD_MEMORY_THRESHOLD = int(os.getenv("UPLOAD_MEMORY_THRESHOLD", 8 * 1024 * 1024))
+# Allowance for multipart framing and the form fields sent alongside the file
+UPLOAD_FORM_OVERHEAD = int(os.getenv("UPLOAD_FORM_OVERHEAD", 64 * 1024))
+
+
+class UploadTooLarge(Exception):
+    """Raised when an upload exceeds the configured maximum size"""
+
+    def __init__(self, max_bytes):
+        super().__init__(f"File exceeds the maximum upload size of {max_bytes / (1024 * 1024):.1f} MB")
+        self.max_bytes = max_bytes
+
+
+class ReceivedUpload:
+    """An uploaded file held either in memory or in a private temporary file"""
+
+    def __init__(self, filename, sha256, size, data=None, path=None, seconds=0.0):
+        self.filename = filename
+        self.sha256 = sha256
+        self.size = size
+        self.data = data
+        self.path = path
+        self.seconds = seconds
+
+    @property
+    def source(self):
+        """The temporary file path, or the raw bytes for in-memory uploads"""
+        if self.path is not None:
+            return self.path
+        return self.data
+
+    @property
+    def in_memory(self):
+        return self.path is None
+
+
+def open_spill_file():
+    os.makedirs(TEMP_DIR, exist_ok=True)
+    fd, path = tempfile.mkstemp(prefix="upload_", suffix=".pdf", dir=TEMP_DIR)
+    return os.fdopen(fd, "wb"), path
+
+
+@asynccontextmanager
+async def receive_upload(file, max_bytes=UPLOAD_MAX_BYTES, memory_threshold=UPLOAD_MEMORY_THRESHOLD):
+    """Read an upload in chunks, hashing it and enforcing the size limit
+
+    Small files stay in memory; larger ones spill to a uniquely named file in
+    TEMP_DIR that is deleted when the context exits. Disk writes run in a
+    thread so they do not stall the event loop.
+    """
+    started = time.perf_counter()
+    digest = hashlib.sha256()
+    buffer = bytearray()
+    size = 0
+    path = None
+    spill = None
+    try:
+        while True:
+            chunk = await file.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadTooLarge(max_bytes)
+            digest.update(chunk)
+
+            if spill is None and size > memory_threshold:
+                spill, path = await asyncio.to_thread(open_spill_file)
+                await asyncio.to_thread(spill.write, buffer)
+                buffer = None
+            if spill is not None:
+                await asyncio.to_thread(spill.write, chunk)
+            else:
+                buffer.extend(chunk)
+
+        if spill is not None:
+            await asyncio.to_thread(spill.close)
+            spill = None
+            upload = ReceivedUpload(file.filename, digest.hexdigest(), size, path=path)
+        else:
+            upload = ReceivedUpload(file.filename, digest.hexdigest(), size, data=bytes(buffer))
+        upload.seconds = time.perf_counter() - started
+        observe_stage("upload", upload.seconds)
+        yield upload
+    finally:
+        if spill is not None:
+            spill.close()
+        if path is not None:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+class UploadLimitMiddleware:
+    """Refuse request bodies over a path's upload limit with 413 while they are received
+
+    limits maps request paths to the largest file upload they accept; the body
+    may be UPLOAD_FORM_OVERHEAD larger. A Content-Length over the limit is
+    refused before any of the body is read. Otherwise the body is counted as it
+    arrives and cut off at the limit, so the form parser never spools more.
+    """
+
+    def __init__(self, app, limits):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        max_bytes = self.limits.get(scope["path"]) if scope["type"] == "http" else None
+        if max_bytes is None:
+            await self.app(scope, receive, send)
+            return
+        limit = max_bytes + UPLOAD_FORM_OVERHEAD
+        content_length = Headers(scope=scope).get("content-length", "")
+        if content_length.isdigit() and int(content_length) > limit:
+            await self.reject(scope, receive, send, max_bytes)
+            return
+
+        received = 0
+        exceeded = False
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received, exceeded
+            if exceeded:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # The parser sees the body end early and the app's error reply is replaced below
+                    exceeded = True
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def limited_send(message):
+            nonlocal response_started
+            if exceeded and not response_started:
+                return
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, limited_send)
+        except Exception:
+            if not exceeded or response_started:
+                raise
+        if exceeded and not response_started:
+            await self.reject(scope, receive, send, max_bytes)
+
+    async def reject(self, scope, receive, send, max_bytes):
+        response = JSONResponse(status_code=413, content={"error": str(UploadTooLarge(max_bytes))})
+        await response(scope, receive, send)
@@ -0,0 +1,127 @@
+"""
+Violation Classifier Module
+Assigns a phase category and a severity to violation messages in a single
+regex pass, using the keyword taxonomy in prompt/violation_taxonomy.json
+"""
+
+import json
+import os
+import re
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+VIOLATION_TAXONOMY_PATH = os.getenv(
+    "VIOLATION_TAXONOMY_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "prompt", "violation_taxonomy.json")
+)
+
+# Bound on remembered keyword sequences
+MAX_RESOLVED = 4096
+SEVERITY_TAG = re.compile(r"^\s*\[(?:ERROR|WARNING|SUGGESTION)\]\s*", re.IGNORECASE)
+
+
+def trie_pattern(words):
+    """Regex alternation of words factored into a prefix tree, so matching never backtracks across siblings"""
+    tree = {}
+    for word in words:
+        node = tree
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        pattern = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return f"(?:{pattern})?" if "" in node else pattern
+
+    return build(tree)
+
+
+def keyword_rank(keyword, groups):
+    """Rank of the first group with a keyword that matches inside keyword, or None"""
+    for rank, words in enumerate(groups):
+        if any(re.search(r"\b" + re.escape(word), keyword, re.IGNORECASE) for word in words):
+            return rank
+    return None
+
+
+class ViolationClassifier:
+    """Classifies violation text by category and severity with one compiled pattern
+
+    Categories and severities are tried in taxonomy order, so a message that
+    mentions both a structure and a grammar keyword is a structure issue. An
+    explicit [ERROR]/[WARNING]/[SUGGESTION] tag decides the severity.
+    """
+
+    def __init__(self, taxonomy):
+        self.category_names = list(taxonomy["categories"]) + [taxonomy["default_category"]]
+        self.severity_names = list(taxonomy["severities"])
+        self.default_severity = taxonomy["default_severity"]
+        self.tags = {tag.upper(): severity for tag, severity in taxonomy["severity_tags"].items()}
+        for severity in self.tags.values():
+            if severity not in self.severity_names:
+                self.severity_names.append(severity)
+
+        category_groups = list(taxonomy["categories"].values())
+        severity_groups = list(taxonomy["severities"].values())
+        keywords = {word.lower() for words in category_groups + severity_groups for word in words}
+        # Longer keywords win at the same position ("page numbering" over "page"),
+        # so each keyword also carries the ranks of any shorter keyword inside it
+        self.keywords = {
+            keyword: (keyword_rank(keyword, category_groups), keyword_rank(keyword, severity_groups))
+            for keyword in keywords
+        }
+        self.tag_tokens = {f"[{tag.lower()}]": severity for tag, severity in self.tags.items()}
+        # Matched against lowercased text; the lookbehind keeps keywords at word starts
+        self.pattern = re.compile(
+            r"(?<![a-z0-9_])(" + trie_pattern(list(self.tag_tokens) + list(keywords)) + ")"
+        )
+        # Messages share few distinct keyword sequences, so each is resolved once
+        self.resolved = {}
+
+    @classmethod
+    def from_file(cls, path=VIOLATION_TAXONOMY_PATH):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def resolve(self, found):
+        """Pick the category and severity for the keywords found in one message"""
+        category_rank = None
+        severity_rank = None
+        tag_severity = None
+        for token in found:
+            if token in self.tag_tokens:
+                tag_severity = tag_severity or self.tag_tokens[token]
+                continue
+            category, severity = self.keywords[token]
+            if category is not None and (category_rank is None or category < category_rank):
+                category_rank = category
+            if severity is not None and (severity_rank is None or severity < severity_rank):
+                severity_rank = severity
+        category = self.category_names[-1] if category_rank is None else self.category_names[category_rank]
+        if tag_severity:
+            return category, tag_severity
+        return category, self.default_severity if severity_rank is None else self.severity_names[severity_rank]
+
+    def classify(self, text):
+        """Return (category, severity) for a violation message"""
+        found = tuple(self.pattern.findall(text.lower()))
+        result = self.resolved.get(found)
+        if result is None:
+            result = self.resolve(found)
+            if len(self.resolved) < MAX_RESOLVED:
+                self.resolved[found] = result
+        return result
+
+
+def strip_severity_tag(text):
+    """Remove a leading [ERROR]/[WARNING]/[SUGGESTION] tag"""
+    return SEVERITY_TAG.sub("", text, count=1)
+
+
+# Global instance for easy access
+violation_classifier = ViolationClassifier.from_file()
@@ -0,0 +1,153 @@
+"""
+Job Worker Module
+Runs queued analysis jobs outside the API process. Start as many worker
+processes as analysis throughput needs; they coordinate through the job queue.
+
+Usage: python worker.py [--workers N] [--concurrency N]
+"""
+
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import time
+from dotenv import load_dotenv
+from main import run_page_analysis, run_batch_analysis, sync_prompt_templates
+from utils.backend_pool import backend_pool
+from utils.job_queue import job_queue
+from utils.ollama_client import close_client
+from utils.pdf_reader import shutdown_process_pool
+
+# Load environment variables
+load_dotenv()
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 2))
+# Jobs each worker process runs at once; pages of all of them share its scheduler
+JOB_WORKER_CONCURRENCY = int(os.getenv("JOB_WORKER_CONCURRENCY", 2))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", 1))
+JOB_HEARTBEAT_INTERVAL = float(os.getenv("JOB_HEARTBEAT_INTERVAL", 15))
+JOB_PURGE_INTERVAL = float(os.getenv("JOB_PURGE_INTERVAL", 3600))
+
+
+async def run_job(job, worker_id):
+    """Run one claimed job through the analysis pipeline and record its outcome"""
+    loop = asyncio.get_running_loop()
+    progress_writes = set()
+
+    def on_progress(completed, total):
+        # Called from task callbacks, so the write is handed to a thread rather than awaited
+        write = loop.run_in_executor(None, job_queue.update_progress, job["id"], completed, total)
+        progress_writes.add(write)
+        write.add_done_callback(progress_writes.discard)
+
+    started = time.perf_counter()
+    logging.info(f"Worker {worker_id} started {job['mode']} job {job['id']} ('{job['filename']}', attempt {job['attempts'] + 1})")
+    try:
+        if job["mode"] == "batch":
+            result = await run_batch_analysis(job["path"], job["sha256"], on_progress)
+        else:
+            result = await run_page_analysis(job["path"], job["sha256"], job["options"].get("previous_analysis_id"), on_progress)
+        await asyncio.gather(*progress_writes, return_exceptions=True)
+        if "error" in result:
+            await asyncio.to_thread(job_queue.fail, job["id"], result["error"])
+        else:
+            await asyncio.to_thread(job_queue.complete, job["id"], result)
+        logging.info(f"Worker {worker_id} finished job {job['id']} in {time.perf_counter() - started:.1f}s")
+    except Exception as e:
+        logging.exception(f"Job {job['id']} failed")
+        await asyncio.to_thread(job_queue.fail, job["id"], f"Analysis failed: {str(e)}")
+    # Only reached once the outcome is recorded; a cancelled job keeps its upload for the next attempt
+    try:
+        os.remove(job["path"])
+    except OSError:
+        pass
+
+
+async def heartbeat(worker_id):
+    while True:
+        await asyncio.to_thread(job_queue.heartbeat_worker, worker_id)
+        await asyncio.sleep(JOB_HEARTBEAT_INTERVAL)
+
+
+async def work(worker_id, concurrency):
+    """Claim and run jobs until cancelled, at most `concurrency` at a time"""
+    sync_prompt_templates()
+    backend_pool.start_health_checks()
+    beat = asyncio.create_task(heartbeat(worker_id))
+    slots = asyncio.Semaphore(concurrency)
+    running = set()
+    last_purge = 0.0
+    try:
+        while True:
+            await slots.acquire()
+            job = await asyncio.to_thread(job_queue.claim, worker_id)
+            if job is None:
+                slots.release()
+                if time.monotonic() - last_purge > JOB_PURGE_INTERVAL:
+                    await asyncio.to_thread(job_queue.purge)
+                    last_purge = time.monotonic()
+                await asyncio.sleep(JOB_POLL_INTERVAL)
+                continue
+            task = asyncio.create_task(run_job(job, worker_id))
+            running.add(task)
+            task.add_done_callback(running.discard)
+            task.add_done_callback(lambda _: slots.release())
+    finally:
+        beat.cancel()
+        for task in running:
+            task.cancel()
+        # Interrupted jobs are requeued now rather than after JOB_STALE_SECONDS
+        await asyncio.gather(*running, return_exceptions=True)
+        await asyncio.to_thread(job_queue.release, worker_id)
+        await asyncio.to_thread(job_queue.remove_worker, worker_id)
+        await backend_pool.stop_health_checks()
+        await close_client()
+        shutdown_process_pool()
+
+
+def stop_on_sigterm():
+    """Treat SIGTERM like Ctrl+C so running jobs are cancelled and connections closed"""
+    def handler(signum, frame):
+        raise KeyboardInterrupt
+    signal.signal(signal.SIGTERM, handler)
+
+
+def worker_main(index, concurrency):
+    stop_on_sigterm()
+    worker_id = f"{socket.gethostname()}:{os.getpid()}:{index}"
+    logging.info(f"Worker {worker_id} polling for jobs")
+    try:
+        asyncio.run(work(worker_id, concurrency))
+    except KeyboardInterrupt:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[1])
+    parser.add_argument("--workers", type=int, default=JOB_WORKERS, help="worker processes to start")
+    parser.add_argument("--concurrency", type=int, default=JOB_WORKER_CONCURRENCY, help="jobs each worker runs at once")
+    args = parser.parse_args()
+
+    if args.workers <= 1:
+        worker_main(0, args.concurrency)
+        return
+    stop_on_sigterm()
+    context = multiprocessing.get_context("spawn")
+    processes = [context.Process(target=worker_main, args=(index, args.concurrency)) for index in range(args.workers)]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -98,7 +98,7 @@ export default function FileUpload({ setResults }) {
     } catch (err) {
       console.error("Upload error:", err);
       if (err.response) {
-        setError(`Server error: ${err.response.status} - ${err.response.data?.detail || 'Unknown error'}`);
+        setError(`Server error: ${err.response.status} - ${err.response.data?.detail || err.response.data?.error || 'Unknown error'}`);
       } else if (err.request) {
         setError("Network error: Unable to connect to server. Make sure the backend is running on localhost:8000");
       } else {